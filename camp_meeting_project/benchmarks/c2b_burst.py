@@ -0,0 +1,86 @@
+"""Throughput of the C2B confirmation endpoint and batch matcher during a burst.
+
+Usage (from camp_meeting_project/):
+
+    python benchmarks/c2b_burst.py --confirmations 2000 --min-rate 500
+
+Posts --confirmations paybill confirmations to /c2b/confirmation/ one
+after another, like Daraja on the final camp weekend, then matches them
+with process_pending_payments.  Runs against a fresh SQLite database in a
+temporary directory and prints confirmations/s for both steps.  With
+--min-rate the script exits non-zero when the endpoint is slower than
+that, for use as a CI gate on a quiet machine.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camp_meeting_project.settings')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--confirmations', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--min-rate', type=float, help="Fail below this many confirmations/s")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = os.path.join(tmp, 'c2b.sqlite3')
+    settings.ALLOWED_HOSTS.append('testserver')
+    # Matching is timed on its own below
+    settings.C2B_PROCESS_INTERVAL = 0
+
+    import django
+    django.setup()
+
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def run(args):
+    from django.core.management import call_command
+    from django.db.models import Sum
+    from django.test import Client
+    from django.urls import reverse
+    from camp_meeting.c2b import process_pending_payments
+    from camp_meeting.models import Contribution
+
+    call_command('migrate', verbosity=0)
+    client = Client()
+    url = reverse('camp_meeting:c2b_confirmation')
+
+    started = time.perf_counter()
+    for i in range(args.confirmations):
+        response = client.post(url, json.dumps({
+            'TransactionType': 'Pay Bill', 'TransID': f'RKT{i:07d}', 'TransTime': '20250824103000',
+            'TransAmount': '100', 'BusinessShortCode': '600100', 'BillRefNumber': 'Camp2025',
+            'MSISDN': f'2547{i:08d}', 'FirstName': 'GRACE', 'LastName': 'WANJIKU',
+        }), content_type='application/json')
+        assert response.status_code == 200, response.status_code
+    confirm_rate = args.confirmations / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    processed = process_pending_payments(batch_size=args.batch_size)
+    match_rate = processed / (time.perf_counter() - started)
+    total = Contribution.objects.aggregate(total=Sum('amount'))['total']
+    assert processed == args.confirmations and total == args.confirmations * 100, (processed, total)
+
+    print(f"{'confirmations/s':<20}{confirm_rate:>10,.0f}")
+    print(f"{'matched/s':<20}{match_rate:>10,.0f}")
+    if args.min_rate and confirm_rate < args.min_rate:
+        sys.exit(f"only {confirm_rate:,.0f} confirmations/s, expected at least {args.min_rate:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
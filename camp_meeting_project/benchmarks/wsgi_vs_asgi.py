@@ -0,0 +1,237 @@
+"""Payments in flight per worker under WSGI and ASGI, against a slow Daraja.
+
+Usage (from camp_meeting_project/):
+
+    python benchmarks/wsgi_vs_asgi.py --requests 200 --concurrency 100 --daraja-delay 1.0
+
+A local stub plays Daraja and answers every STK push after --daraja-delay
+seconds.  The same burst of POST /contribute/ requests goes to one worker
+of each kind, each with a fresh SQLite database:
+
+- wsgi: the sync views on a WSGI server with --threads threads, like a
+  gunicorn gthread worker
+- asgi: the async views (camp_meeting/async_views.py) under one uvicorn worker
+
+For each the script prints throughput, latency and the most STK pushes the
+stub saw in flight at once, i.e. how many payments one worker could keep
+waiting on Daraja.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camp_meeting_project.settings')
+
+# Any 32 characters do as a CSRF secret when the cookie and header agree
+CSRF_TOKEN = 'b' * 32
+
+
+class DarajaStub(BaseHTTPRequestHandler):
+    delay = 1.0
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    pushes = 0
+
+    def do_GET(self):
+        self.reply({'access_token': 'token', 'expires_in': '3599'})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.pushes += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            number = cls.pushes
+        try:
+            time.sleep(cls.delay)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+        self.reply({'ResponseCode': '0', 'CheckoutRequestID': f'ws_CO_{number:08d}', 'ResponseDescription': 'Success'})
+
+    def reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref with a fixed pool of request threads"""
+    request_queue_size = 1024
+    threads = 8
+
+    def server_activate(self):
+        super().server_activate()
+        self.pool = ThreadPoolExecutor(self.threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.handle_in_thread, request, client_address)
+
+    def handle_in_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def serve(args):
+    """Run one worker; called in a subprocess"""
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = args.db
+    settings.DATABASES['default']['OPTIONS'] = {'timeout': 60}
+    settings.ALLOWED_HOSTS.append('127.0.0.1')
+    settings.DEBUG = False
+    settings.LOGGING_CONFIG = None
+    settings.MPESA_BASE_URL = args.daraja_url
+    settings.RATE_LIMITS = {}
+    settings.DARAJA_MAX_IN_FLIGHT = 100000
+    settings.ASYNC_VIEWS = args.serve == 'asgi'
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+    if args.serve == 'asgi':
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+        uvicorn.run(get_asgi_application(), host='127.0.0.1', port=args.port, log_level='warning',
+                    lifespan='off', backlog=1024)
+    else:
+        from django.core.wsgi import get_wsgi_application
+        PooledWSGIServer.threads = args.threads
+        server = make_server('127.0.0.1', args.port, get_wsgi_application(),
+                             server_class=PooledWSGIServer, handler_class=QuietHandler)
+        server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def burst(url, total, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits, cookies={'csrftoken': CSRF_TOKEN}) as client:
+        async def pay(i):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, headers={'X-CSRFToken': CSRF_TOKEN}, json={
+                    'phone_number': f'07{i % 10 ** 8:08d}', 'email': 'bench@example.com',
+                    'amount': 100, 'full_name': 'Bench Runner',
+                })
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[pay(i) for i in range(total)])
+        return time.perf_counter() - started, latencies, failures
+
+
+def run(mode, args, daraja_url, workdir):
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, __file__, '--serve', mode, '--port', str(port), '--threads', str(args.threads),
+        '--db', str(workdir / f'{mode}.sqlite3'), '--daraja-url', daraja_url,
+    ], stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        DarajaStub.max_in_flight = 0
+        elapsed, latencies, failures = asyncio.run(
+            burst(f'http://127.0.0.1:{port}/contribute/', args.requests, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'rate': args.requests / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'in_flight': DarajaStub.max_in_flight,
+        'failures': failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--daraja-delay', type=float, default=1.0, help="Seconds the stub takes per STK push")
+    parser.add_argument('--threads', type=int, default=8, help="Request threads of the WSGI worker")
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--daraja-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    DarajaStub.delay = args.daraja_delay
+    stub = ThreadingHTTPServer(('127.0.0.1', 0), DarajaStub)
+    stub.request_queue_size = 1024
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    daraja_url = f'http://127.0.0.1:{stub.server_port}'
+
+    print(f"{args.requests} payments, {args.concurrency} at a time, Daraja answering in {args.daraja_delay}s")
+    print(f"{'worker':<22}{'seconds':>9}{'req/s':>9}{'p50 s':>8}{'p95 s':>8}{'in flight':>11}{'failed':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode, label in (('wsgi', f'WSGI, {args.threads} threads'), ('asgi', 'ASGI (uvicorn)')):
+            result = run(mode, args, daraja_url, Path(workdir))
+            print(f"{label:<22}{result['elapsed']:>9.1f}{result['rate']:>9.1f}{result['p50']:>8.2f}"
+                  f"{result['p95']:>8.2f}{result['in_flight']:>11}{result['failures']:>8}")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,65 @@
-from django.contrib import admin
+import os
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.functions import Lower
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from .models import Contribution, CampMeetingSettings
+from .db_router import replica_reads
+from .forms import StatementUploadForm
+from .models import ArchivedContribution, Contribution, CampMeetingSettings, C2BPayment, ContributorTotal
+from .statements import inbox_statements, save_upload
+from .utils import normalize_phone_number, prefix_range
+
+
+def estimate_row_count(model, using='default'):
+    """Cheap table size estimate that avoids a full COUNT(*)"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables WHERE table_name = %s", [table])
+        else:
+            # Walks the primary key index from both ends instead of every row
+            cursor.execute(f"SELECT MAX(id) - MIN(id) + 1 FROM {connection.ops.quote_name(table)}")
+        row = cursor.fetchone()
+    return max(int(row[0] or 0), 0) if row else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts more than `exact_count_limit` rows.
+
+    Unfiltered changelists on big tables use the table size estimate;
+    filtered ones count at most limit + 1 matching rows.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate > self.exact_count_limit:
+                return estimate
+        return queryset[:self.exact_count_limit + 1].count()
+
+class ReplicaChangelistMixin:
+    """Serve changelist pages from the read replica; bulk actions (POST) stay on the primary"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method == 'POST':
+            return super().changelist_view(request, extra_context)
+        return replica_reads(super().changelist_view)(request, extra_context)
 
 @admin.register(Contribution)
-class ContributionAdmin(admin.ModelAdmin):
+class ContributionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = [
         'full_name',
         'phone_number',
@@ -13,11 +69,16 @@ class ContributionAdmin(admin.ModelAdmin):
         'is_verified',
         'created_at'
     ]
-    list_filter = ['status', 'is_verified', 'created_at']
-    search_fields = ['full_name', 'phone_number', 'mpesa_transaction_id']
+    # Each filter combination is served by one of the (column, -created_at) indexes
+    list_filter = ['status', 'is_verified', 'shard', 'created_at']
+    # Searched by get_search_results, this only turns the search box on
+    search_fields = ['^full_name']
+    search_help_text = "Search by phone number, M-Pesa code or the start of a name"
     list_editable = ['is_verified']
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/camp_meeting/contribution/change_list.html'
     
     fieldsets = (
         ('Contributor Information', {
@@ -39,10 +100,11 @@ class ContributionAdmin(admin.ModelAdmin):
     
     def status_badge(self, obj):
         colors = {
-            'pending': 'orange',
-            'completed': 'green',
-            'failed': 'red',
-            'cancelled': 'gray'
+            Contribution.Status.PENDING: 'orange',
+            Contribution.Status.COMPLETED: 'green',
+            Contribution.Status.FAILED: 'red',
+            Contribution.Status.CANCELLED: 'gray',
+            Contribution.Status.DUPLICATE: 'gray',
         }
         color = colors.get(obj.status, 'gray')
         return format_html(
@@ -56,6 +118,61 @@ class ContributionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related()
 
+    def get_urls(self):
+        urls = [
+            path(
+                'import-statement/',
+                self.admin_site.admin_view(self.import_statement_view),
+                name='camp_meeting_contribution_import_statement',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def import_statement_view(self, request):
+        """Upload an M-Pesa statement CSV for the import worker and show how the imports are going"""
+        if not self.has_add_permission(request):
+            return redirect('admin:camp_meeting_contribution_changelist')
+
+        form = StatementUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            statement = form.cleaned_data['statement']
+            # Big statements take minutes, so `import_statement --loop` does the work
+            save_upload(statement, settings.STATEMENT_INBOX)
+            messages.success(request, f"Uploaded {statement.name}, it will be imported in the background")
+            return redirect('admin:camp_meeting_contribution_import_statement')
+
+        statements = [
+            {'name': os.path.basename(path).split('-', 3)[-1], 'checkpoint': checkpoint}
+            for path, checkpoint in reversed(inbox_statements(settings.STATEMENT_INBOX))
+        ]
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import M-Pesa statement',
+            'form': form,
+            'statements': statements,
+        }
+        return TemplateResponse(request, 'admin/camp_meeting/contribution/import_statement.html', context)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Prefix-match phone numbers, M-Pesa codes and names against their indexes"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        digits = search_term.lstrip('+').replace(' ', '')
+        if digits.isdigit():
+            phone_prefix = normalize_phone_number(digits)
+            return queryset.filter(**prefix_range('phone_normalized', phone_prefix)), False
+
+        if search_term.isalnum() and any(c.isdigit() for c in search_term):
+            receipt_prefix = search_term.upper()
+            return queryset.filter(**prefix_range('mpesa_transaction_id', receipt_prefix)), False
+
+        # istartswith can't use an index on either backend, a range on the lowercased name can
+        name_prefix = search_term.lower()
+        return queryset.alias(name_lower=Lower('full_name')).filter(**prefix_range('name_lower', name_prefix)), False
+
 @admin.register(CampMeetingSettings)
 class CampMeetingSettingsAdmin(admin.ModelAdmin):
     list_display = [
@@ -73,6 +190,9 @@ class CampMeetingSettingsAdmin(admin.ModelAdmin):
         ('Payment Settings', {
             'fields': ('paybill_number', 'account_number')
         }),
+        ('Landing Page', {
+            'fields': ('show_leaderboard',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -92,4 +212,60 @@ class CampMeetingSettingsAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         # Don't allow deletion of settings
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(C2BPayment)
+class C2BPaymentAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['trans_id', 'msisdn', 'bill_ref_number', 'amount', 'trans_time', 'processed_at', 'contribution']
+    list_filter = [('processed_at', admin.EmptyFieldListFilter)]
+    search_fields = ['=trans_id']
+    readonly_fields = [field.name for field in C2BPayment._meta.fields]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ContributorTotal)
+class ContributorTotalAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    """Kept up to date by leaderboard.py, fix drift with `manage.py rebuild_leaderboard`"""
+    list_display = ['display_name', 'phone_normalized', 'count', 'total_amount', 'updated_at']
+    search_fields = ['^phone_normalized']
+    readonly_fields = [field.name for field in ContributorTotal._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedContribution)
+class ArchivedContributionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['full_name', 'phone_number', 'amount', 'status', 'created_at', 'archived_at']
+    list_filter = ['status']
+    search_fields = ['^phone_normalized', '=checkout_request_id']
+    search_help_text = "Search by phone number or checkout request ID"
+    readonly_fields = [field.name for field in ArchivedContribution._meta.fields]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        digits = search_term.strip().lstrip('+').replace(' ', '')
+        if digits.isdigit():
+            search_term = normalize_phone_number(digits)
+        return super().get_search_results(request, queryset, search_term)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.checks import Warning, register
 
 
 class CampMeetingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'camp_meeting'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when the limits and breakers would be kept per process in production"""
+    if settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache':
+        return []
+    return [Warning(
+        "The default cache is per-process LocMemCache.",
+        hint="Rate limits, the Daraja in-flight cap and circuit breakers are multiplied by the number of "
+             "workers. Set CACHE_URL to redis://... (or db://... after `manage.py createcachetable`).",
+        id='camp_meeting.W001',
+    )]
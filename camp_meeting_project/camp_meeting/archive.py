@@ -0,0 +1,98 @@
+"""Moving abandoned STK attempts out of the contributions table.
+
+Every STK push creates a Contribution row, and the ones that were
+cancelled, failed or never completed are dead weight in every scan, index
+and admin page.  Once they are older than the retention window they are
+copied to ArchivedContribution and deleted from the hot table in small
+batches, each in its own short transaction, so SQLite's write lock is
+only held for a moment at a time.
+
+Archived rows keep counting towards their hourly rollup, so trends don't
+change when a batch is moved.
+"""
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ArchivedContribution, Contribution
+
+ARCHIVABLE_STATUSES = (Contribution.Status.PENDING, Contribution.Status.FAILED, Contribution.Status.CANCELLED)
+ARCHIVED_FIELDS = (
+    'full_name', 'email', 'phone_number', 'phone_normalized', 'amount', 'status',
+    'mpesa_transaction_id', 'is_verified', 'checkout_request_id', 'shard', 'created_at', 'updated_at',
+)
+
+
+def archive_cutoff(retention_days):
+    return timezone.now() - timedelta(days=retention_days)
+
+
+def archivable_contributions(cutoff):
+    """Unverified attempts created before cutoff that nothing else points at"""
+    return Contribution.objects.filter(
+        is_verified=False,
+        status__in=ARCHIVABLE_STATUSES,
+        created_at__lt=cutoff,
+        queued_stk_push__isnull=True,
+        c2b_payments__isnull=True,
+    )
+
+
+def count_archivable(cutoff):
+    """Archivable rows per status label, for dry runs"""
+    rows = archivable_contributions(cutoff).order_by().values('status').annotate(count=Count('id'))
+    return {Contribution.Status(row['status']).label.lower(): row['count'] for row in rows}
+
+
+def _delete_rows(ids):
+    # A plain DELETE: going through the ORM collector would send post_delete
+    # for every row and take the archived attempts out of the rollups
+    table = connection.ops.quote_name(Contribution._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def archive_batch(cutoff, batch_size=500):
+    """Move one batch into the archive. Returns how many rows were moved."""
+    now = timezone.now()
+    with transaction.atomic():
+        contributions = archivable_contributions(cutoff).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            contributions = contributions.select_for_update(skip_locked=True, of=('self',))
+        batch = list(contributions[:batch_size])
+        if not batch:
+            return 0
+
+        ArchivedContribution.objects.bulk_create([
+            ArchivedContribution(
+                original_id=contribution.pk,
+                archived_at=now,
+                **{field: getattr(contribution, field) for field in ARCHIVED_FIELDS},
+            )
+            for contribution in batch
+        ], ignore_conflicts=True)
+        _delete_rows([contribution.pk for contribution in batch])
+    return len(batch)
+
+
+def archive_contributions(cutoff, batch_size=500, pause=0, progress=None):
+    """Archive everything archivable before cutoff, one transaction per batch.
+
+    Sleeps `pause` seconds between batches so other writers get the lock,
+    and calls `progress` with the running total after every batch.
+    Returns the number of rows archived.
+    """
+    archived = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        archived += moved
+        if moved and progress:
+            progress(archived)
+        if moved < batch_size:
+            return archived
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,125 @@
+"""Async versions of the endpoints that spend their time waiting on Daraja or the DB.
+
+urls.py serves these instead of the ones in views.py when ASYNC_VIEWS is
+on, which asgi.py does.  Under an ASGI server a worker can then keep
+many payments in flight on one event loop instead of holding a thread
+for each.  Requests and responses are the same as the sync views, which
+share their validation and response building with these.
+
+Django 4.2's csrf_exempt and require_http_methods wrap views in sync
+functions, so the views here set the csrf flag and check the method
+themselves.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db.models import Sum
+from django.http import JsonResponse
+
+from .breaker import CircuitOpen
+from .db_router import replica_reads
+from .models import Contribution
+from .mpesa import DarajaUnavailable
+from .mpesa_async import ainitiate_stk_push
+from .offline import once_per_submission
+from .ratelimit import DarajaOverloaded, rate_limited, too_many_requests
+from .settings_cache import get_active_settings
+from .shards import ashard_slot
+from .stk_queue import queue_stk_push
+from .stk_results import StkResultUnavailable, aquery_stk_status
+from .views import (
+    apply_push_response, apply_stk_status, contribution_stats, local_stk_status, no_response_from_daraja,
+    push_queued, remember_contribution, save_if_pending, validate_payment,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def csrf_exempt(view):
+    view.csrf_exempt = True
+    return view
+
+
+@rate_limited('contribute')
+@once_per_submission
+async def initiate_mpesa_payment(request):
+    """Handle M-Pesa STK Push initiation and create a pending contribution record"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method'}, status=405)
+
+    try:
+        fields, error = validate_payment(json.loads(request.body))
+        if error:
+            return error
+
+        async with ashard_slot() as shard:
+            contribution = await Contribution.objects.acreate(shard=shard.name, **fields)
+            # Sessions are stored in the database, which only sync code may touch
+            await sync_to_async(remember_contribution)(request, contribution)
+            try:
+                response = await ainitiate_stk_push(fields['phone_number'], fields['amount'], contribution.id, shard)
+            except (CircuitOpen, DarajaUnavailable) as e:
+                if getattr(e, 'request_sent', False):
+                    contribution.status = Contribution.Status.FAILED
+                    await contribution.asave()
+                    return no_response_from_daraja()
+                # Daraja never saw the request, send it once it is back
+                await sync_to_async(queue_stk_push)(contribution, e)
+                return push_queued(contribution)
+
+            result = apply_push_response(contribution, response)
+            await contribution.asave()
+            return result
+
+    except DarajaOverloaded:
+        return too_many_requests(1)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+
+
+@csrf_exempt
+@rate_limited('stk_query')
+async def stk_status_view(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Only POST allowed'}, status=405)
+
+    try:
+        checkout_request_id = json.loads(request.body).get('checkout_request_id')
+        if not checkout_request_id:
+            return JsonResponse({'success': False, 'message': 'Missing CheckoutRequestID'}, status=400)
+
+        contribution = await Contribution.objects.filter(checkout_request_id=checkout_request_id).afirst()
+        if not contribution:
+            return JsonResponse({'success': False, 'message': 'Contribution not found'}, status=404)
+
+        # Once the callback or an earlier query has settled it, the answer can't change
+        if contribution.is_verified or contribution.status != Contribution.Status.PENDING:
+            return JsonResponse({'success': True, 'status': local_stk_status(contribution)})
+
+        try:
+            status = await aquery_stk_status(checkout_request_id, contribution.shard)
+        except (CircuitOpen, DarajaUnavailable, StkResultUnavailable):
+            # Daraja is down, the local state is all we have until it is back
+            return JsonResponse({'success': True, 'degraded': True, 'status': local_stk_status(contribution)})
+
+        result, changed = apply_stk_status(contribution, status)
+        if changed:
+            await sync_to_async(save_if_pending)(contribution)
+        return result
+
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON data'}, status=400)
+    except DarajaOverloaded:
+        return too_many_requests(1)
+    except Exception as e:
+        logger.exception("Error in stk_status_view")
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
+
+
+@replica_reads
+async def get_contribution_stats(request):
+    """API endpoint to get real-time contribution statistics"""
+    totals = await Contribution.objects.filter(is_verified=True).aaggregate(total=Sum('amount'))
+    camp_settings = await sync_to_async(get_active_settings)()
+    return JsonResponse(contribution_stats(totals['total'] or 0, camp_settings))
@@ -0,0 +1,148 @@
+"""Circuit breaker shared by all workers through the cache.
+
+State lives in the default cache, so workers trip and recover together
+once CACHE_URL points at a shared backend (Redis or the database cache);
+with the per-process default each worker has its own breaker.
+
+closed     calls go through; consecutive failures are counted
+open       calls fail fast with CircuitOpen until `reset_timeout` passes
+half_open  one worker wins the probe slot and tries a real call; success
+           closes the circuit, failure opens it again
+
+Every transition is logged, sent as the `circuit_state_changed` signal and
+kept in a short history that the health endpoint exposes.
+"""
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Sent with name, old_state and new_state whenever a breaker changes state
+circuit_state_changed = Signal()
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    history_size = 20
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        prefix = f'camp_meeting:breaker:{name}'
+        self.state_key = f'{prefix}:state'
+        self.failures_key = f'{prefix}:failures'
+        self.probe_key = f'{prefix}:probe'
+        self.history_key = f'{prefix}:history'
+
+    def _read(self):
+        return cache.get(self.state_key) or {'state': CLOSED, 'opened_at': None}
+
+    def _transition(self, old_state, new_state):
+        cache.set(self.state_key, {
+            'state': new_state,
+            'opened_at': time.time() if new_state == OPEN else None,
+        }, None)
+        if new_state != HALF_OPEN:
+            cache.delete(self.probe_key)
+        if new_state == CLOSED:
+            cache.delete(self.failures_key)
+
+        history = cache.get(self.history_key) or []
+        history.append({'at': time.time(), 'from': old_state, 'to': new_state})
+        cache.set(self.history_key, history[-self.history_size:], None)
+
+        log = logger.warning if new_state == OPEN else logger.info
+        log("Circuit %s changed from %s to %s", self.name, old_state, new_state)
+        circuit_state_changed.send(sender=self.__class__, name=self.name, old_state=old_state, new_state=new_state)
+
+    @property
+    def state(self):
+        return self._read()['state']
+
+    def available(self):
+        """False while the circuit is open and still cooling down. Doesn't take the probe slot."""
+        current = self._read()
+        return current['state'] != OPEN or time.time() - current['opened_at'] >= self.reset_timeout
+
+    def allow_request(self):
+        current = self._read()
+        if current['state'] == CLOSED:
+            return True
+        if current['state'] == OPEN:
+            if time.time() - current['opened_at'] < self.reset_timeout:
+                return False
+            # Only one worker gets to probe; the slot expires if it dies mid-call
+            if cache.add(self.probe_key, True, self.reset_timeout):
+                self._transition(OPEN, HALF_OPEN)
+                return True
+            return False
+        # half open: a new probe is allowed only once the previous one expired
+        return cache.add(self.probe_key, True, self.reset_timeout)
+
+    def record_success(self):
+        current = self._read()['state']
+        if current != CLOSED:
+            self._transition(current, CLOSED)
+        else:
+            cache.delete(self.failures_key)
+
+    def record_failure(self):
+        current = self._read()['state']
+        if current == HALF_OPEN:
+            self._transition(HALF_OPEN, OPEN)
+            return
+        cache.add(self.failures_key, 0, self.reset_timeout * 4)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            failures = 1
+        # Only the worker that reaches the threshold opens the circuit
+        if current == CLOSED and failures == self.failure_threshold:
+            self._transition(CLOSED, OPEN)
+
+    def call(self, func, *args, failure_exceptions=(Exception,), **kwargs):
+        if not self.allow_request():
+            raise CircuitOpen(f"{self.name} is unavailable")
+        try:
+            result = func(*args, **kwargs)
+        except failure_exceptions:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, func, *args, failure_exceptions=(Exception,), **kwargs):
+        """call() for a coroutine function, with the cache bookkeeping off the event loop"""
+        if not await sync_to_async(self.allow_request)():
+            raise CircuitOpen(f"{self.name} is unavailable")
+        try:
+            result = await func(*args, **kwargs)
+        except failure_exceptions:
+            await sync_to_async(self.record_failure)()
+            raise
+        await sync_to_async(self.record_success)()
+        return result
+
+    def snapshot(self):
+        current = self._read()
+        return {
+            'name': self.name,
+            'state': current['state'],
+            'opened_at': current['opened_at'],
+            'consecutive_failures': cache.get(self.failures_key) or 0,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout,
+            'transitions': cache.get(self.history_key) or [],
+        }
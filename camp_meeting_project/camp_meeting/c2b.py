@@ -0,0 +1,184 @@
+"""Daraja C2B (direct paybill) confirmations.
+
+A confirmation is acknowledged with a single INSERT into C2BPayment so
+the endpoint keeps up with bursts on the final camp weekend.  Matching
+the payments to contributions happens afterwards in batches: a few
+queries per batch find already recorded receipts and the pending STK
+attempts named in the account reference (see mpesa.account_reference),
+and the rest become new contributions.  A payment that merely has the
+same phone and amount as a pending push is a separate payment.
+"""
+import json
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import leaderboard
+from .models import C2BPayment, Contribution
+from .rollups import record_many, record_transition, rollup_key
+from .utils import is_valid_phone_number, normalize_phone_number
+
+PROCESSING_LOCK_KEY = 'camp_meeting:c2b_processing'
+# How far back a pending STK attempt may be completed by a paybill payment
+PENDING_MATCH_WINDOW = timedelta(days=1)
+
+
+def parse_amount(value):
+    try:
+        return Decimal(str(value).replace(',', ''))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def parse_trans_time(value):
+    try:
+        return timezone.make_aware(datetime.strptime(str(value), '%Y%m%d%H%M%S'))
+    except (TypeError, ValueError):
+        return None
+
+
+def payment_phone(payment):
+    """Best phone number for a payment: the MSISDN, or a phone typed as the account number"""
+    for value in (payment.msisdn, payment.bill_ref_number):
+        if value and '*' not in value:
+            phone = normalize_phone_number(value)
+            if is_valid_phone_number(phone):
+                return phone
+    return None
+
+
+def referenced_contribution(bill_ref_number):
+    """Contribution id in an STK push's account reference ('Camp2025-123' -> 123), or None"""
+    match = re.search(r'-(\d+)$', (bill_ref_number or '').strip())
+    return int(match.group(1)) if match else None
+
+
+def validate_payment(payload):
+    """Result code for Daraja's validation request"""
+    amount = parse_amount(payload.get('TransAmount'))
+    if amount is None or amount < 1:
+        return 'C2B00013', 'Rejected: invalid amount'
+    return '0', 'Accepted'
+
+
+def record_confirmation(payload):
+    """Store one confirmation with a single INSERT; redeliveries are ignored"""
+    payment = C2BPayment(
+        trans_id=str(payload['TransID']).strip().upper(),
+        trans_time=parse_trans_time(payload.get('TransTime')),
+        amount=parse_amount(payload.get('TransAmount')) or Decimal('0'),
+        bill_ref_number=str(payload.get('BillRefNumber') or '')[:50],
+        msisdn=str(payload.get('MSISDN') or '')[:20],
+        first_name=str(payload.get('FirstName') or '')[:50],
+        last_name=str(payload.get('LastName') or '')[:50],
+        payload=json.dumps(payload),
+    )
+    C2BPayment.objects.bulk_create([payment], ignore_conflicts=True)
+
+
+def _claim_batch(batch_size):
+    payments = C2BPayment.objects.filter(processed_at__isnull=True).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        payments = payments.select_for_update(skip_locked=True)
+    return list(payments[:batch_size])
+
+
+def process_batch(batch_size=500):
+    """Match one batch of unprocessed confirmations. Returns how many were processed."""
+    now = timezone.now()
+    with transaction.atomic():
+        payments = _claim_batch(batch_size)
+        if not payments:
+            return 0
+
+        recorded = dict(
+            Contribution.objects.filter(mpesa_transaction_id__in=[p.trans_id for p in payments])
+            .values_list('mpesa_transaction_id', 'id')
+        )
+
+        references = {p.pk: referenced_contribution(p.bill_ref_number) for p in payments}
+        # Locked so a callback or status poll verifying one of these waits for this batch,
+        # and then sees it completed instead of counting it again
+        pending = Contribution.objects.select_for_update().filter(
+            pk__in=set(references.values()) - {None}, status=Contribution.Status.PENDING, is_verified=False,
+            created_at__gte=now - PENDING_MATCH_WINDOW,
+        ).in_bulk()
+
+        matched, created, links = [], [], []
+        for payment in payments:
+            payment.processed_at = now
+            if payment.trans_id in recorded:
+                payment.contribution_id = recorded[payment.trans_id]
+                continue
+
+            phone = payment_phone(payment)
+            contribution = pending.get(references[payment.pk])
+            if contribution is not None and contribution.amount == payment.amount:
+                del pending[contribution.pk]
+                contribution.status = Contribution.Status.COMPLETED
+                contribution.is_verified = True
+                contribution.mpesa_transaction_id = payment.trans_id
+                contribution.updated_at = now
+                matched.append(contribution)
+            else:
+                contribution = Contribution(
+                    full_name=payment.full_name or 'Paybill Contributor',
+                    phone_number=(phone or payment.msisdn)[:15],
+                    phone_normalized=phone or '',
+                    amount=payment.amount,
+                    status=Contribution.Status.COMPLETED,
+                    is_verified=True,
+                    mpesa_transaction_id=payment.trans_id,
+                    created_at=payment.trans_time or payment.received_at,
+                )
+                created.append(contribution)
+            links.append((payment, contribution))
+
+        # bulk_update/bulk_create skip post_save, so keep the rollups in step here
+        Contribution.objects.bulk_update(matched, ['status', 'is_verified', 'mpesa_transaction_id', 'updated_at'])
+        for contribution in matched:
+            record_transition(
+                rollup_key(Contribution.Status.PENDING, contribution.amount, contribution.created_at),
+                rollup_key(contribution.status, contribution.amount, contribution.created_at),
+            )
+            # Locked while unverified, so it wasn't on the board yet
+            leaderboard.record_transition(
+                None, leaderboard.leaderboard_key(contribution.phone_normalized, True, contribution.amount),
+                contribution.full_name,
+            )
+
+        Contribution.objects.bulk_create(created)
+        record_many(created)
+        leaderboard.record_many(created)
+
+        for payment, contribution in links:
+            payment.contribution_id = contribution.pk
+        C2BPayment.objects.bulk_update(payments, ['processed_at', 'contribution'])
+    return len(payments)
+
+
+def process_pending_payments(batch_size=500, max_batches=None):
+    """Drain unprocessed confirmations, one batch per transaction"""
+    if not cache.add(PROCESSING_LOCK_KEY, True, 60):
+        return 0
+    processed = 0
+    try:
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            try:
+                count = process_batch(batch_size)
+            except IntegrityError:
+                # A statement import recorded one of the batch's receipts after it looked,
+                # the next pass finds it recorded and links the payment to it
+                break
+            processed += count
+            batches += 1
+            if count < batch_size:
+                break
+    finally:
+        cache.delete(PROCESSING_LOCK_KEY)
+    return processed
@@ -0,0 +1,120 @@
+"""Sending read-only reporting traffic to a read replica.
+
+Views wrapped in `replica_reads` (finance report, stats, landing page,
+admin changelists) read camp_meeting tables from READ_REPLICA_ALIAS.
+Everything else, and every write, uses the primary.
+
+Reads that follow a write go to the primary for the rest of the request,
+so a request never sees the replica lagging behind its own writes.  The
+post_save/post_delete signals of camp_meeting models call `note_write`
+(see signals.py); asking the router where a write would go doesn't count.
+Bulk writes send no signals, and none happen in replica_reads views.
+ReadYourWritesMiddleware scopes that to a single request.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('camp_meeting_replica_reads', default=False)
+_wrote_to_primary = ContextVar('camp_meeting_wrote_to_primary', default=False)
+
+ROUTED_APPS = {'camp_meeting'}
+
+
+def replica_alias():
+    """The configured replica alias, or None when reads should stay on the primary"""
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', None)
+    if alias and alias in connections.settings:
+        return alias
+    return None
+
+
+@contextmanager
+def read_from_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def request_scope():
+    """Forget earlier writes, so read-your-writes only spans one request"""
+    token = _wrote_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _wrote_to_primary.reset(token)
+
+
+def note_write(sender, **kwargs):
+    """Send this request's later reads to the primary, it has written to a routed table"""
+    if sender._meta.app_label in ROUTED_APPS:
+        _wrote_to_primary.set(True)
+
+
+def replica_reads(view):
+    """Serve a read-only view, sync or async, from the replica"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # The flag is a ContextVar, so it follows the ORM into sync_to_async threads
+            with read_from_replica():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with read_from_replica():
+            response = view(request, *args, **kwargs)
+            # Lazy template responses would otherwise query after we leave the block
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            # Sessions and users are read right after login, keep them on the primary
+            return None
+        if not _replica_reads.get() or _wrote_to_primary.get():
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows, so objects from either side may be related
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReadYourWritesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with request_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_scope():
+            return await self.get_response(request)
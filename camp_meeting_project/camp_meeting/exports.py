@@ -0,0 +1,14 @@
+"""Document exports.
+
+Export libraries are heavy to import (WeasyPrint alone pulls in pango,
+cairo and fontTools bindings), so they are imported on first use rather
+than at module level.  Worker boot and management commands never pay for
+them unless an export is actually requested.
+"""
+
+
+def html_to_pdf(html_string, base_url=None):
+    """Render an HTML document to PDF bytes with WeasyPrint"""
+    from weasyprint import HTML
+
+    return HTML(string=html_string, base_url=base_url).write_pdf()
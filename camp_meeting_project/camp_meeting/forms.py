@@ -1,6 +1,7 @@
 # forms.py
 from django import forms
 from .models import Contribution
+from .utils import is_valid_phone_number, normalize_phone_number
 
 class ContributionForm(forms.ModelForm):
     """Form for handling contributions"""
@@ -36,19 +37,9 @@ class ContributionForm(forms.ModelForm):
         }
         
     def clean_phone_number(self):
-        phone_number = self.cleaned_data.get('phone_number')
-        
-        # Remove any spaces or special characters
-        phone_number = ''.join(filter(str.isdigit, phone_number))
-        
-        # Format phone number
-        if phone_number.startswith('0') and len(phone_number) == 10:
-            phone_number = '254' + phone_number[1:]
-        elif phone_number.startswith('254') and len(phone_number) == 12:
-            pass  # Already in correct format
-        else:
+        phone_number = normalize_phone_number(self.cleaned_data.get('phone_number'))
+        if not is_valid_phone_number(phone_number):
             raise forms.ValidationError('Please enter a valid Kenyan phone number')
-        
         return phone_number
     
     def clean_email(self):
@@ -66,4 +57,14 @@ class ContributionForm(forms.ModelForm):
         if amount > 1000000:
             raise forms.ValidationError('Amount cannot exceed Ksh. 1,000,000')
         
-        return amount
\ No newline at end of file
+        return amount
+
+class StatementUploadForm(forms.Form):
+    """Upload form for M-Pesa paybill statement CSVs in the admin"""
+    statement = forms.FileField(help_text="CSV statement exported from the M-Pesa org portal")
+
+    def clean_statement(self):
+        statement = self.cleaned_data['statement']
+        if not statement.name.lower().endswith('.csv'):
+            raise forms.ValidationError('Please upload a .csv statement')
+        return statement
@@ -0,0 +1,152 @@
+"""Incrementally maintained totals per contributor, for the top givers board.
+
+Each ContributorTotal row holds the count and total of one phone number's
+verified contributions.  Rows are keyed on the normalized number, so
+"0712...", "+254712..." and however the name was typed all count for the
+same person.  Saving a contribution moves its amount from the row its
+locked database state counted towards to its new one (see signals.py),
+and the board reads the top rows off the index on the total instead of
+grouping every contribution on each request.
+
+Only a first name and initial ever reach the board.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+
+from .models import Contribution, ContributorTotal
+
+CACHE_KEY = 'camp_meeting:leaderboard'
+MAX_SIZE = 50
+# Name given to paybill payments that came without one, see c2b.py
+PLACEHOLDER_NAME = 'Paybill Contributor'
+ANONYMOUS = 'Anonymous'
+
+
+def public_name(full_name):
+    """'Grace Wanjiku Kamau' -> 'Grace K.'"""
+    parts = (full_name or '').split()
+    if not parts or full_name == PLACEHOLDER_NAME:
+        return ANONYMOUS
+    if len(parts) == 1:
+        return parts[0]
+    return f"{parts[0]} {parts[-1][0].upper()}."
+
+
+def leaderboard_key(phone_normalized, is_verified, amount):
+    """The (phone, amount) a contribution counts towards, or None when it doesn't count"""
+    if not is_verified or not phone_normalized or amount is None:
+        return None
+    return (phone_normalized, Decimal(str(amount)))
+
+
+def apply_delta(phone, count, amount, name=None):
+    """Add count/amount to one contributor's row, creating it if needed and dropping it at zero"""
+    rows = ContributorTotal.objects.filter(phone_normalized=phone)
+    changes = {'count': F('count') + count, 'total_amount': F('total_amount') + amount}
+    if name and name != ANONYMOUS:
+        # The first name we hear for a number sticks, later ones only fill in a missing one
+        changes['display_name'] = Case(When(display_name=ANONYMOUS, then=Value(name)), default=F('display_name'))
+    if rows.update(**changes):
+        if count < 0:
+            rows.filter(count__lte=0).delete()
+        return
+    if count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            ContributorTotal.objects.create(
+                phone_normalized=phone, display_name=name or ANONYMOUS, count=count, total_amount=amount,
+            )
+    except IntegrityError:
+        # Another writer created the row between our update and insert
+        rows.update(**changes)
+
+
+def record_transition(old_key, new_key, full_name=''):
+    """Move one contribution's amount from the row it counted towards to its new one"""
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        if old_key is not None:
+            phone, amount = old_key
+            apply_delta(phone, -1, -amount)
+        if new_key is not None:
+            phone, amount = new_key
+            apply_delta(phone, 1, amount, public_name(full_name))
+
+
+def record_many(contributions):
+    """Count freshly bulk-inserted contributions, which bypass post_save"""
+    deltas = defaultdict(lambda: [0, Decimal('0'), ''])
+    for contribution in contributions:
+        key = leaderboard_key(contribution.phone_normalized, contribution.is_verified, contribution.amount)
+        if key is None:
+            continue
+        phone, amount = key
+        deltas[phone][0] += 1
+        deltas[phone][1] += amount
+        if not deltas[phone][2] and public_name(contribution.full_name) != ANONYMOUS:
+            deltas[phone][2] = contribution.full_name
+
+    if not deltas:
+        return
+    with transaction.atomic():
+        existing = set(ContributorTotal.objects.filter(phone_normalized__in=deltas).values_list('phone_normalized', flat=True))
+        for phone in existing:
+            count, amount, full_name = deltas[phone]
+            apply_delta(phone, count, amount, public_name(full_name))
+        # First-time contributors, the usual case for a paybill batch, in one insert
+        new = [
+            ContributorTotal(phone_normalized=phone, display_name=public_name(full_name), count=count, total_amount=amount)
+            for phone, (count, amount, full_name) in deltas.items() if phone not in existing
+        ]
+        try:
+            with transaction.atomic():
+                ContributorTotal.objects.bulk_create(new)
+        except IntegrityError:
+            # Someone else added one of these numbers meanwhile, fall back to one at a time
+            for row in new:
+                apply_delta(row.phone_normalized, row.count, row.total_amount, row.display_name)
+
+
+def rebuild_leaderboard(using=DEFAULT_DB_ALIAS):
+    """Recompute every contributor's row from the verified contributions. Returns the number of rows."""
+    verified = Contribution.objects.using(using).filter(is_verified=True).exclude(phone_normalized='').order_by()
+    totals = verified.values('phone_normalized').annotate(count=Count('id'), total_amount=Sum('amount'))
+    # The first real name recorded for each number, as apply_delta keeps it
+    named = verified.exclude(full_name__in=['', PLACEHOLDER_NAME]).order_by('-id')
+    names = dict(named.values_list('phone_normalized', 'full_name'))
+
+    with transaction.atomic(using=using):
+        ContributorTotal.objects.using(using).all().delete()
+        created = ContributorTotal.objects.using(using).bulk_create([
+            ContributorTotal(
+                phone_normalized=row['phone_normalized'],
+                display_name=public_name(names.get(row['phone_normalized'])),
+                count=row['count'],
+                total_amount=row['total_amount'],
+            )
+            for row in totals.iterator()
+        ], batch_size=1000)
+    return len(created)
+
+
+def top_contributors(limit=None):
+    """The top `limit` contributors, cached for LEADERBOARD_CACHE_TTL seconds"""
+    limit = min(limit or settings.LEADERBOARD_SIZE, MAX_SIZE)
+    key = f'{CACHE_KEY}:{limit}'
+    board = cache.get(key)
+    if board is None:
+        # A walk down contributor_total_idx, however many contributions there are
+        rows = ContributorTotal.objects.order_by('-total_amount')[:limit]
+        board = [
+            {'rank': rank, 'name': row.display_name, 'contributions': row.count, 'total': float(row.total_amount)}
+            for rank, row in enumerate(rows, 1)
+        ]
+        cache.set(key, board, settings.LEADERBOARD_CACHE_TTL)
+    return board
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from camp_meeting.archive import archive_contributions, archive_cutoff, count_archivable
+
+
+class Command(BaseCommand):
+    help = "Move pending, failed and cancelled contributions older than the retention window to the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_RETENTION_DAYS,
+                            help="Archive attempts older than this many days")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches so other writers get the lock")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be archived")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        cutoff = archive_cutoff(options['days'])
+        counts = count_archivable(cutoff)
+        pending_total = sum(counts.values())
+        summary = ", ".join(f"{count:,} {status}" for status, count in sorted(counts.items())) or "nothing"
+        self.stdout.write(f"Created before {cutoff:%Y-%m-%d %H:%M}: {summary}")
+        if options['dry_run'] or not pending_total:
+            return
+
+        started = time.monotonic()
+
+        def progress(archived):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{archived:,}/{pending_total:,} archived, {archived / elapsed if elapsed else 0:,.0f} rows/s")
+
+        archived = archive_contributions(cutoff, options['batch_size'], options['pause'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived:,} contributions"))
@@ -0,0 +1,77 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from camp_meeting.statements import (
+    Checkpoint, StatementImportError, checkpoint_path, import_statement, inbox_statements,
+)
+
+
+class Command(BaseCommand):
+    help = "Import completed payments from an M-Pesa paybill statement CSV, or the ones uploaded in the admin"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?',
+                            help="Statement CSV exported from the M-Pesa org portal (default: STATEMENT_INBOX)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', help="Progress file, defaults to <path>.checkpoint.json")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+        parser.add_argument('--loop', action='store_true', help="Keep importing statements as they are uploaded")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        if options['path']:
+            self.import_file(options)
+            return
+
+        while True:
+            for path, checkpoint in inbox_statements(settings.STATEMENT_INBOX):
+                if checkpoint.completed or checkpoint.error:
+                    continue
+                self.stdout.write(f"Importing {os.path.basename(path)}")
+                try:
+                    self.run(path, checkpoint, options['batch_size'])
+                except CommandError as e:
+                    # Shown on the admin upload page, and not retried
+                    checkpoint.error = str(e)
+                    checkpoint.save()
+                    self.stderr.write(f"Could not import {os.path.basename(path)}: {e}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def import_file(self, options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+
+        path_of_checkpoint = options['checkpoint'] or checkpoint_path(path)
+        if options['restart'] and os.path.exists(path_of_checkpoint):
+            os.remove(path_of_checkpoint)
+        checkpoint = Checkpoint.load(path_of_checkpoint, os.path.abspath(path))
+        if checkpoint.completed:
+            self.stdout.write(f"{path} was already imported (use --restart to import it again)")
+            return
+        if checkpoint.rows_read:
+            self.stdout.write(f"Resuming after row {checkpoint.rows_read:,}")
+        self.run(path, checkpoint, options['batch_size'])
+
+    def run(self, path, checkpoint, batch_size):
+        def progress(checkpoint, rate):
+            self.stdout.write(
+                f"{checkpoint.rows_read:,} rows read, {checkpoint.imported:,} imported, "
+                f"{checkpoint.duplicates:,} duplicates, {rate:,.0f} rows/s"
+            )
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                import_statement(f, checkpoint, batch_size=batch_size, progress=progress)
+        except (StatementImportError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {checkpoint.imported:,} contributions "
+            f"({checkpoint.duplicates:,} duplicates, {checkpoint.skipped:,} rows skipped)"
+        ))
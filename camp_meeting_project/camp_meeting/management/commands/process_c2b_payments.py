@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from camp_meeting.c2b import process_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Match stored C2B confirmations to contributions in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new confirmations")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_pending_payments(batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f"Processed {processed:,} C2B payments")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
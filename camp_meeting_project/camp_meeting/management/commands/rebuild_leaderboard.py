@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from camp_meeting.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-contributor totals behind the leaderboard from the verified contributions"
+
+    def handle(self, *args, **options):
+        written = rebuild_leaderboard()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} contributor totals"))
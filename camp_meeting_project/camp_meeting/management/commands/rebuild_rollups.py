@@ -0,0 +1,30 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from camp_meeting.rollups import rebuild_rollups
+
+
+def parse_date(value):
+    try:
+        return timezone.make_aware(datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), time.min))
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly contribution rollups from the contributions and archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD), defaults to the beginning")
+        parser.add_argument('--end', help="Day to stop before (YYYY-MM-DD), defaults to no end")
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        if start and end and start >= end:
+            raise CommandError("--start must be before --end")
+
+        written = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows"))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from camp_meeting.stk_queue import retry_queued_pushes
+
+
+class Command(BaseCommand):
+    help = "Send STK pushes that were queued while Daraja was unavailable"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep retrying as pushes become due")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            sent = retry_queued_pushes()
+            if sent:
+                self.stdout.write(f"Sent {sent} queued STK pushes")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
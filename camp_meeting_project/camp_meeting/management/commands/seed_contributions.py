@@ -0,0 +1,69 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from camp_meeting.leaderboard import rebuild_leaderboard
+from camp_meeting.models import Contribution
+from camp_meeting.rollups import rebuild_rollups
+from camp_meeting.seeding import DEFAULT_END_DAY, day_end, seed_contributions
+
+
+class Command(BaseCommand):
+    help = "Generate realistic synthetic contributions for load and scale testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Total number of seeded rows wanted")
+        parser.add_argument('--seed', type=int, default=42, help="Same seed, same rows")
+        parser.add_argument('--database', default='benchmark', help="Database alias to write to")
+        parser.add_argument('--days', type=int, default=90, help="Length of the window the rows are spread over")
+        parser.add_argument('--end', help=f"Last day of the window (YYYY-MM-DD), defaults to {DEFAULT_END_DAY}")
+        parser.add_argument('--append', action='store_true',
+                            help="Add rows to a table that already has some, continuing after them")
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if using not in connections.settings:
+            hint = ", set BENCHMARK_DB_NAME to a file to use it" if using == 'benchmark' else ""
+            raise CommandError(f"Unknown database alias '{using}'{hint}")
+        if using == DEFAULT_DB_ALIAS and not settings.DEBUG:
+            raise CommandError("Refusing to seed the default database with DEBUG off")
+        if options['rows'] < 1 or options['days'] < 1:
+            raise CommandError("--rows and --days must be at least 1")
+
+        if options['end']:
+            try:
+                end_day = datetime.strptime(options['end'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Invalid date '{options['end']}', expected YYYY-MM-DD")
+        else:
+            end_day = DEFAULT_END_DAY
+        end = day_end(end_day)
+
+        existing = Contribution.objects.using(using).count()
+        if existing and not options['append']:
+            raise CommandError(f"{using} already has {existing:,} contributions, use --append to add to them")
+        if existing >= options['rows']:
+            self.stdout.write(f"{using} already has {existing:,} contributions")
+            return
+
+        started = time.monotonic()
+
+        def progress(written):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{written:,}/{options['rows']:,} rows, {(written - existing) / elapsed:,.0f} rows/s")
+
+        window_start, window_end = seed_contributions(
+            options['rows'], seed=options['seed'], using=using, end=end, days=options['days'],
+            start_index=existing, progress=progress,
+        )
+        seeded = time.monotonic() - started
+        # The raw inserts bypass the rollup and leaderboard signals
+        rebuild_rollups(window_start, window_end, using=using)
+        rebuild_leaderboard(using=using)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['rows'] - existing:,} contributions into {using} in {seeded:.1f}s "
+            f"(rollups and leaderboard rebuilt in {time.monotonic() - started - seeded:.1f}s)"
+        ))
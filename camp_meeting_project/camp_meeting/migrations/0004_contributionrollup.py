@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:38
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Lower, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    Contribution = apps.get_model('camp_meeting', 'Contribution')
+    ContributionRollup = apps.get_model('camp_meeting', 'ContributionRollup')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        Contribution.objects.using(db_alias).order_by()
+        .annotate(rollup_bucket=TruncHour('created_at', tzinfo=timezone.utc), rollup_status=Lower('status'))
+        .values('rollup_bucket', 'rollup_status')
+        .annotate(count=Count('id'), total_amount=Sum('amount'))
+    )
+    ContributionRollup.objects.using(db_alias).bulk_create([
+        ContributionRollup(
+            bucket=row['rollup_bucket'],
+            status=row['rollup_status'],
+            count=row['count'],
+            total_amount=row['total_amount'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0003_contribution_checkout_request_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContributionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contributionrollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'status'), name='unique_rollup_bucket_status'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
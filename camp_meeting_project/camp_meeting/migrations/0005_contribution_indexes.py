@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0004_contributionrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contribution',
+            name='checkout_request_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='contribution',
+            name='mpesa_transaction_id',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='contribution',
+            name='phone_number',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['-created_at'], name='contribution_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['status', '-created_at'], name='contribution_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['is_verified', '-created_at'], name='contribution_verified_idx'),
+        ),
+    ]
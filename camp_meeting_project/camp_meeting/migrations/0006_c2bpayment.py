@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0005_contribution_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='C2BPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trans_id', models.CharField(max_length=50, unique=True)),
+                ('trans_time', models.DateTimeField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bill_ref_number', models.CharField(blank=True, default='', max_length=50)),
+                ('msisdn', models.CharField(blank=True, default='', max_length=20)),
+                ('first_name', models.CharField(blank=True, default='', max_length=50)),
+                ('last_name', models.CharField(blank=True, default='', max_length=50)),
+                ('payload', models.TextField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('contribution', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='c2b_payments', to='camp_meeting.contribution')),
+            ],
+            options={
+                'verbose_name': 'C2B Payment',
+                'ordering': ['id'],
+            },
+        ),
+    ]
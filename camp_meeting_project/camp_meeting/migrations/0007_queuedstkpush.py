@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0006_c2bpayment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedStkPush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_error', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('contribution', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='queued_stk_push', to='camp_meeting.contribution')),
+            ],
+            options={
+                'verbose_name': 'Queued STK Push',
+                'ordering': ['next_attempt_at'],
+            },
+        ),
+    ]
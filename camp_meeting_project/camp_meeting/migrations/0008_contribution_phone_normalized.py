@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:55
+
+from django.db import migrations, models, transaction
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def normalize(value):
+    # Same rules as camp_meeting.utils.lookup_phone_number at the time of writing
+    value = str(value or '')
+    if '*' in value:
+        return ''
+    digits = ''.join(filter(str.isdigit, value))
+    if digits.startswith('0'):
+        return '254' + digits[1:]
+    if digits and digits[0] in '17' and len(digits) <= 9:
+        return '254' + digits
+    return digits
+
+
+def backfill_phone_normalized(apps, schema_editor):
+    """Fill phone_normalized in primary key order, one short transaction per batch"""
+    Contribution = apps.get_model('camp_meeting', 'Contribution')
+    db_alias = schema_editor.connection.alias
+    contributions = Contribution.objects.using(db_alias)
+    last_pk = 0
+    while True:
+        batch = list(
+            contributions.filter(pk__gt=last_pk).order_by('pk').only('pk', 'phone_number')[:BACKFILL_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for contribution in batch:
+            contribution.phone_normalized = normalize(contribution.phone_number)
+        with transaction.atomic(using=db_alias):
+            contributions.bulk_update(batch, ['phone_normalized'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Let each backfill batch commit on its own instead of one long transaction
+    atomic = False
+
+    dependencies = [
+        ('camp_meeting', '0007_queuedstkpush'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contribution',
+            name='phone_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=15),
+        ),
+        migrations.RunPython(backfill_phone_normalized, migrations.RunPython.noop),
+        # Built after the backfill so the rows aren't indexed twice
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['phone_normalized', '-created_at'], name='contribution_phone_idx'),
+        ),
+        # Searches go through phone_normalized now
+        migrations.AlterField(
+            model_name='contribution',
+            name='phone_number',
+            field=models.CharField(max_length=15),
+        ),
+    ]
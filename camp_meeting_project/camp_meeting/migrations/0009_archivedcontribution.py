@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0008_contribution_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('full_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('phone_number', models.CharField(max_length=15)),
+                ('phone_normalized', models.CharField(blank=True, default='', max_length=15)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(max_length=20)),
+                ('mpesa_transaction_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('checkout_request_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived Contribution',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
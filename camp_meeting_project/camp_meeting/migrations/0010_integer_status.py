@@ -0,0 +1,142 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:40
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 2000
+# Old spellings ('pending', 'Completed', 'Failed', ...) to Contribution.Status values
+STATUS_CODES = {'pending': 0, 'completed': 1, 'failed': 2, 'cancelled': 3}
+STATUS_CHOICES = [(0, 'Pending'), (1, 'Completed'), (2, 'Failed'), (3, 'Cancelled')]
+
+
+def status_code(value, is_verified=False):
+    code = STATUS_CODES.get((value or '').strip().lower())
+    if code is None:
+        code = 1 if is_verified else 0
+    return code
+
+
+def convert_rows(model, db_alias):
+    """Fill status_code in primary key order, one short transaction per batch"""
+    rows = model.objects.using(db_alias)
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk).order_by('pk').only('pk', 'status', 'is_verified')[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            row.status_code = status_code(row.status, row.is_verified)
+        with transaction.atomic(using=db_alias):
+            rows.bulk_update(batch, ['status_code'])
+        last_pk = batch[-1].pk
+
+
+def convert_rollups(ContributionRollup, db_alias):
+    # Unknown spellings fold into pending, so rows for one bucket may merge
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    rollups = ContributionRollup.objects.using(db_alias)
+    for rollup in rollups.all():
+        total = totals[(rollup.bucket, status_code(rollup.status))]
+        total[0] += rollup.count
+        total[1] += rollup.total_amount
+    with transaction.atomic(using=db_alias):
+        rollups.all().delete()
+        rollups.bulk_create([
+            ContributionRollup(bucket=bucket, status=str(code), status_code=code, count=count, total_amount=amount)
+            for (bucket, code), (count, amount) in totals.items()
+        ])
+
+
+def convert_statuses(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    convert_rows(apps.get_model('camp_meeting', 'Contribution'), db_alias)
+    convert_rows(apps.get_model('camp_meeting', 'ArchivedContribution'), db_alias)
+    convert_rollups(apps.get_model('camp_meeting', 'ContributionRollup'), db_alias)
+
+
+class Migration(migrations.Migration):
+    # Let each conversion batch commit on its own instead of one long transaction
+    atomic = False
+
+    dependencies = [
+        ('camp_meeting', '0009_archivedcontribution'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contribution',
+            name='contribution_status_idx',
+        ),
+        migrations.RemoveConstraint(
+            model_name='contributionrollup',
+            name='unique_rollup_bucket_status',
+        ),
+        migrations.AddField(
+            model_name='contribution',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedcontribution',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contributionrollup',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(convert_statuses, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='contribution',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='archivedcontribution',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='contributionrollup',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='contribution',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.RenameField(
+            model_name='archivedcontribution',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.RenameField(
+            model_name='contributionrollup',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AlterField(
+            model_name='contribution',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=0),
+        ),
+        migrations.AlterField(
+            model_name='archivedcontribution',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=STATUS_CHOICES),
+        ),
+        migrations.AlterField(
+            model_name='contributionrollup',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=STATUS_CHOICES),
+        ),
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(fields=['status', '-created_at'], name='contribution_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='contributionrollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'status'), name='unique_rollup_bucket_status'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0010_integer_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contribution',
+            name='shard',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:46
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def public_name(full_name):
+    # A copy of leaderboard.public_name as it was when this migration was written
+    parts = (full_name or '').split()
+    if not parts or full_name == 'Paybill Contributor':
+        return 'Anonymous'
+    if len(parts) == 1:
+        return parts[0]
+    return f"{parts[0]} {parts[-1][0].upper()}."
+
+
+def backfill_totals(apps, schema_editor):
+    Contribution = apps.get_model('camp_meeting', 'Contribution')
+    ContributorTotal = apps.get_model('camp_meeting', 'ContributorTotal')
+    db_alias = schema_editor.connection.alias
+    verified = Contribution.objects.using(db_alias).filter(is_verified=True).exclude(phone_normalized='').order_by()
+    # Later rows come first so the earliest name for each number is the one kept
+    named = verified.exclude(full_name__in=['', 'Paybill Contributor']).order_by('-id')
+    names = dict(named.values_list('phone_normalized', 'full_name'))
+    rows = verified.values('phone_normalized').annotate(count=Count('id'), total_amount=Sum('amount'))
+    ContributorTotal.objects.using(db_alias).bulk_create([
+        ContributorTotal(
+            phone_normalized=row['phone_normalized'],
+            display_name=public_name(names.get(row['phone_normalized'])),
+            count=row['count'],
+            total_amount=row['total_amount'] or 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0011_contribution_shard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campmeetingsettings',
+            name='show_leaderboard',
+            field=models.BooleanField(default=False, help_text='Show the top contributors (first name and initial) on the landing page'),
+        ),
+        migrations.CreateModel(
+            name='ContributorTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_normalized', models.CharField(max_length=15, unique=True)),
+                ('display_name', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-total_amount'],
+                'indexes': [models.Index(fields=['-total_amount'], name='contributor_total_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0012_contributortotal_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='contribution',
+            constraint=models.UniqueConstraint(condition=models.Q(('mpesa_transaction_id__gt', '')), fields=('mpesa_transaction_id',), name='unique_contribution_receipt'),
+        ),
+    ]
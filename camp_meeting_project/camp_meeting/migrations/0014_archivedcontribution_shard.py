@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0013_contribution_unique_receipt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedcontribution',
+            name='shard',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0014_archivedcontribution_shard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedcontribution',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Pending'), (1, 'Completed'), (2, 'Failed'), (3, 'Cancelled'), (4, 'Duplicate')]),
+        ),
+        migrations.AlterField(
+            model_name='contribution',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Pending'), (1, 'Completed'), (2, 'Failed'), (3, 'Cancelled'), (4, 'Duplicate')], default=0),
+        ),
+        migrations.AlterField(
+            model_name='contributionrollup',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Pending'), (1, 'Completed'), (2, 'Failed'), (3, 'Cancelled'), (4, 'Duplicate')]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:33
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0015_contribution_duplicate_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contribution',
+            index=models.Index(django.db.models.functions.text.Lower('full_name'), name='contribution_name_idx'),
+        ),
+    ]
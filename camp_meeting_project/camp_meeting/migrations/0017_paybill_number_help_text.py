@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camp_meeting', '0016_contribution_name_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='campmeetingsettings',
+            name='paybill_number',
+            field=models.CharField(default='', help_text='Shown to members who pay by paybill. STK pushes use the shortcode configured with the Daraja app.', max_length=20),
+        ),
+    ]
@@ -1,43 +1,75 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .utils import lookup_phone_number
+
 class Contribution(models.Model):
-    STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('completed', 'Completed'),
-        ('failed', 'Failed'),
-        ('cancelled', 'Cancelled'),
-    ]
+    class Status(models.IntegerChoices):
+        PENDING = 0, 'Pending'
+        COMPLETED = 1, 'Completed'
+        FAILED = 2, 'Failed'
+        CANCELLED = 3, 'Cancelled'
+        # Paid, but the receipt was already recorded on another row (statement import or C2B)
+        DUPLICATE = 4, 'Duplicate'
     
     full_name = models.CharField(max_length=100)
     email = models.EmailField(max_length=254, blank=True, null=True)
     phone_number = models.CharField(max_length=15)
+    # phone_number in 2547XXXXXXXX form, kept in step on save; used for lookups and search
+    phone_normalized = models.CharField(max_length=15, blank=True, default='', editable=False)
     amount = models.DecimalField(
         max_digits=10, 
         decimal_places=2,
         validators=[MinValueValidator(1.00)]
     )
-    status = models.CharField(
-        max_length=20, 
-        choices=STATUS_CHOICES, 
-        default='pending'
+    status = models.PositiveSmallIntegerField(
+        choices=Status.choices,
+        default=Status.PENDING
     )
     mpesa_transaction_id = models.CharField(
         max_length=50, 
         blank=True, 
-        null=True
+        null=True,
+        db_index=True
     )
     is_verified = models.BooleanField(default=False)
-    checkout_request_id = models.CharField(max_length=100, blank=True, null=True)
+    checkout_request_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    # MPESA_CREDENTIALS app the STK push went out with, status queries must use the same one
+    shard = models.CharField(max_length=50, blank=True, default='')
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='contribution_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='contribution_status_idx'),
+            models.Index(fields=['is_verified', '-created_at'], name='contribution_verified_idx'),
+            models.Index(fields=['phone_normalized', '-created_at'], name='contribution_phone_idx'),
+            # Admin name search, see ContributionAdmin.get_search_results
+            models.Index(Lower('full_name'), name='contribution_name_idx'),
+        ]
+        constraints = [
+            # One contribution per M-Pesa receipt, whether it came from a callback, C2B or a statement
+            models.UniqueConstraint(
+                fields=['mpesa_transaction_id'], condition=models.Q(mpesa_transaction_id__gt=''),
+                name='unique_contribution_receipt',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.full_name} - Ksh. {self.amount}"
+
+    def save(self, *args, **kwargs):
+        self.phone_normalized = lookup_phone_number(self.phone_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        # One transaction with signals.lock_stored_row, so the row stays locked until its rollups move
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Contribution, instance=self)):
+            super().save(*args, **kwargs)
     
     @property
     def first_name(self):
@@ -53,9 +85,15 @@ class CampMeetingSettings(models.Model):
     )
     event_start_date = models.DateTimeField()
     event_end_date = models.DateTimeField()
-    paybill_number = models.CharField(max_length=20, default="")
+    paybill_number = models.CharField(
+        max_length=20, default="",
+        help_text="Shown to members who pay by paybill. STK pushes use the shortcode configured with the Daraja app."
+    )
     account_number = models.CharField(max_length=50, default="Camp2025")
     is_active = models.BooleanField(default=True)
+    show_leaderboard = models.BooleanField(
+        default=False, help_text="Show the top contributors (first name and initial) on the landing page"
+    )
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -64,4 +102,106 @@ class CampMeetingSettings(models.Model):
         verbose_name_plural = "Camp Meeting Settings"
     
     def __str__(self):
-        return f"Camp Meeting 2025 Settings"
\ No newline at end of file
+        return f"Camp Meeting 2025 Settings"
+
+class ContributionRollup(models.Model):
+    """Hourly contribution count and total per status, kept up to date on every status change"""
+    bucket = models.DateTimeField()
+    status = models.PositiveSmallIntegerField(choices=Contribution.Status.choices)
+    count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'status'], name='unique_rollup_bucket_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:00} {self.get_status_display()}: {self.count}"
+
+class ContributorTotal(models.Model):
+    """Verified contributions per phone number, kept up to date on every verification"""
+    phone_normalized = models.CharField(max_length=15, unique=True)
+    # First name and initial from the number's first named contribution, never the full name
+    display_name = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-total_amount']
+        indexes = [
+            models.Index(fields=['-total_amount'], name='contributor_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.display_name}: Ksh. {self.total_amount}"
+
+class C2BPayment(models.Model):
+    """Raw Daraja C2B confirmation, stored as-is and matched to a contribution later"""
+    trans_id = models.CharField(max_length=50, unique=True)
+    trans_time = models.DateTimeField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    bill_ref_number = models.CharField(max_length=50, blank=True, default="")
+    msisdn = models.CharField(max_length=20, blank=True, default="")
+    first_name = models.CharField(max_length=50, blank=True, default="")
+    last_name = models.CharField(max_length=50, blank=True, default="")
+    payload = models.TextField()
+    contribution = models.ForeignKey(
+        Contribution, null=True, blank=True, on_delete=models.SET_NULL, related_name='c2b_payments'
+    )
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "C2B Payment"
+
+    def __str__(self):
+        return f"{self.trans_id} - Ksh. {self.amount}"
+
+    @property
+    def full_name(self):
+        return " ".join(part for part in (self.first_name, self.last_name) if part).title()
+
+class QueuedStkPush(models.Model):
+    """STK push deferred while Daraja is unavailable, retried by `manage.py retry_stk_pushes`"""
+    contribution = models.OneToOneField(Contribution, on_delete=models.CASCADE, related_name='queued_stk_push')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        verbose_name = "Queued STK Push"
+
+    def __str__(self):
+        return f"STK push for {self.contribution}"
+
+
+class ArchivedContribution(models.Model):
+    """Abandoned STK attempt moved out of the contributions table by `manage.py archive_contributions`"""
+    original_id = models.BigIntegerField(unique=True)
+    full_name = models.CharField(max_length=100)
+    email = models.EmailField(max_length=254, blank=True, null=True)
+    phone_number = models.CharField(max_length=15)
+    phone_normalized = models.CharField(max_length=15, blank=True, default='')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.PositiveSmallIntegerField(choices=Contribution.Status.choices)
+    mpesa_transaction_id = models.CharField(max_length=50, blank=True, null=True)
+    is_verified = models.BooleanField(default=False)
+    checkout_request_id = models.CharField(max_length=100, blank=True, null=True)
+    # Daraja app the push went out with, needed to query a checkout after the fact
+    shard = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Archived Contribution"
+
+    def __str__(self):
+        return f"{self.full_name} - Ksh. {self.amount} ({self.get_status_display()})"
@@ -0,0 +1,280 @@
+"""Daraja (M-Pesa) API client.
+
+Every outbound call goes through `daraja_request`, which applies the
+request timeout and the shared circuit breaker.  When Daraja is down the
+breaker opens and calls raise CircuitOpen straight away instead of tying
+up a worker until the TCP timeout.
+
+Calls are made with one of the Daraja apps ("shards") in
+MPESA_CREDENTIALS, or the single app configured by CONSUMER_KEY and
+friends.  Each shard has its own breaker and cached OAuth token; shards.py
+decides which one a new push goes to.
+"""
+import base64
+import hashlib
+import logging
+import time
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.dispatch import Signal
+from urllib3.exceptions import NewConnectionError
+
+from .breaker import CircuitBreaker, CircuitOpen
+from .settings_cache import get_active_settings
+
+logger = logging.getLogger(__name__)
+
+# retrieving M-Pesa variables from Django settings
+CONSUMER_KEY = settings.CONSUMER_KEY
+CONSUMER_SECRET = settings.CONSUMER_SECRET
+MPESA_PASSKEY = settings.MPESA_PASSKEY
+MPESA_BASE_URL = settings.MPESA_BASE_URL
+MPESA_SHORTCODE = settings.MPESA_SHORTCODE
+CALLBACK_URL = settings.CALLBACK_URL
+
+DEFAULT_SHARD = 'default'
+TOKEN_KEY_PREFIX = 'camp_meeting:daraja_token'
+# Tokens are reused until this many seconds before Daraja expires them
+TOKEN_EXPIRY_MARGIN = 60
+
+# One breaker per shard for the life of the process, however often the shards are rebuilt
+_breakers = {}
+
+
+def breaker_for(shard_name):
+    if shard_name not in _breakers:
+        name = 'daraja' if shard_name == DEFAULT_SHARD else f'daraja:{shard_name}'
+        _breakers[shard_name] = CircuitBreaker(name, **settings.DARAJA_BREAKER)
+    return _breakers[shard_name]
+
+
+daraja_breaker = breaker_for(DEFAULT_SHARD)
+
+# Sent with method, url, status (None when no response came back) and
+# duration in seconds after every HTTP call to Daraja
+daraja_request_finished = Signal()
+
+
+class DarajaUnavailable(Exception):
+    """Daraja timed out, refused the connection or answered with a gateway error"""
+
+    def __init__(self, message, request_sent=True):
+        super().__init__(message)
+        # False when the request never reached Daraja, so retrying can't double-charge
+        self.request_sent = request_sent
+
+
+class Shard:
+    """One Daraja app: its credentials, shortcode, breaker, token and budget"""
+
+    def __init__(self, name, consumer_key, consumer_secret, passkey, shortcode, base_url=None,
+                 callback_url=None, max_in_flight=None, rate=None):
+        self.name = name
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        # The STK password is built from both, so they always come from the same app
+        self.passkey = passkey
+        self.shortcode = shortcode
+        self.base_url = base_url or MPESA_BASE_URL
+        self.callback_url = callback_url or CALLBACK_URL
+        self.max_in_flight = max_in_flight or settings.DARAJA_MAX_IN_FLIGHT
+        # Calls per second allowed by Daraja for this app, None for no limit of our own
+        self.rate = rate
+        self.breaker = breaker_for(name)
+        # Rotating the key under the same name mustn't reuse the old app's token
+        key_hash = hashlib.sha256(consumer_key.encode()).hexdigest()[:12]
+        self.token_key = f'{TOKEN_KEY_PREFIX}:{name}:{key_hash}'
+
+    def __repr__(self):
+        return f'<Shard {self.name}>'
+
+
+def get_shards():
+    """The Daraja apps in MPESA_CREDENTIALS, or the single one from CONSUMER_KEY etc."""
+    if not settings.MPESA_CREDENTIALS:
+        return [Shard(DEFAULT_SHARD, CONSUMER_KEY, CONSUMER_SECRET, MPESA_PASSKEY, MPESA_SHORTCODE)]
+    for credentials in settings.MPESA_CREDENTIALS:
+        if not credentials.get('shortcode') or not credentials.get('passkey'):
+            raise ImproperlyConfigured(
+                f"MPESA_CREDENTIALS app {credentials.get('name')!r} needs its own shortcode and passkey"
+            )
+    return [Shard(**credentials) for credentials in settings.MPESA_CREDENTIALS]
+
+
+def get_shard(name=None):
+    """The shard called `name`; the first one for blank or unknown names, like rows from before sharding"""
+    shards = get_shards()
+    return next((shard for shard in shards if shard.name == name), shards[0])
+
+
+def _never_sent(error):
+    """True for errors raised before the request reached Daraja (refused, unresolvable, connect timeout)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    cause = error.args[0] if error.args else None
+    return isinstance(getattr(cause, 'reason', cause), NewConnectionError)
+
+
+def _send(method, url, **kwargs):
+    started = time.perf_counter()
+    status = None
+    try:
+        response = requests.request(method, url, timeout=settings.MPESA_TIMEOUT, **kwargs)
+        status = response.status_code
+    except requests.RequestException as e:
+        raise DarajaUnavailable(str(e), request_sent=not _never_sent(e))
+    finally:
+        daraja_request_finished.send(
+            sender=None, method=method, url=url, status=status, duration=time.perf_counter() - started,
+        )
+    raise_for_gateway_error(response.status_code)
+    return response
+
+
+def raise_for_gateway_error(status_code):
+    if status_code in (502, 503, 504):
+        # Only a gateway timeout may have let the request through
+        raise DarajaUnavailable(f"Daraja returned HTTP {status_code}", request_sent=status_code == 504)
+
+
+def daraja_request(method, url, shard=None, **kwargs):
+    """Send one request to Daraja through the shard's circuit breaker"""
+    breaker = shard.breaker if shard else daraja_breaker
+    return breaker.call(_send, method, url, failure_exceptions=(DarajaUnavailable,), **kwargs)
+
+
+def token_request(shard):
+    """URL and headers for an OAuth token request"""
+    url = f"{shard.base_url}/oauth/v1/generate?grant_type=client_credentials"
+    # encodeing credentials
+    encoded_credentials = base64.b64encode(f"{shard.consumer_key}:{shard.consumer_secret}".encode()).decode()
+    return url, {'Authorization': f"Basic {encoded_credentials}", 'Content-Type': 'application/json'}
+
+
+def token_ttl(response):
+    """How long to keep a token from Daraja's OAuth response"""
+    try:
+        expires_in = int(response.get('expires_in', 3599))
+    except (TypeError, ValueError):
+        expires_in = 3599
+    return max(1, expires_in - TOKEN_EXPIRY_MARGIN)
+
+
+def stk_password(shortcode, passkey):
+    """(password, timestamp) for STK push and query requests"""
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    return base64.b64encode((shortcode + passkey + timestamp).encode()).decode(), timestamp
+
+
+def account_reference(account_number, contribution_id):
+    """'Camp2025-123': the camp's account number tagged with the contribution, cut to Daraja's 12 characters.
+
+    A paybill's C2B confirmation of the push carries this as BillRefNumber,
+    which is how c2b.py finds the contribution it pays.
+    """
+    suffix = f"-{contribution_id}"
+    return f"{account_number[:max(0, 12 - len(suffix))]}{suffix}"
+
+
+def stk_push_payload(phone_number, amount, camp_settings, shard, contribution_id=None):
+    # camp_settings.paybill_number is only shown to members, Daraja gets the app's own shortcode
+    shortcode = shard.shortcode
+    password, timestamp = stk_password(shortcode, shard.passkey)
+    return {
+        "BusinessShortCode": shortcode,
+        "Password": password,
+        "Timestamp":timestamp,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": amount,
+        "PartyA":phone_number,
+        "PartyB":shortcode,
+        "PhoneNumber":phone_number,
+        "CallBackURL": shard.callback_url,
+        "AccountReference": (
+            account_reference(camp_settings.account_number, contribution_id) if contribution_id
+            else camp_settings.account_number
+        ),
+        "TransactionDesc":"Camp2025"
+    }
+
+
+def stk_query_payload(checkout_request_id, shortcode, passkey):
+    password, timestamp = stk_password(shortcode, passkey)
+    return {
+        "BusinessShortCode": shortcode,
+        "Password": password,
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id
+    }
+
+
+def generate_access_token(shard=None):
+    """OAuth token for the shard, from the shared cache while it's still valid"""
+    shard = shard or get_shard()
+    token = cache.get(shard.token_key)
+    if token:
+        return token
+    try:
+        url, headers = token_request(shard)
+
+        # sending requests
+        response = daraja_request('GET', url, shard, headers=headers).json()
+
+        # checking if there are errors
+        if "access_token" in response:
+            cache.set(shard.token_key, response['access_token'], token_ttl(response))
+            return response['access_token']
+        else:
+            raise Exception("Access token not found in response")
+    except (CircuitOpen, DarajaUnavailable):
+        raise
+    except Exception as e:
+        raise Exception(f"Error generating access token: {str(e)}")
+
+def initiate_stk_push(phone_number, amount, contribution_id, shard=None):
+    shard = shard or get_shard()
+    try:
+        token = generate_access_token(shard)
+        url = f"{shard.base_url}/mpesa/stkpush/v1/processrequest"
+        headers = {
+            'Authorization': f"Bearer {token}",
+            'Content-Type': 'application/json'
+        }
+
+        payload = stk_push_payload(phone_number, amount, get_active_settings(), shard, contribution_id)
+
+        # sending the requests
+        response = daraja_request('POST', url, shard, headers=headers, json=payload).json()
+
+        return response
+
+    except (CircuitOpen, DarajaUnavailable):
+        raise
+    except Exception as e:
+        raise Exception(f"Error sending STK push: {str(e)}")
+
+def query_stk_push(checkout_request_id, shard=None):
+    """Ask the shard that sent the push how it went"""
+    shard = shard or get_shard()
+    try:
+        url = f"{shard.base_url}/mpesa/stkpushquery/v1/query"
+        access_token = generate_access_token(shard)
+
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+
+        request_body = stk_query_payload(checkout_request_id, shard.shortcode, shard.passkey)
+
+        response = daraja_request('POST', url, shard, json=request_body, headers=headers)
+        logger.debug("STK query response for %s: %s", checkout_request_id, response.json())
+        return response.json()
+
+    except ValueError as e:
+        logger.warning("Error querying STK push status for %s: %s", checkout_request_id, e)
+        return {"error": str(e)}
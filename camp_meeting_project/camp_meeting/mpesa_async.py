@@ -0,0 +1,110 @@
+"""Async Daraja client for the views served under ASGI.
+
+The same calls as mpesa.py over httpx, so a request waiting on Daraja
+doesn't hold a thread.  Requests go through the same per-shard circuit
+breakers and cached tokens, send the same daraja_request_finished signal
+and raise the same DarajaUnavailable, so callers handle both clients alike.
+"""
+import asyncio
+import time
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import mpesa
+from .breaker import CircuitOpen
+from .mpesa import DarajaUnavailable, daraja_request_finished, get_shard, raise_for_gateway_error
+from .settings_cache import get_active_settings
+
+# httpx clients are bound to the event loop they were first used on
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """The pooled client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        connect, read = settings.MPESA_TIMEOUT
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=settings.DARAJA_MAX_IN_FLIGHT),
+        )
+    return client
+
+
+def _never_sent(error):
+    """True for errors raised before the request reached Daraja"""
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+async def _send(method, url, **kwargs):
+    started = time.perf_counter()
+    status = None
+    try:
+        response = await get_client().request(method, url, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        raise DarajaUnavailable(str(e) or type(e).__name__, request_sent=not _never_sent(e))
+    finally:
+        daraja_request_finished.send(
+            sender=None, method=method, url=url, status=status, duration=time.perf_counter() - started,
+        )
+    raise_for_gateway_error(response.status_code)
+    return response
+
+
+async def adaraja_request(method, url, shard, **kwargs):
+    """Send one request to Daraja through the shard's circuit breaker"""
+    return await shard.breaker.acall(_send, method, url, failure_exceptions=(DarajaUnavailable,), **kwargs)
+
+
+async def agenerate_access_token(shard):
+    token = await cache.aget(shard.token_key)
+    if token:
+        return token
+    try:
+        url, headers = mpesa.token_request(shard)
+        response = (await adaraja_request('GET', url, shard, headers=headers)).json()
+        if "access_token" in response:
+            await cache.aset(shard.token_key, response['access_token'], mpesa.token_ttl(response))
+            return response['access_token']
+        raise Exception("Access token not found in response")
+    except (CircuitOpen, DarajaUnavailable):
+        raise
+    except Exception as e:
+        raise Exception(f"Error generating access token: {str(e)}")
+
+
+async def ainitiate_stk_push(phone_number, amount, contribution_id, shard=None):
+    shard = shard or get_shard()
+    try:
+        token = await agenerate_access_token(shard)
+        camp_settings = await sync_to_async(get_active_settings)()
+        response = await adaraja_request(
+            'POST', f"{shard.base_url}/mpesa/stkpush/v1/processrequest", shard,
+            headers={'Authorization': f"Bearer {token}", 'Content-Type': 'application/json'},
+            json=mpesa.stk_push_payload(phone_number, amount, camp_settings, shard, contribution_id),
+        )
+        return response.json()
+    except (CircuitOpen, DarajaUnavailable):
+        raise
+    except Exception as e:
+        raise Exception(f"Error sending STK push: {str(e)}")
+
+
+async def aquery_stk_push(checkout_request_id, shard=None):
+    shard = shard or get_shard()
+    try:
+        token = await agenerate_access_token(shard)
+        response = await adaraja_request(
+            'POST', f"{shard.base_url}/mpesa/stkpushquery/v1/query", shard,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            json=mpesa.stk_query_payload(checkout_request_id, shard.shortcode, shard.passkey),
+        )
+        return response.json()
+    except ValueError as e:
+        return {"error": str(e)}
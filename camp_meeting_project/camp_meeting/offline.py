@@ -0,0 +1,110 @@
+"""Offline support for the landing page.
+
+The service worker (templates/camp_meeting/sw.js, served by
+views.service_worker) precaches the page and its assets, serves the page
+stale-while-revalidate, keeps the last stats it saw for when there is no
+network and queues contributions made offline, replaying them once the
+connection is back.
+
+A replayed contribution may have reached us the first time, only for the
+response to get lost on the way back.  The page sends an X-Submission-Id
+with every contribution and once_per_submission answers repeats with the
+first response instead of sending the donor a second STK push.
+"""
+import hashlib
+from functools import lru_cache, wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import get_template
+
+# Same-origin static files the landing page can't render without
+PRECACHE_STATIC = [
+    'css/styles.css',
+    'camp_meeting/adventist-symbol--white.svg',
+    'camp_meeting/adventist-symbol--campfire.svg',
+]
+# Keep in step with the <head> of landing.html
+CDN_ASSETS = [
+    'https://cdn.tailwindcss.com',
+    'https://cdn.jsdelivr.net/npm/daisyui@4.4.0/dist/full.min.css',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+]
+
+SUBMISSION_HEADER = 'HTTP_X_SUBMISSION_ID'
+SUBMISSION_KEY_PREFIX = 'camp_meeting:submission'
+# Longer than the service worker keeps a contribution queued
+SUBMISSION_TTL = 60 * 60 * 24
+IN_PROGRESS = 'in-progress'
+
+
+@lru_cache(maxsize=None)
+def shell_version():
+    """Hash of the precached files and the service worker, so a deploy that changes them gets new caches"""
+    digest = hashlib.sha256()
+    for path in PRECACHE_STATIC:
+        found = finders.find(path)
+        if found:
+            with open(found, 'rb') as f:
+                digest.update(f.read())
+    with open(get_template('camp_meeting/sw.js').origin.name, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def submission_key(request):
+    submission_id = request.META.get(SUBMISSION_HEADER, '')
+    if not submission_id or len(submission_id) > 64:
+        return None
+    return f'{SUBMISSION_KEY_PREFIX}:{submission_id}'
+
+
+def earlier_response(key):
+    """The response for a submission we've already seen, or None after claiming it for this request"""
+    if cache.add(key, IN_PROGRESS, SUBMISSION_TTL):
+        return None
+    stored = cache.get(key)
+    if stored is None or stored == IN_PROGRESS:
+        return JsonResponse({'success': False, 'message': 'This contribution is already being processed'}, status=409)
+    status, content = stored
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def remember_response(key, response):
+    if response.status_code >= 500:
+        # Nothing was settled, let a retry try again
+        cache.delete(key)
+    else:
+        cache.set(key, (response.status_code, response.content), SUBMISSION_TTL)
+
+
+def once_per_submission(view):
+    """Answer repeats of an X-Submission-Id with the first response, for a sync or async view"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key = submission_key(request)
+            if key is None:
+                return await view(request, *args, **kwargs)
+            earlier = await sync_to_async(earlier_response)(key)
+            if earlier is not None:
+                return earlier
+            response = await view(request, *args, **kwargs)
+            await sync_to_async(remember_response)(key, response)
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = submission_key(request)
+        if key is None:
+            return view(request, *args, **kwargs)
+        earlier = earlier_response(key)
+        if earlier is not None:
+            return earlier
+        response = view(request, *args, **kwargs)
+        remember_response(key, response)
+        return response
+    return wrapper
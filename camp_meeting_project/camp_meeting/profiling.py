@@ -0,0 +1,247 @@
+"""On-demand profiling of single requests, for staff.
+
+Add `?_profile=1` to a URL, or send an `X-Profile: 1` header, while logged
+in as staff and the request runs under cProfile.  Every SQL query (with
+its duration and the line of our code that issued it) and every outbound
+Daraja call is recorded alongside.  The results are written to
+PROFILING_DIR as a .prof file for snakeviz/pstats and an HTML summary, and
+the response carries an X-Profile-Url header pointing at the summary.
+
+Requests without the trigger only pay for two dict lookups.  Under ASGI
+an async view's ORM work runs in the sync_to_async thread, not on the event
+loop, so queries are recorded and a second profiler runs on both threads.
+The event loop profile also picks up coroutines of other requests in flight
+at the same time.
+
+Only one request per process is profiled at a time: from Python 3.12
+cProfile sits on sys.monitoring, which allows a single active profiler
+per process.  A request that asks while another is being profiled runs
+normally and gets an X-Profile-Skipped header instead.
+"""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .mpesa import daraja_request_finished
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOP_FUNCTIONS = 40
+
+_current = ContextVar('camp_meeting_request_profile', default=None)
+# Held while a request is profiled, see the module docstring
+_profiling = threading.Lock()
+# Before 3.12 a profiler only sees the thread that enabled it; from 3.12 it sees them all
+SEPARATE_THREAD_PROFILER = sys.version_info < (3, 12)
+
+
+def profiling_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def profile_paths(profile_id):
+    """(.prof, .html) paths for a profile id"""
+    base = profiling_dir() / str(profile_id)
+    return base.with_suffix('.prof'), base.with_suffix('.html')
+
+
+def _origin():
+    """file:line of the innermost frame in our own code, skipping this module"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(base_dir) and frame.filename != __file__:
+            return f"{Path(frame.filename).relative_to(base_dir)}:{frame.lineno} in {frame.name}"
+    return ''
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.id = uuid.uuid4()
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.profiler = cProfile.Profile()
+        # For the thread that runs an async request's thread-sensitive sync_to_async calls
+        self.thread_profiler = cProfile.Profile()
+        self._thread_recording = None
+        self.queries = []
+        self.daraja_calls = []
+        self.ms = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'ms': (time.perf_counter() - started) * 1000,
+                'origin': _origin(),
+            })
+
+    def _recording(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self.record_query))
+        return stack
+
+    def run(self, get_response, request):
+        token = _current.set(self)
+        started = time.perf_counter()
+        try:
+            with self._recording():
+                return self.profiler.runcall(get_response, request)
+        finally:
+            self.ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+
+    def _start_thread(self):
+        # Connections are per thread, so the wrapper has to be installed from that thread
+        self._thread_recording = self._recording()
+        if SEPARATE_THREAD_PROFILER:
+            self.thread_profiler.enable()
+
+    def _stop_thread(self):
+        if SEPARATE_THREAD_PROFILER:
+            self.thread_profiler.disable()
+        self._thread_recording.close()
+
+    async def arun(self, get_response, request):
+        token = _current.set(self)
+        started = time.perf_counter()
+        # Thread sensitive, like the ORM calls of the view, so it lands on the same thread
+        await sync_to_async(self._start_thread)()
+        try:
+            with self._recording():
+                self.profiler.enable()
+                try:
+                    return await get_response(request)
+                finally:
+                    self.profiler.disable()
+        finally:
+            await sync_to_async(self._stop_thread)()
+            self.ms = (time.perf_counter() - started) * 1000
+            _current.reset(token)
+
+    def stats(self, stream=None):
+        """Both profilers' stats combined"""
+        stats = pstats.Stats(self.profiler, stream=stream)
+        if self._thread_recording is not None and SEPARATE_THREAD_PROFILER:
+            try:
+                stats.add(self.thread_profiler)
+            except TypeError:
+                pass  # nothing ran on the sync thread
+        return stats
+
+    def top_functions(self):
+        stream = io.StringIO()
+        self.stats(stream).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        return stream.getvalue()
+
+    def save(self):
+        profiling_dir().mkdir(parents=True, exist_ok=True)
+        prof_path, html_path = profile_paths(self.id)
+        self.stats().dump_stats(prof_path)
+
+        repeated = Counter(query['sql'] for query in self.queries)
+        html_path.write_text(render_to_string('camp_meeting/profile.html', {
+            'profile': self,
+            'sql_ms': sum(query['ms'] for query in self.queries),
+            'slowest_queries': sorted(self.queries, key=lambda query: query['ms'], reverse=True),
+            'repeated_queries': [(sql, count) for sql, count in repeated.most_common() if count > 1],
+            'daraja_ms': sum(call['ms'] for call in self.daraja_calls),
+            'top_functions': self.top_functions(),
+        }))
+        prune_profiles()
+
+
+def prune_profiles():
+    """Keep only the newest PROFILING_KEEP profiles"""
+    summaries = sorted(profiling_dir().glob('*.html'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for html_path in summaries[settings.PROFILING_KEEP:]:
+        html_path.unlink(missing_ok=True)
+        html_path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def record_daraja_call(sender, method, url, status, duration, **kwargs):
+    profile = _current.get()
+    if profile is not None:
+        profile.daraja_calls.append({'method': method, 'url': url, 'status': status, 'ms': duration * 1000})
+
+
+daraja_request_finished.connect(record_daraja_call)
+
+
+def _requested(request):
+    return PROFILE_HEADER in request.META or PROFILE_PARAM in request.GET
+
+
+def _link(response, profile):
+    response['X-Profile-Id'] = str(profile.id)
+    response['X-Profile-Url'] = reverse('camp_meeting:profile_summary', args=[profile.id])
+    return response
+
+
+def _skipped(response):
+    response['X-Profile-Skipped'] = 'Another request is being profiled'
+    return response
+
+
+class ProfilingMiddleware:
+    """Profile staff requests that ask for it. Must come after AuthenticationMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+
+        if not _profiling.acquire(blocking=False):
+            return _skipped(self.get_response(request))
+        try:
+            profile = RequestProfile(request)
+            response = profile.run(self.get_response, request)
+        finally:
+            _profiling.release()
+        profile.save()
+        return _link(response, profile)
+
+    async def __acall__(self, request):
+        if not _requested(request):
+            return await self.get_response(request)
+        # request.user loads the session and user from the database
+        if not await sync_to_async(lambda: request.user.is_staff)():
+            return await self.get_response(request)
+
+        if not _profiling.acquire(blocking=False):
+            return _skipped(await self.get_response(request))
+        try:
+            profile = RequestProfile(request)
+            response = await profile.arun(self.get_response, request)
+        finally:
+            _profiling.release()
+        await sync_to_async(profile.save)()
+        return _link(response, profile)
@@ -0,0 +1,196 @@
+"""Admission control for the endpoints that reach Daraja.
+
+Everything lives in the cache, so with a shared CACHE_URL every worker
+sees the same limits (the per-process default only limits each worker on
+its own).
+
+Limits are token buckets: a bucket holds up to `capacity` tokens and
+refills continuously at capacity/period tokens a second, so a client that
+used up its burst gets one request through every period/capacity seconds
+rather than a fresh burst at a window boundary.  A bucket's state is the
+token count and the time it was last refilled, updated under a short
+cache.add lock.  On top of that a global cap bounds how many Daraja calls
+may be in flight at once; those counters only change through incr/decr.
+"""
+import json
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .utils import normalize_phone_number
+
+KEY_PREFIX = 'camp_meeting:ratelimit'
+IN_FLIGHT_KEY = 'camp_meeting:daraja_in_flight'
+# A worker killed mid-call never releases its slot; the counter resets once no call
+# has started for this long (every new call pushes the expiry back)
+IN_FLIGHT_TTL = 120
+# A bucket's lock is given up on after this many seconds, in case its holder died
+BUCKET_LOCK_TIMEOUT = 1
+
+
+class DarajaOverloaded(Exception):
+    pass
+
+
+@contextmanager
+def bucket_lock(cache_key):
+    lock_key = f'{cache_key}:lock'
+    deadline = time.monotonic() + BUCKET_LOCK_TIMEOUT
+    while not cache.add(lock_key, True, BUCKET_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            break
+        time.sleep(0.001)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+def take_token(key, capacity, period):
+    """Take one token from a bucket refilled at capacity/period a second. Returns (allowed, seconds to wait)."""
+    if capacity <= 0:
+        return False, period
+    rate = capacity / period
+    cache_key = f'{KEY_PREFIX}:{key}:{capacity}:{period}'
+    with bucket_lock(cache_key):
+        now = time.time()
+        tokens, refilled_at = cache.get(cache_key, (capacity, now))
+        tokens = min(capacity, tokens + max(0.0, now - refilled_at) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # An untouched bucket is full again after `period`, so its state can go
+        cache.set(cache_key, (tokens, now), period + 1)
+    return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+def enter_in_flight(key):
+    """Count one more call in flight under `key`. Returns the new count."""
+    cache.add(key, 0, IN_FLIGHT_TTL)
+    try:
+        in_flight = cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, IN_FLIGHT_TTL)
+        return 1
+    # incr keeps the expiry set by add, a busy counter must not vanish under its calls
+    cache.touch(key, IN_FLIGHT_TTL)
+    return in_flight
+
+
+def leave_in_flight(key):
+    try:
+        in_flight = cache.decr(key)
+    except ValueError:
+        return
+    if in_flight < 0:
+        # A call that started before the counter last expired
+        cache.incr(key, -in_flight)
+
+
+async def aenter_in_flight(key):
+    """enter_in_flight without blocking the event loop on the cache"""
+    await cache.aadd(key, 0, IN_FLIGHT_TTL)
+    try:
+        in_flight = await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 1, IN_FLIGHT_TTL)
+        return 1
+    await cache.atouch(key, IN_FLIGHT_TTL)
+    return in_flight
+
+
+async def aleave_in_flight(key):
+    try:
+        in_flight = await cache.adecr(key)
+    except ValueError:
+        return
+    if in_flight < 0:
+        await cache.aincr(key, -in_flight)
+
+
+@contextmanager
+def daraja_slot(max_in_flight=None):
+    """Hold one of the `max_in_flight` (default DARAJA_MAX_IN_FLIGHT) slots for an outbound Daraja call"""
+    in_flight = enter_in_flight(IN_FLIGHT_KEY)
+    try:
+        if in_flight > (settings.DARAJA_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight):
+            raise DarajaOverloaded()
+        yield
+    finally:
+        leave_in_flight(IN_FLIGHT_KEY)
+
+
+@asynccontextmanager
+async def adaraja_slot(max_in_flight=None):
+    """daraja_slot for async views"""
+    in_flight = await aenter_in_flight(IN_FLIGHT_KEY)
+    try:
+        if in_flight > (settings.DARAJA_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight):
+            raise DarajaOverloaded()
+        yield
+    finally:
+        await aleave_in_flight(IN_FLIGHT_KEY)
+
+
+def too_many_requests(retry_after):
+    response = JsonResponse(
+        {'success': False, 'message': 'Too many requests. Please try again shortly.'},
+        status=429,
+    )
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def client_ip(request):
+    return request.META.get(settings.RATE_LIMIT_IP_HEADER) or request.META.get('REMOTE_ADDR', '')
+
+
+def request_phone(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    phone = normalize_phone_number(data.get('phone_number')) if isinstance(data, dict) else ''
+    return phone or None
+
+
+def check_rate_limits(endpoint, request):
+    """A 429 response if `request` is over any RATE_LIMITS rule for `endpoint`, else None"""
+    for scope, capacity, period in settings.RATE_LIMITS.get(endpoint, []):
+        if scope == 'ip':
+            key = client_ip(request)
+        elif scope == 'phone':
+            key = request_phone(request)
+            if key is None:
+                continue
+        else:
+            key = 'all'
+        allowed, retry_after = take_token(f'{endpoint}:{scope}:{key}', capacity, period)
+        if not allowed:
+            return too_many_requests(retry_after)
+    return None
+
+
+def rate_limited(endpoint):
+    """Apply the RATE_LIMITS rules configured for `endpoint` to a sync or async view"""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                limited = await sync_to_async(check_rate_limits)(endpoint, request)
+                if limited is not None:
+                    return limited
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return check_rate_limits(endpoint, request) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
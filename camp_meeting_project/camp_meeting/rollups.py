@@ -0,0 +1,148 @@
+"""Incrementally maintained hourly rollups of contributions.
+
+Each ContributionRollup row holds the count and total amount of the
+contributions created in one hour with one status.  Saving a
+contribution moves it between rows (see signals.py), so trend queries
+read a few hundred rollup rows instead of scanning every contribution.
+Archived contributions (see archive.py) stay counted.
+"""
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import ArchivedContribution, Contribution, ContributionRollup
+
+
+def bucket_for(moment):
+    """Start of the hour a contribution falls into"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(status, amount, created_at):
+    """The (bucket, status, amount) a contribution currently counts towards"""
+    if created_at is None or amount is None:
+        return None
+    return (bucket_for(created_at), status, Decimal(str(amount)))
+
+
+def apply_delta(bucket, status, count, amount, using=DEFAULT_DB_ALIAS):
+    """Add count/amount to one rollup row, creating it if needed"""
+    rows = ContributionRollup.objects.using(using).filter(bucket=bucket, status=status)
+    updated = rows.update(count=F('count') + count, total_amount=F('total_amount') + amount)
+    if updated:
+        return
+    try:
+        with transaction.atomic(using=using):
+            ContributionRollup.objects.using(using).create(bucket=bucket, status=status, count=count,
+                                                           total_amount=amount)
+    except IntegrityError:
+        # Another writer created the row between our update and insert
+        rows.update(count=F('count') + count, total_amount=F('total_amount') + amount)
+
+
+def record_transition(old_key, new_key, using=DEFAULT_DB_ALIAS):
+    """Move one contribution from its old rollup row to its new one"""
+    if old_key == new_key:
+        return
+    with transaction.atomic(using=using):
+        if old_key is not None:
+            bucket, status, amount = old_key
+            apply_delta(bucket, status, -1, -amount, using=using)
+        if new_key is not None:
+            bucket, status, amount = new_key
+            apply_delta(bucket, status, 1, amount, using=using)
+
+
+def record_many(contributions, using=DEFAULT_DB_ALIAS):
+    """Count freshly bulk-inserted contributions, which bypass post_save"""
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for contribution in contributions:
+        key = rollup_key(contribution.status, contribution.amount, contribution.created_at)
+        if key is None:
+            continue
+        bucket, status, amount = key
+        deltas[(bucket, status)][0] += 1
+        deltas[(bucket, status)][1] += amount
+
+    with transaction.atomic(using=using):
+        for (bucket, status), (count, amount) in deltas.items():
+            apply_delta(bucket, status, count, amount, using=using)
+
+
+def rebuild_rollups(start=None, end=None, using=DEFAULT_DB_ALIAS):
+    """Recompute the rollups for [start, end) from the contributions and archive tables.
+
+    Returns the number of rollup rows written.
+    """
+    if start is not None:
+        start = bucket_for(start)
+    if end is not None and bucket_for(end) != end:
+        end = bucket_for(end) + timedelta(hours=1)
+
+    rollups = ContributionRollup.objects.using(using)
+    if start is not None:
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        rollups = rollups.filter(bucket__lt=end)
+
+    # One transaction for the read and the swap, so the rollups match a single snapshot
+    with transaction.atomic(using=using):
+        totals = _aggregate(start, end, using)
+        rollups.delete()
+        created = ContributionRollup.objects.using(using).bulk_create([
+            ContributionRollup(bucket=bucket, status=status, count=count, total_amount=total_amount)
+            for (bucket, status), (count, total_amount) in totals.items()
+        ])
+    return len(created)
+
+
+def _aggregate(start, end, using):
+    """{(bucket, status): [count, total_amount]} straight from the contributions and archive tables"""
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for model in (Contribution, ArchivedContribution):
+        contributions = model.objects.using(using)
+        if start is not None:
+            contributions = contributions.filter(created_at__gte=start)
+        if end is not None:
+            contributions = contributions.filter(created_at__lt=end)
+        rows = (
+            contributions.order_by()
+            .annotate(rollup_bucket=TruncHour('created_at', tzinfo=dt_timezone.utc))
+            .values('rollup_bucket', 'status')
+            .annotate(count=Count('id'), total_amount=Sum('amount'))
+        )
+        for row in rows:
+            total = totals[(row['rollup_bucket'], row['status'])]
+            total[0] += row['count']
+            total[1] += row['total_amount'] or 0
+    return totals
+
+
+def get_trends(granularity='day', status=Contribution.Status.COMPLETED, start=None, end=None):
+    """Totals per day (or per hour of day) read from the rollups only"""
+    rollups = ContributionRollup.objects.filter(status=status, count__gt=0)
+    if start is not None:
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        rollups = rollups.filter(bucket__lt=end)
+
+    totals = defaultdict(lambda: {'count': 0, 'total_amount': Decimal('0')})
+    for bucket, count, total_amount in rollups.values_list('bucket', 'count', 'total_amount'):
+        local = timezone.localtime(bucket)
+        label = local.date().isoformat() if granularity == 'day' else local.hour
+        totals[label]['count'] += count
+        totals[label]['total_amount'] += total_amount
+
+    if granularity == 'hour':
+        labels = range(24)
+    else:
+        labels = sorted(totals)
+    return [
+        {'label': label, 'count': totals[label]['count'], 'total_amount': float(totals[label]['total_amount'])}
+        for label in labels
+    ]
@@ -0,0 +1,245 @@
+"""Synthetic contributions for testing at production scale.
+
+Rows are generated in fixed chunks, each from its own Random seeded with
+(seed, chunk start), so the same seed always produces the same rows no
+matter how often the seeding is interrupted or resumed.  They are written
+with plain multi-row INSERTs rather than model instances, which gets a
+million rows into SQLite in about half a minute.  The window ends on
+DEFAULT_END_DAY unless told otherwise, so the rows don't depend on the
+day they were seeded either.
+
+The data tries to look like a real fundraiser:
+
+- amounts cluster on round figures with a long log-normal tail
+- most STK attempts complete, the rest are cancelled, failed or left
+  pending, roughly as Daraja reports them
+- timestamps ramp up towards the end of the window and follow the day,
+  quiet at night with peaks in the morning, at lunch and in the evening
+- a small group of regular donors gives many times, most give once
+- completed rows get unique M-Pesa style receipt numbers
+"""
+import math
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from itertools import accumulate
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Contribution
+
+CHUNK_SIZE = 10000
+MIN_DONORS = 100
+# Last day of the 2025 camp meeting
+DEFAULT_END_DAY = date(2025, 8, 24)
+
+Status = Contribution.Status
+STATUS_WEIGHTS = [
+    (Status.COMPLETED, 68),
+    (Status.CANCELLED, 17),
+    (Status.FAILED, 9),
+    (Status.PENDING, 6),
+]
+# Relative activity for each local hour of the day, 00:00 to 23:00
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 5, 9, 11, 9, 8, 8, 10, 10, 8, 7, 7, 8, 11, 13, 12, 9, 6, 3]
+ROUND_AMOUNTS = [100, 200, 300, 500, 1000, 1500, 2000, 2500, 5000, 10000]
+ROUND_AMOUNT_WEIGHTS = [14, 12, 5, 20, 22, 4, 9, 3, 7, 4]
+
+
+def _cumulative(weights):
+    """Cumulative weights scaled to 1, so a draw is a bisect on rng.random()"""
+    totals = list(accumulate(weights))
+    return [total / totals[-1] for total in totals[:-1]]
+
+
+STATUS_VALUES = [int(status) for status, _ in STATUS_WEIGHTS]
+STATUS_CUMULATIVE = _cumulative([weight for _, weight in STATUS_WEIGHTS])
+HOUR_CUMULATIVE = _cumulative(HOUR_WEIGHTS)
+ROUND_AMOUNT_CUMULATIVE = _cumulative(ROUND_AMOUNT_WEIGHTS)
+
+FIRST_NAMES = [
+    'Grace', 'John', 'Mary', 'Peter', 'Ruth', 'David', 'Esther', 'Joseph', 'Faith', 'Samuel',
+    'Mercy', 'Daniel', 'Joyce', 'James', 'Ann', 'Paul', 'Lucy', 'Stephen', 'Naomi', 'Moses',
+]
+LAST_NAMES = [
+    'Wanjiku', 'Otieno', 'Achieng', 'Kamau', 'Njeri', 'Mwangi', 'Ochieng', 'Wambui', 'Kiprono', 'Mutua',
+    'Chebet', 'Odhiambo', 'Nyambura', 'Kiptoo', 'Akinyi', 'Mugo', 'Wekesa', 'Atieno', 'Karanja', 'Jepkosgei',
+]
+
+RECEIPT_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+RECEIPT_SPACE = 36 ** 9
+# Coprime with 36, so multiplying by it shuffles receipt numbers without collisions
+RECEIPT_MULTIPLIER = 1000000007
+
+COLUMNS = (
+    'full_name', 'email', 'phone_number', 'phone_normalized', 'amount', 'status',
+    'mpesa_transaction_id', 'is_verified', 'checkout_request_id', 'created_at', 'updated_at', 'shard',
+)
+
+
+def day_end(day):
+    """Local midnight after `day`, where a window ending on that day stops"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def receipt_number(index, seed):
+    """Unique 10 character receipt for row `index`, e.g. 'S4K0ZP1QAB'"""
+    value = (index * RECEIPT_MULTIPLIER + seed) % RECEIPT_SPACE
+    chars = []
+    for _ in range(9):
+        value, digit = divmod(value, 36)
+        chars.append(RECEIPT_ALPHABET[digit])
+    return 'S' + ''.join(reversed(chars))
+
+
+def donor(rng, index):
+    """Pick a donor for row `index`.
+
+    The pool grows with the rows so appending doesn't change earlier picks,
+    and squaring the uniform draw favours the low, regular donors.
+    """
+    return int(max(MIN_DONORS, index // 3) * rng.random() ** 2)
+
+
+def pick_amount(rng):
+    if rng.random() < 0.7:
+        return ROUND_AMOUNTS[bisect(ROUND_AMOUNT_CUMULATIVE, rng.random())]
+    amount = math.exp(rng.gauss(math.log(700), 1.1))
+    return max(10, min(250000, int(round(amount, -1))))
+
+
+def pick_offset(rng, days):
+    """Seconds into the window, busier towards its end and during the day"""
+    day = int(days * math.sqrt(rng.random()))
+    hour = bisect(HOUR_CUMULATIVE, rng.random())
+    return day * 86400 + hour * 3600 + int(rng.random() * 3600)
+
+
+class RowGenerator:
+    def __init__(self, seed, end, days):
+        self.seed = seed
+        self.days = days
+        self.start = timezone.localtime(end) - timedelta(days=days)
+        # Local midnights can move across DST changes, so resolve each day once.
+        # Rows carry naive UTC, which is what the connections use with
+        # USE_TZ on, and saves converting two datetimes per row on insert.
+        local_start = self.start.replace(tzinfo=None)
+        self.day_starts = [
+            timezone.make_naive(timezone.make_aware(local_start + timedelta(days=day)), dt_timezone.utc)
+            for day in range(days + 1)
+        ]
+
+    def chunk(self, start_index, count):
+        rng = random.Random(f"{self.seed}:{start_index}")
+        rows = []
+        for index in range(start_index, start_index + count):
+            donor_index = donor(rng, index)
+            phone = f"2547{(donor_index * 7919 + self.seed) % 10 ** 8:08d}"
+            first = FIRST_NAMES[donor_index % len(FIRST_NAMES)]
+            last = LAST_NAMES[(donor_index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+            status = STATUS_VALUES[bisect(STATUS_CUMULATIVE, rng.random())]
+            day, seconds = divmod(pick_offset(rng, self.days), 86400)
+            created_at = self.day_starts[day] + timedelta(seconds=seconds)
+            completed = status == Status.COMPLETED
+            rows.append((
+                f"{first} {last}",
+                f"{first}.{last}{donor_index}@example.com".lower() if donor_index % 5 else None,
+                phone,
+                phone,
+                pick_amount(rng),
+                status,
+                receipt_number(index, self.seed) if completed else None,
+                completed,
+                f"ws_CO_{created_at:%d%m%Y%H%M%S}{index:09d}",
+                created_at,
+                created_at + timedelta(seconds=5 + int(rng.random() * 85)),
+            ))
+        return rows
+
+
+def _insert(connection, rows):
+    ops = connection.ops
+    table = ops.quote_name(Contribution._meta.db_table)
+    columns = ', '.join(ops.quote_name(column) for column in COLUMNS)
+    placeholders = ', '.join(['%s'] * len(COLUMNS))
+    # Multi-row INSERTs, kept under the backend's limit on bound parameters
+    per_statement = min(1000, (connection.features.max_query_params or 100000) // len(COLUMNS))
+    params = [
+        (
+            # Amounts are whole shillings, which every backend takes as a decimal
+            full_name, email, phone, normalized, amount, status, receipt, verified, checkout,
+            ops.adapt_datetimefield_value(created_at),
+            ops.adapt_datetimefield_value(updated_at),
+            '',
+        )
+        for full_name, email, phone, normalized, amount, status, receipt, verified, checkout, created_at, updated_at
+        in rows
+    ]
+    with connection.cursor() as cursor:
+        # Skip the debug wrapper, with DEBUG on it formats and keeps every statement
+        cursor = cursor.cursor
+        for offset in range(0, len(params), per_statement):
+            batch = params[offset:offset + per_statement]
+            values = ', '.join([f'({placeholders})'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {values}",
+                [value for row in batch for value in row],
+            )
+
+
+@contextmanager
+def _bulk_load(connection, empty):
+    """Loosen durability on SQLite and, for an empty table, build the indexes last.
+
+    Inserting a million rows in random created_at/phone order into six
+    indexes is most of the cost of seeding; sorting the finished column
+    once per index is several times faster.  Neither can be done inside
+    a transaction, so under one (tests) the rows are simply inserted.
+    """
+    if connection.in_atomic_block:
+        yield
+        return
+    pragmas = {}
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for pragma, value in (('synchronous', 'OFF'), ('cache_size', '-262144'), ('temp_store', 'MEMORY')):
+                cursor.execute(f"PRAGMA {pragma}")
+                pragmas[pragma] = cursor.fetchone()[0]
+                cursor.execute(f"PRAGMA {pragma} = {value}")
+    indexes = Contribution._meta.indexes if empty else []
+    try:
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Contribution, index)
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Contribution, index)
+        if pragmas:
+            with connection.cursor() as cursor:
+                for pragma, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+def seed_contributions(rows, seed=42, using='default', end=None, days=90, start_index=0, progress=None):
+    """Insert contributions number start_index..rows-1 for `seed` into the `using` database.
+
+    `progress` is called with the number of rows written so far after
+    every chunk.  Returns the (start, end) datetimes the rows span.
+    """
+    end = end or day_end(DEFAULT_END_DAY)
+    generator = RowGenerator(seed, end, days)
+    connection = connections[using]
+    empty = not Contribution.objects.using(using).exists()
+    with _bulk_load(connection, empty):
+        for chunk_start in range(start_index - start_index % CHUNK_SIZE, rows, CHUNK_SIZE):
+            chunk = generator.chunk(chunk_start, min(CHUNK_SIZE, rows - chunk_start))
+            skip = max(0, start_index - chunk_start)
+            with transaction.atomic(using=using):
+                _insert(connection, chunk[skip:])
+            if progress:
+                progress(chunk_start + len(chunk))
+    return generator.start, end
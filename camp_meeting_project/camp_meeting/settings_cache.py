@@ -0,0 +1,73 @@
+"""Per-process cache for the active CampMeetingSettings row.
+
+The row is loaded once per process and reused until an admin saves or
+deletes a settings row.  Invalidation goes through a version token in
+the cache, so with a shared CACHE_URL every worker notices the change on
+its next request without having to query the database.  The copy is also
+dropped after SETTINGS_CACHE_TTL seconds, which bounds how stale a worker
+can get when the token can't reach it (per-process cache, evicted key).
+"""
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+VERSION_KEY = 'camp_meeting:settings_version'
+
+# (version, loaded at, settings) for this process
+_cached = (None, None, None)
+
+
+def _default_settings():
+    """Unsaved settings used until an admin creates a row"""
+    from .models import CampMeetingSettings
+
+    return CampMeetingSettings(
+        target_amount=Decimal('2300000.00'),
+        event_start_date=timezone.make_aware(datetime(2025, 8, 17)),
+        event_end_date=timezone.make_aware(datetime(2025, 8, 24)),
+        paybill_number='',
+        account_number='Camp2025',
+        is_active=True,
+    )
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_active_settings():
+    """Return the active CampMeetingSettings, hitting the DB only after a change"""
+    global _cached
+    from .models import CampMeetingSettings
+
+    version = _current_version()
+    cached_version, loaded_at, settings_obj = _cached
+    fresh = loaded_at is not None and time.monotonic() - loaded_at < settings.SETTINGS_CACHE_TTL
+    if settings_obj is not None and cached_version == version and fresh:
+        return settings_obj
+
+    # Always the primary: a lagging replica read right after a save would be
+    # cached under the new version until the next change
+    settings_obj = (
+        CampMeetingSettings.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True).order_by('-updated_at').first()
+        or _default_settings()
+    )
+    _cached = (version, time.monotonic(), settings_obj)
+    return settings_obj
+
+
+def invalidate_settings_cache():
+    """Force every process to reload the settings on next access"""
+    global _cached
+    _cached = (None, None, None)
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
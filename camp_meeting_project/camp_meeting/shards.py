@@ -0,0 +1,108 @@
+"""Spreading Daraja calls over several apps (credential sets).
+
+Daraja rate limits every app separately, so listing several apps in
+MPESA_CREDENTIALS raises the ceiling on STK pushes.  Each shard has its
+own circuit breaker and OAuth token (see mpesa.Shard) and its own budget:
+at most `max_in_flight` calls at once and, when `rate` is set, that many
+calls a second, both counted in the shared cache.  The cap on Daraja
+calls across all apps is the sum of their budgets, so each app added
+raises it; DARAJA_MAX_IN_FLIGHT is only the budget of an app that doesn't
+set its own.
+
+A new push goes to the healthy shard with the smallest share of its
+budget in flight, and the contribution remembers the shard so status
+queries use the credentials that sent the push.  Callbacks are matched on
+CheckoutRequestID and need no routing.
+"""
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from .breaker import CLOSED
+from .mpesa import get_shards
+from .ratelimit import (
+    IN_FLIGHT_KEY, DarajaOverloaded, adaraja_slot, daraja_slot, enter_in_flight, leave_in_flight, take_token,
+)
+
+
+def in_flight_key(shard):
+    return f'{IN_FLIGHT_KEY}:{shard.name}'
+
+
+def in_flight(shards):
+    """Calls in flight per shard name"""
+    counts = cache.get_many([in_flight_key(shard) for shard in shards])
+    return {shard.name: counts.get(in_flight_key(shard), 0) for shard in shards}
+
+
+def routing_order(shards):
+    """Shards to try for a new push: closed circuits first, then the least loaded"""
+    counts = in_flight(shards)
+    healthy = [shard for shard in shards if shard.breaker.available()]
+    # With every circuit open the first shard gets the push and raises CircuitOpen,
+    # so callers queue it just like they did with a single app
+    return sorted(
+        healthy, key=lambda shard: (shard.breaker.state != CLOSED, counts[shard.name] / shard.max_in_flight),
+    ) or shards[:1]
+
+
+def claim_shard(shard=None):
+    """Take a slot on `shard`, or on the first shard in routing order with room. Raises DarajaOverloaded."""
+    for candidate in [shard] if shard else routing_order(get_shards()):
+        key = in_flight_key(candidate)
+        if enter_in_flight(key) > candidate.max_in_flight:
+            leave_in_flight(key)
+            continue
+        if candidate.rate and not take_token(f'daraja:{candidate.name}', candidate.rate, 1)[0]:
+            leave_in_flight(key)
+            continue
+        return candidate
+    raise DarajaOverloaded()
+
+
+def release_shard(shard):
+    leave_in_flight(in_flight_key(shard))
+
+
+def total_budget():
+    """Daraja calls allowed in flight over every app together"""
+    return sum(shard.max_in_flight for shard in get_shards())
+
+
+@contextmanager
+def shard_slot(shard=None):
+    """daraja_slot plus a slot on `shard` (by default the best one for a new push), which it yields"""
+    with daraja_slot(total_budget()):
+        claimed = claim_shard(shard)
+        try:
+            yield claimed
+        finally:
+            release_shard(claimed)
+
+
+@asynccontextmanager
+async def ashard_slot(shard=None):
+    """shard_slot for async views"""
+    async with adaraja_slot(total_budget()):
+        claimed = await sync_to_async(claim_shard)(shard)
+        try:
+            yield claimed
+        finally:
+            await sync_to_async(release_shard)(claimed)
+
+
+def shard_health():
+    """Breaker snapshot and load of every shard, for the health endpoint"""
+    shards = get_shards()
+    counts = in_flight(shards)
+    return [
+        {
+            **shard.breaker.snapshot(),
+            'name': shard.name,
+            'breaker': shard.breaker.name,
+            'in_flight': counts[shard.name],
+            'max_in_flight': shard.max_in_flight,
+        }
+        for shard in shards
+    ]
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import leaderboard
+from .db_router import note_write
+from .models import CampMeetingSettings, Contribution
+from .rollups import record_transition, rollup_key
+from .settings_cache import invalidate_settings_cache
+
+# Fields the rollups and leaderboard are keyed on, plus the name the board shows
+TRACKED_FIELDS = ('status', 'amount', 'created_at', 'phone_normalized', 'is_verified', 'full_name')
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def wrote_to_primary(sender, **kwargs):
+    # Read-your-writes, see db_router
+    note_write(sender)
+
+
+@receiver(post_save, sender=CampMeetingSettings)
+@receiver(post_delete, sender=CampMeetingSettings)
+def camp_settings_changed(sender, **kwargs):
+    # Wait for the commit so other workers can't reload the old row under the new version
+    transaction.on_commit(invalidate_settings_cache)
+
+
+def _stored_row(instance, using):
+    """The row as it is in the database, locked until the save or delete commits.
+
+    Deltas are taken from this rather than from what the instance was loaded
+    with: two stale copies of a pending contribution both saved as completed
+    (a callback racing a status poll) must only count once.
+    """
+    return (
+        Contribution.objects.using(using).select_for_update()
+        .filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
+    )
+
+
+def _saved_values(instance, stored, update_fields):
+    """TRACKED_FIELDS as this save leaves them in the row"""
+    deferred = instance.get_deferred_fields()
+    values = {}
+    for field in TRACKED_FIELDS:
+        written = field not in deferred and (update_fields is None or field in update_fields)
+        values[field] = getattr(instance, field) if written or stored is None else stored[field]
+    return values
+
+
+def _rollup_key(values):
+    return rollup_key(values['status'], values['amount'], values['created_at'])
+
+
+def _leaderboard_key(values):
+    return leaderboard.leaderboard_key(values['phone_normalized'], values['is_verified'], values['amount'])
+
+
+@receiver(pre_save, sender=Contribution)
+def lock_stored_row(sender, instance, raw=False, using=None, **kwargs):
+    instance._stored_row = None if raw or instance._state.adding else _stored_row(instance, using)
+
+
+@receiver(post_save, sender=Contribution)
+def update_totals_on_save(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    if raw:
+        return
+    stored = None if created else instance._stored_row
+    if not created and stored is None:
+        return
+    new = _saved_values(instance, stored, update_fields)
+    record_transition(_rollup_key(stored) if stored else None, _rollup_key(new), using=using)
+    leaderboard.record_transition(_leaderboard_key(stored) if stored else None, _leaderboard_key(new), new['full_name'])
+
+
+@receiver(pre_delete, sender=Contribution)
+def lock_deleted_row(sender, instance, using=None, **kwargs):
+    # The collector runs pre_delete inside its transaction, so the lock holds until the DELETE
+    instance._stored_row = _stored_row(instance, using)
+
+
+@receiver(post_delete, sender=Contribution)
+def update_totals_on_delete(sender, instance, using=None, **kwargs):
+    stored = instance._stored_row
+    if stored is not None:
+        # Gone already when another copy of the row was deleted first
+        record_transition(_rollup_key(stored), None, using=using)
+        leaderboard.record_transition(_leaderboard_key(stored), None)
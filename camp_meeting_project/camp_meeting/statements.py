@@ -0,0 +1,254 @@
+"""Streaming import of M-Pesa paybill statement CSVs.
+
+Payments made straight to the paybill never go through STK push, so they
+only show up on the statement downloaded from the M-Pesa org portal.
+The importer reads the CSV row by row, keeps only completed money-in
+rows and writes them as verified contributions in bulk batches.  Each
+batch is checked against existing receipt numbers with one indexed
+``IN`` query, and progress is written to a checkpoint file after every
+committed batch so an interrupted run can pick up where it stopped.
+
+Statements uploaded in the admin are only saved to STATEMENT_INBOX;
+`manage.py import_statement --loop` imports them outside any request,
+and the admin page shows each one's checkpoint.  Receipt numbers are
+unique in the database too, so a C2B confirmation or a second import
+recording the same payment meanwhile is turned away rather than stored
+twice.
+"""
+import csv
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from . import leaderboard
+from .models import Contribution
+from .rollups import record_many
+from .utils import lookup_phone_number, normalize_phone_number
+
+RECEIPT_COLUMN = 'Receipt No.'
+DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M')
+
+
+class StatementImportError(Exception):
+    pass
+
+
+def parse_amount(value):
+    try:
+        return Decimal((value or '').replace(',', '').strip() or '0')
+    except InvalidOperation:
+        return Decimal('0')
+
+
+def parse_completion_time(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return timezone.make_aware(datetime.strptime(value, date_format))
+        except ValueError:
+            continue
+    return None
+
+
+def parse_other_party(value):
+    """Split '254712345678 - JANE DOE' into a phone number and a display name"""
+    phone, _, name = (value or '').partition(' - ')
+    phone = phone.strip()
+    if '*' not in phone:
+        # Newer statements mask the middle digits, keep those as they are
+        phone = normalize_phone_number(phone)
+    return phone, name.strip().title()
+
+
+def read_statement_rows(lines):
+    """Yield statement rows as dicts, skipping the portal's preamble lines"""
+    lines = iter(lines)
+    for line in lines:
+        if RECEIPT_COLUMN in line:
+            header = next(csv.reader([line]))
+            break
+    else:
+        raise StatementImportError(f"No '{RECEIPT_COLUMN}' header row found in statement")
+
+    for row in csv.reader(lines):
+        if row:
+            yield dict(zip((column.strip() for column in header), row))
+
+
+def row_to_contribution(row):
+    """Normalize one statement row, or return None if it isn't a completed payment in"""
+    if (row.get('Transaction Status') or 'Completed').strip().lower() != 'completed':
+        return None
+    amount = parse_amount(row.get('Paid In'))
+    receipt = (row.get(RECEIPT_COLUMN) or '').strip().upper()
+    created_at = parse_completion_time(row.get('Completion Time'))
+    if amount < 1 or not receipt or created_at is None:
+        return None
+
+    phone_number, name = parse_other_party(row.get('Other Party Info'))
+    return Contribution(
+        full_name=name or 'Paybill Contributor',
+        phone_number=phone_number[:15],
+        phone_normalized=lookup_phone_number(phone_number),
+        amount=amount,
+        status=Contribution.Status.COMPLETED,
+        is_verified=True,
+        mpesa_transaction_id=receipt,
+        created_at=created_at,
+    )
+
+
+class Checkpoint:
+    """Progress of one statement import, persisted as a small JSON file"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = source
+        self.rows_read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.completed = False
+        self.error = ''
+
+    @classmethod
+    def load(cls, path, source):
+        checkpoint = cls(path, source)
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('source') == source:
+                for field in ('rows_read', 'imported', 'duplicates', 'skipped', 'completed', 'error'):
+                    setattr(checkpoint, field, data.get(field, getattr(checkpoint, field)))
+        return checkpoint
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'source': self.source,
+                'rows_read': self.rows_read,
+                'imported': self.imported,
+                'duplicates': self.duplicates,
+                'skipped': self.skipped,
+                'completed': self.completed,
+                'error': self.error,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+def checkpoint_path(path):
+    return f"{path}.checkpoint.json"
+
+
+def save_upload(upload, inbox):
+    """Store an uploaded statement in the inbox for the import worker. Returns its path."""
+    os.makedirs(inbox, exist_ok=True)
+    name = get_valid_filename(os.path.basename(upload.name))
+    path = os.path.join(inbox, f"{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}-{name}")
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return path
+
+
+def inbox_statements(inbox):
+    """(path, checkpoint) of every statement in the inbox, oldest upload first"""
+    if not os.path.isdir(inbox):
+        return []
+    paths = sorted(os.path.join(inbox, name) for name in os.listdir(inbox) if name.lower().endswith('.csv'))
+    return [(path, Checkpoint.load(checkpoint_path(path), os.path.abspath(path))) for path in paths]
+
+
+def _insert_new(contributions):
+    """Insert the contributions whose receipts are still unrecorded. Returns the ones inserted."""
+    try:
+        with transaction.atomic():
+            Contribution.objects.bulk_create(contributions)
+        return contributions
+    except IntegrityError:
+        pass
+    # A C2B confirmation or another import recorded some of these receipts since
+    # the IN query. ignore_conflicts wouldn't say which rows went in, and the
+    # totals need to know, so let the unique index turn them away one at a time.
+    inserted = []
+    for contribution in contributions:
+        contribution.pk = None
+        try:
+            with transaction.atomic():
+                Contribution.objects.bulk_create([contribution])
+        except IntegrityError:
+            continue
+        inserted.append(contribution)
+    return inserted
+
+
+def _write_batch(batch, checkpoint, seen_receipts):
+    receipts = [contribution.mpesa_transaction_id for contribution in batch]
+    existing = set(
+        Contribution.objects.filter(mpesa_transaction_id__in=receipts).values_list('mpesa_transaction_id', flat=True)
+    )
+    new_contributions = []
+    for contribution in batch:
+        receipt = contribution.mpesa_transaction_id
+        if receipt in existing or receipt in seen_receipts:
+            checkpoint.duplicates += 1
+            continue
+        seen_receipts.add(receipt)
+        new_contributions.append(contribution)
+
+    with transaction.atomic():
+        inserted = _insert_new(new_contributions)
+        record_many(inserted)
+        leaderboard.record_many(inserted)
+    checkpoint.imported += len(inserted)
+    checkpoint.duplicates += len(new_contributions) - len(inserted)
+
+
+def import_statement(lines, checkpoint, batch_size=1000, progress=None):
+    """Import statement rows from an iterable of CSV lines.
+
+    Rows already covered by the checkpoint are skipped without being
+    normalized.  `progress` is called with the checkpoint and the rows
+    per second rate after every batch.  Returns the checkpoint.
+    """
+    started = time.monotonic()
+    resumed_from = checkpoint.rows_read
+    seen_receipts = set()
+    batch = []
+    rows_read = 0
+
+    def flush():
+        _write_batch(batch, checkpoint, seen_receipts)
+        batch.clear()
+        checkpoint.rows_read = rows_read
+        checkpoint.save()
+        if progress:
+            elapsed = time.monotonic() - started
+            progress(checkpoint, (rows_read - resumed_from) / elapsed if elapsed else 0.0)
+
+    for row in read_statement_rows(lines):
+        rows_read += 1
+        if rows_read <= resumed_from:
+            continue
+        contribution = row_to_contribution(row)
+        if contribution is None:
+            checkpoint.skipped += 1
+        else:
+            batch.append(contribution)
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    checkpoint.completed = True
+    checkpoint.save()
+    return checkpoint
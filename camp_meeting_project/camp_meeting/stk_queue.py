@@ -0,0 +1,94 @@
+"""Retrying STK pushes that were queued while Daraja was unavailable.
+
+Several `retry_stk_pushes` workers (or a cron run overlapping a slow
+pass) may look at the same due items, so each item is claimed with a
+conditional UPDATE that pushes its next_attempt_at out by CLAIM_LEASE
+before the push is sent.  Only the worker whose UPDATE matched sends it.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .breaker import CircuitOpen
+from .models import Contribution, QueuedStkPush
+from .mpesa import DarajaUnavailable, initiate_stk_push
+from .ratelimit import DarajaOverloaded
+from .shards import shard_slot
+
+logger = logging.getLogger(__name__)
+
+# Well past a push's MPESA_TIMEOUT; a worker that dies holding a claim only delays that item this long
+CLAIM_LEASE = timedelta(minutes=2)
+
+
+def queue_stk_push(contribution, error=''):
+    return QueuedStkPush.objects.create(contribution=contribution, last_error=str(error)[:255])
+
+
+def _give_up(item, reason):
+    contribution = item.contribution
+    contribution.status = Contribution.Status.FAILED
+    contribution.save()
+    item.delete()
+    logger.info("Gave up on queued STK push for contribution %s: %s", contribution.pk, reason)
+
+
+def claim(item, now):
+    """Take a due item for this worker. False if another worker claimed it first."""
+    leased_until = now + CLAIM_LEASE
+    claimed = QueuedStkPush.objects.filter(pk=item.pk, next_attempt_at=item.next_attempt_at).update(
+        next_attempt_at=leased_until,
+    )
+    item.next_attempt_at = leased_until
+    return bool(claimed)
+
+
+def retry_queued_pushes(limit=50):
+    """Send due queued pushes until Daraja fails again. Returns how many were sent."""
+    now = timezone.now()
+    expired_before = now - timedelta(seconds=settings.STK_QUEUE_MAX_AGE)
+    sent = 0
+    due = QueuedStkPush.objects.select_related('contribution').filter(next_attempt_at__lte=now)[:limit]
+    for item in due:
+        if not claim(item, now):
+            continue
+        contribution = item.contribution
+        if item.created_at < expired_before:
+            # The member has long stopped waiting for the prompt
+            _give_up(item, 'expired')
+            continue
+
+        try:
+            with shard_slot() as shard:
+                response = initiate_stk_push(contribution.phone_number, int(contribution.amount), contribution.id,
+                                             shard=shard)
+        except (CircuitOpen, DarajaOverloaded):
+            # Nothing was sent, hand the item back for the next pass
+            item.next_attempt_at = now
+            item.save(update_fields=['next_attempt_at'])
+            break
+        except DarajaUnavailable as e:
+            if e.request_sent:
+                # Daraja may have sent the prompt, retrying could charge twice
+                _give_up(item, 'request may have reached Daraja')
+                continue
+            item.attempts += 1
+            item.last_error = str(e)[:255]
+            item.next_attempt_at = now + timedelta(seconds=min(300, 10 * 2 ** item.attempts))
+            item.save()
+            continue
+        except Exception as e:
+            _give_up(item, str(e))
+            continue
+
+        if response.get('ResponseCode') == '0':
+            contribution.checkout_request_id = response.get('CheckoutRequestID')
+            contribution.shard = shard.name
+            contribution.save()
+            item.delete()
+            sent += 1
+        else:
+            _give_up(item, response.get('errorMessage') or response.get('ResponseDescription', 'rejected'))
+    return sent
@@ -0,0 +1,133 @@
+"""Shared, deduplicated STK push status queries.
+
+The status page polls, people open several tabs and retry, and every one
+of those used to cost a Daraja query for the same CheckoutRequestID.
+Results now go through the shared cache:
+
+- a final result (Daraja sent a ResultCode) never changes and is kept for good
+- "still waiting for the customer" is kept for STK_QUERY_PENDING_TTL seconds
+- while one worker is asking Daraja, others asking about the same checkout
+  wait for its answer instead of sending their own query
+
+Anything else (errors, unexpected responses) is not cached.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .mpesa import get_shard, query_stk_push
+from .shards import ashard_slot, shard_slot
+
+KEY_PREFIX = 'camp_meeting:stk_result'
+# Daraja's pending answer while the customer hasn't responded yet
+PENDING_ERROR_CODE = '500.001.1001'
+# Longer than a token request plus a query can take with MPESA_TIMEOUT
+LOCK_TTL = 30
+POLL_INTERVAL = 0.1
+
+
+class StkResultUnavailable(Exception):
+    """Another worker was querying Daraja and didn't produce a result in time"""
+
+
+def result_key(checkout_request_id):
+    return f'{KEY_PREFIX}:{checkout_request_id}'
+
+
+def is_final(result):
+    return 'ResultCode' in result
+
+
+def is_pending(result):
+    return result.get('errorCode') == PENDING_ERROR_CODE
+
+
+def result_ttl(result):
+    """(cacheable, timeout) for a Daraja answer"""
+    if is_final(result):
+        return True, None
+    if is_pending(result):
+        return True, settings.STK_QUERY_PENDING_TTL
+    return False, None
+
+
+def store_result(checkout_request_id, result):
+    cacheable, timeout = result_ttl(result)
+    if cacheable:
+        cache.set(result_key(checkout_request_id), result, timeout)
+
+
+def _wait_for_result(checkout_request_id):
+    key = result_key(checkout_request_id)
+    deadline = time.monotonic() + LOCK_TTL
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        result = cache.get(key)
+        if result is not None:
+            return result
+        if cache.get(f'{key}:lock') is None:
+            # The querying worker finished without anything worth caching
+            break
+    raise StkResultUnavailable(checkout_request_id)
+
+
+def query_stk_status(checkout_request_id, shard_name=''):
+    """Daraja's answer for a checkout, asking at most once at a time across workers.
+
+    The query goes out with the credentials of `shard_name`, the app that
+    sent the push.  Raises StkResultUnavailable when another worker's query
+    came back without a cacheable result, plus whatever query_stk_push and
+    shard_slot raise for the worker that does the asking.
+    """
+    key = result_key(checkout_request_id)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    if not cache.add(f'{key}:lock', 1, LOCK_TTL):
+        return _wait_for_result(checkout_request_id)
+    try:
+        with shard_slot(get_shard(shard_name)) as shard:
+            result = query_stk_push(checkout_request_id, shard)
+        store_result(checkout_request_id, result)
+        return result
+    finally:
+        cache.delete(f'{key}:lock')
+
+
+async def _await_result(checkout_request_id):
+    key = result_key(checkout_request_id)
+    deadline = time.monotonic() + LOCK_TTL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        result = await cache.aget(key)
+        if result is not None:
+            return result
+        if await cache.aget(f'{key}:lock') is None:
+            break
+    raise StkResultUnavailable(checkout_request_id)
+
+
+async def aquery_stk_status(checkout_request_id, shard_name=''):
+    """query_stk_status for async views, sharing the same cache entries and lock"""
+    # Imported here so WSGI workers never load httpx
+    from .mpesa_async import aquery_stk_push
+
+    key = result_key(checkout_request_id)
+    result = await cache.aget(key)
+    if result is not None:
+        return result
+
+    if not await cache.aadd(f'{key}:lock', 1, LOCK_TTL):
+        return await _await_result(checkout_request_id)
+    try:
+        async with ashard_slot(get_shard(shard_name)) as shard:
+            result = await aquery_stk_push(checkout_request_id, shard)
+        cacheable, timeout = result_ttl(result)
+        if cacheable:
+            await cache.aset(key, result, timeout)
+        return result
+    finally:
+        await cache.adelete(f'{key}:lock')
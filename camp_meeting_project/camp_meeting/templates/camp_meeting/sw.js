@@ -0,0 +1,201 @@
+// Offline support for the landing page, rendered by views.service_worker (see offline.py)
+const CONFIG = {{ config|safe }};
+
+const PREFIX = 'camp-meeting-';
+// Page and assets, renamed whenever they change so old copies are dropped on activate
+const SHELL_CACHE = `${PREFIX}shell-${CONFIG.version}`;
+// Last known stats, kept across shell updates
+const DATA_CACHE = `${PREFIX}data-v1`;
+const SYNC_TAG = `${PREFIX}contributions`;
+const CDN_HOSTS = CONFIG.cdnAssets.map(url => new URL(url).host);
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(SHELL_CACHE);
+        await cache.addAll([CONFIG.landingUrl, ...CONFIG.precache]);
+        // The CDNs are best effort, a slow one shouldn't stop the worker installing
+        await Promise.allSettled(CONFIG.cdnAssets.map(url => cache.add(new Request(url, { mode: 'cors', credentials: 'omit' }))));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        for (const name of await caches.keys()) {
+            if (name.startsWith(PREFIX) && name !== SHELL_CACHE && name !== DATA_CACHE) {
+                await caches.delete(name);
+            }
+        }
+        await self.clients.claim();
+        await flushQueue().catch(() => {});
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (url.origin === location.origin) {
+        if (request.method === 'POST' && url.pathname === CONFIG.contributeUrl) {
+            event.respondWith(submitContribution(request));
+        } else if (request.method !== 'GET') {
+            return;
+        } else if (request.mode === 'navigate' && url.pathname === CONFIG.landingUrl && !url.search) {
+            event.respondWith(staleWhileRevalidate(event, CONFIG.landingUrl));
+        } else if (url.pathname === CONFIG.statsUrl) {
+            event.respondWith(lastKnownStats(request));
+        } else if (url.pathname.startsWith(CONFIG.staticUrl)) {
+            event.respondWith(cacheFirst(request));
+        }
+    } else if (request.method === 'GET' && CDN_HOSTS.includes(url.host)) {
+        // Font Awesome's fonts are only known once its CSS loads, so they are cached as they are used
+        event.respondWith(staleWhileRevalidate(event, request));
+    }
+});
+
+self.addEventListener('sync', event => {
+    if (event.tag === SYNC_TAG) {
+        // A rejection makes the browser try this sync again later
+        event.waitUntil(flushQueue());
+    }
+});
+
+self.addEventListener('message', event => {
+    // The page says it's back online, for browsers without background sync
+    if (event.data === 'flush-queue') {
+        event.waitUntil(flushQueue().catch(() => {}));
+    }
+});
+
+async function staleWhileRevalidate(event, key) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(key);
+    const network = fetch(event.request).then(response => {
+        if (response.ok) {
+            return cache.put(key, response.clone()).then(() => response);
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+    }
+    return network;
+}
+
+async function cacheFirst(request) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function lastKnownStats(request) {
+    const cache = await caches.open(DATA_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(CONFIG.statsUrl, new Response(await response.clone().blob(), {
+                headers: { 'Content-Type': 'application/json', 'X-Fetched-At': new Date().toISOString() },
+            }));
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(CONFIG.statsUrl);
+        if (!cached) {
+            throw error;
+        }
+        const headers = new Headers(cached.headers);
+        headers.set('X-Offline', '1');
+        return new Response(await cached.blob(), { headers });
+    }
+}
+
+// Contributions made offline wait in IndexedDB until the network is back
+
+function queueStore(mode, operation) {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open('camp-meeting', 1);
+        open.onupgradeneeded = () => open.result.createObjectStore('contributions', { keyPath: 'id' });
+        open.onerror = () => reject(open.error);
+        open.onsuccess = () => {
+            const db = open.result;
+            const transaction = db.transaction('contributions', mode);
+            const request = operation(transaction.objectStore('contributions'));
+            transaction.oncomplete = () => { db.close(); resolve(request.result); };
+            transaction.onerror = () => { db.close(); reject(transaction.error); };
+        };
+    });
+}
+
+async function submitContribution(request) {
+    const entry = {
+        id: request.headers.get('X-Submission-Id') || crypto.randomUUID(),
+        csrfToken: request.headers.get('X-CSRFToken'),
+        body: await request.clone().text(),
+        queuedAt: Date.now(),
+    };
+    try {
+        return await fetch(request);
+    } catch (error) {
+        await queueStore('readwrite', store => store.put(entry));
+        if (self.registration.sync) {
+            await self.registration.sync.register(SYNC_TAG).catch(() => {});
+        }
+        return new Response(JSON.stringify({
+            success: true,
+            offline: true,
+            message: "You're offline. We'll send the M-Pesa request to your phone as soon as you're back online.",
+        }), { status: 202, headers: { 'Content-Type': 'application/json' } });
+    }
+}
+
+let flushing = null;
+
+function flushQueue() {
+    // Sync events and 'online' messages can arrive together, send each contribution once
+    flushing = flushing || sendQueued().finally(() => { flushing = null; });
+    return flushing;
+}
+
+async function sendQueued() {
+    const entries = await queueStore('readonly', store => store.getAll());
+    entries.sort((a, b) => a.queuedAt - b.queuedAt);
+    for (const entry of entries) {
+        if (Date.now() - entry.queuedAt > CONFIG.queueMaxAge * 1000) {
+            // Too late for a payment prompt to make sense to the donor
+            await queueStore('readwrite', store => store.delete(entry.id));
+            await notify({ type: 'contribution-expired', id: entry.id });
+            continue;
+        }
+        // Throws while still offline, leaving this and later entries queued
+        const response = await fetch(CONFIG.contributeUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': entry.csrfToken,
+                'X-Submission-Id': entry.id,
+            },
+            body: entry.body,
+        });
+        if (response.status === 429) {
+            throw new Error('Rate limited, retrying later');
+        }
+        await queueStore('readwrite', store => store.delete(entry.id));
+        const result = await response.json().catch(() => ({ success: false }));
+        await notify({ type: 'contribution-sent', id: entry.id, result });
+    }
+}
+
+async function notify(message) {
+    for (const client of await self.clients.matchAll({ type: 'window' })) {
+        client.postMessage(message);
+    }
+}
@@ -1,7 +1,63 @@
-from django.test import TestCase
+from datetime import datetime
+import contextlib
+import copy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import asyncio
+import json
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User
-from .models import Contribution
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from .models import ArchivedContribution, Contribution, CampMeetingSettings, ContributionRollup, C2BPayment, ContributorTotal
+from .rollups import get_trends, rebuild_rollups
+from .leaderboard import public_name, rebuild_leaderboard, top_contributors
+from django.contrib import admin
+from .admin import ContributionAdmin, EstimatedCountPaginator
+from .utils import normalize_phone_number
+from .forms import ContributionForm
+from .statements import Checkpoint, _insert_new, import_statement, read_statement_rows, row_to_contribution
+from .c2b import process_pending_payments
+from .ratelimit import (
+    IN_FLIGHT_KEY, IN_FLIGHT_TTL, DarajaOverloaded, adaraja_slot, daraja_slot, enter_in_flight, leave_in_flight,
+    take_token,
+)
+from django.core.cache import cache
+from . import mpesa
+from .breaker import CircuitBreaker, CircuitOpen, circuit_state_changed
+from .models import QueuedStkPush
+from .stk_queue import claim, queue_stk_push, retry_queued_pushes
+from .stk_results import StkResultUnavailable, query_stk_status, result_key
+from .shards import claim_shard, release_shard, shard_slot
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+from . import async_views
+from . import offline
+import httpx
+from asgiref.sync import sync_to_async
+from .archive import archive_contributions, archive_cutoff
+from .db_router import read_from_replica, request_scope
+from django.db import IntegrityError, OperationalError, connection, connections, router
+from django.db.models import QuerySet
+from django.db.migrations.executor import MigrationExecutor
+from .settings_cache import get_active_settings, invalidate_settings_cache
+from .views import SESSION_CONTRIBUTIONS_KEY
+from .profiling import ProfilingMiddleware
+from django.http import HttpResponse
 
 class ContributionModelTest(TestCase):
     def test_str_representation(self):
@@ -42,4 +98,1911 @@ class FinanceReportViewTest(TestCase):
 
     def test_finance_report_access(self):
         response = self.client.get(reverse('camp_meeting:finance_report'))
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class CampMeetingSettingsCacheTest(TestCase):
+    def setUp(self):
+        invalidate_settings_cache()
+
+    def create_settings(self, **kwargs):
+        values = {
+            'target_amount': Decimal('1000.00'),
+            'event_start_date': timezone.make_aware(datetime(2026, 8, 16)),
+            'event_end_date': timezone.make_aware(datetime(2026, 8, 23)),
+            'paybill_number': '600100',
+            'account_number': 'Camp2026',
+        }
+        values.update(kwargs)
+        with self.captureOnCommitCallbacks(execute=True):
+            return CampMeetingSettings.objects.create(**values)
+
+    def test_defaults_without_settings_row(self):
+        camp_settings = get_active_settings()
+        self.assertIsNone(camp_settings.pk)
+        self.assertEqual(camp_settings.target_amount, Decimal('2300000.00'))
+
+    def test_cached_settings_need_no_query(self):
+        self.create_settings()
+        get_active_settings()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_settings().account_number, 'Camp2026')
+
+    @override_settings(SETTINGS_CACHE_TTL=60)
+    def test_worker_that_missed_the_invalidation_reloads_after_ttl(self):
+        camp_settings = self.create_settings()
+        get_active_settings()
+        # Another worker saved, this process's cache never saw the new version
+        CampMeetingSettings.objects.filter(pk=camp_settings.pk).update(target_amount=Decimal('5000.00'))
+        self.assertEqual(get_active_settings().target_amount, Decimal('1000.00'))
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(get_active_settings().target_amount, Decimal('5000.00'))
+
+    def test_save_invalidates_cache(self):
+        camp_settings = self.create_settings()
+        self.assertEqual(get_active_settings().target_amount, Decimal('1000.00'))
+        camp_settings.target_amount = Decimal('5000.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            camp_settings.save()
+        self.assertEqual(get_active_settings().target_amount, Decimal('5000.00'))
+
+    def test_views_use_active_settings(self):
+        self.create_settings()
+        response = self.client.get(reverse('camp_meeting:landing'))
+        self.assertEqual(response.context['target_amount'], Decimal('1000.00'))
+        self.assertContains(response, 'Camp2026')
+
+        response = self.client.get(reverse('camp_meeting:stats'))
+        self.assertEqual(response.json()['target_amount'], 1000.0)
+
+
+class ContributionRollupTest(TestCase):
+    def setUp(self):
+        self.created_at = timezone.make_aware(datetime(2025, 8, 17, 10, 25))
+
+    def create_contribution(self, amount=500, status=Contribution.Status.PENDING):
+        return Contribution.objects.create(
+            full_name="John Doe", phone_number="254712345678",
+            amount=amount, status=status, created_at=self.created_at,
+        )
+
+    def rollup(self, status):
+        return ContributionRollup.objects.filter(status=status).first()
+
+    def test_new_contribution_counted(self):
+        self.create_contribution()
+        rollup = self.rollup(Contribution.Status.PENDING)
+        self.assertEqual(rollup.bucket, timezone.make_aware(datetime(2025, 8, 17, 10)))
+        self.assertEqual(rollup.count, 1)
+        self.assertEqual(rollup.total_amount, Decimal('500'))
+
+    def test_status_transition_moves_contribution(self):
+        contribution = self.create_contribution()
+        contribution = Contribution.objects.get(pk=contribution.pk)
+        contribution.status = Contribution.Status.COMPLETED
+        contribution.amount = 450
+        contribution.save()
+
+        self.assertEqual(self.rollup(Contribution.Status.PENDING).count, 0)
+        completed = self.rollup(Contribution.Status.COMPLETED)
+        self.assertEqual(completed.count, 1)
+        self.assertEqual(completed.total_amount, Decimal('450'))
+
+    def test_saving_without_changes_is_noop(self):
+        contribution = self.create_contribution()
+        contribution.save()
+        self.assertEqual(self.rollup(Contribution.Status.PENDING).count, 1)
+
+    def test_delete_removes_contribution(self):
+        self.create_contribution().delete()
+        self.assertEqual(self.rollup(Contribution.Status.PENDING).count, 0)
+
+    def test_stale_copies_count_once(self):
+        # A callback and a status poll each loaded the pending row before either saved
+        contribution = self.create_contribution()
+        first, second = Contribution.objects.get(pk=contribution.pk), Contribution.objects.get(pk=contribution.pk)
+        for stale_copy in (first, second):
+            stale_copy.status = Contribution.Status.COMPLETED
+            stale_copy.save()
+        self.assertEqual(self.rollup(Contribution.Status.PENDING).count, 0)
+        completed = self.rollup(Contribution.Status.COMPLETED)
+        self.assertEqual((completed.count, completed.total_amount), (1, Decimal('500')))
+
+        # Saving a field that wasn't loaded keeps the rest as stored
+        partial = Contribution.objects.only('amount').get(pk=contribution.pk)
+        partial.amount = 600
+        partial.save(update_fields=['amount'])
+        self.assertEqual(self.rollup(Contribution.Status.COMPLETED).total_amount, Decimal('600'))
+
+        first.delete()
+        second.delete()
+        self.assertEqual(self.rollup(Contribution.Status.COMPLETED).count, 0)
+
+    def test_rebuild_matches_incremental(self):
+        self.create_contribution(status=Contribution.Status.COMPLETED)
+        self.create_contribution(amount=1000, status=Contribution.Status.COMPLETED)
+        self.create_contribution(status=Contribution.Status.FAILED)
+        incremental = set(ContributionRollup.objects.values_list('bucket', 'status', 'count', 'total_amount'))
+
+        ContributionRollup.objects.all().delete()
+        call_command('rebuild_rollups', '--start', '2025-08-17', '--end', '2025-08-18', stdout=StringIO())
+        rebuilt = set(ContributionRollup.objects.values_list('bucket', 'status', 'count', 'total_amount'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_failed_rebuild_keeps_rollups(self):
+        self.create_contribution(status=Contribution.Status.COMPLETED)
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=OperationalError("disk I/O error")):
+            with self.assertRaises(OperationalError):
+                rebuild_rollups()
+        self.assertEqual(self.rollup(Contribution.Status.COMPLETED).count, 1)
+
+    def test_trends_read_only_rollups(self):
+        self.create_contribution(status=Contribution.Status.COMPLETED)
+        self.create_contribution(amount=1000, status=Contribution.Status.COMPLETED)
+        with self.assertNumQueries(1):
+            daily = get_trends('day')
+        self.assertEqual(daily, [{'label': '2025-08-17', 'count': 2, 'total_amount': 1500.0}])
+        self.assertEqual(get_trends('hour')[10]['count'], 2)
+
+    def test_trends_endpoint(self):
+        User.objects.create_user(username="finance", password="financepass")
+        self.client.login(username="finance", password="financepass")
+        self.create_contribution(status=Contribution.Status.COMPLETED)
+        response = self.client.get(reverse('camp_meeting:trends'), {'granularity': 'hour'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['buckets']), 24)
+
+
+class ContributionAdminTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.login(username="admin", password="adminpass")
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678",
+                                    amount=500, status=Contribution.Status.COMPLETED, mpesa_transaction_id="QK12ABC")
+        Contribution.objects.create(full_name="John Otieno", phone_number="254798765432",
+                                    amount=1000, status=Contribution.Status.PENDING)
+
+    def search(self, term):
+        response = self.client.get(reverse('admin:camp_meeting_contribution_changelist'), {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return [c.full_name for c in response.context['cl'].result_list]
+
+    def test_phone_search_normalizes_prefix(self):
+        self.assertEqual(self.search('0712'), ["Grace Wanjiku"])
+        self.assertEqual(self.search('+254 798'), ["John Otieno"])
+
+    def test_receipt_search_is_prefix_match(self):
+        self.assertEqual(self.search('qk12'), ["Grace Wanjiku"])
+        self.assertEqual(self.search('12ABC'), [])
+
+    def test_name_search(self):
+        self.assertEqual(self.search('John'), ["John Otieno"])
+        self.assertEqual(self.search('grace w'), ["Grace Wanjiku"])
+        self.assertEqual(self.search('Wanjiku'), [])
+
+    def test_name_search_uses_index(self):
+        queryset, _ = ContributionAdmin(Contribution, admin.site).get_search_results(
+            None, Contribution.objects.order_by(), 'Grace')
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('contribution_name_idx', plan)
+
+    def test_paginator_bounds_count(self):
+        paginator = EstimatedCountPaginator(Contribution.objects.filter(status=Contribution.Status.PENDING), 100)
+        paginator.exact_count_limit = 0
+        self.assertEqual(paginator.count, 1)
+        self.assertEqual(EstimatedCountPaginator(Contribution.objects.all(), 100).count, 2)
+
+    def test_normalize_phone_number(self):
+        self.assertEqual(normalize_phone_number('0712 345 678'), '254712345678')
+        self.assertEqual(normalize_phone_number('+254712345678'), '254712345678')
+        self.assertEqual(normalize_phone_number('712345678'), '254712345678')
+
+
+STATEMENT_CSV = """Account Holder:,EDEN SPRINGS SDA CHURCH
+Short Code:,600100
+Receipt No.,Completion Time,Initiation Time,Details,Transaction Status,Paid In,Withdrawn,Balance,Balance Confirmed,Reason Type,Other Party Info,Linked Transaction ID,A/C No.
+QK1AAA,2025-08-17 10:25:31,2025-08-17 10:25:31,Pay Bill from 254712345678,Completed,"1,000.00",,,true,Pay Bill Online,254712345678 - GRACE WANJIKU,,Camp2025
+QK2BBB,2025-08-17 11:02:10,2025-08-17 11:02:10,Pay Bill from 0798765432,Completed,500.00,,,true,Pay Bill Online,0798765432 - JOHN OTIENO,,Camp2025
+QK3CCC,2025-08-17 11:05:00,2025-08-17 11:05:00,Pay Bill,Failed,700.00,,,true,Pay Bill Online,254700000001 - MARY ACHIENG,,Camp2025
+QK4DDD,2025-08-17 12:00:00,2025-08-17 12:00:00,Withdrawal,Completed,,"2,000.00",,true,Business Payment,NCBA BANK,,
+QK1AAA,2025-08-17 10:25:31,2025-08-17 10:25:31,Pay Bill from 254712345678,Completed,"1,000.00",,,true,Pay Bill Online,254712345678 - GRACE WANJIKU,,Camp2025
+QK5EEE,2025-08-17 13:30:00,2025-08-17 13:30:00,Pay Bill,Completed,200.00,,,true,Pay Bill Online,2547****321 - RUTH NJERI,,Camp2025
+"""
+
+
+class StatementImportTest(TestCase):
+    def run_import(self, checkpoint=None, batch_size=2):
+        checkpoint = checkpoint or Checkpoint(None, 'statement.csv')
+        return import_statement(StringIO(STATEMENT_CSV), checkpoint, batch_size=batch_size)
+
+    def test_imports_completed_payments_in(self):
+        checkpoint = self.run_import()
+        self.assertEqual(checkpoint.imported, 3)
+        self.assertEqual(checkpoint.duplicates, 1)
+        self.assertEqual(checkpoint.skipped, 2)
+
+        contribution = Contribution.objects.get(mpesa_transaction_id='QK2BBB')
+        self.assertEqual(contribution.phone_number, '254798765432')
+        self.assertEqual(contribution.full_name, 'John Otieno')
+        self.assertTrue(contribution.is_verified)
+        self.assertEqual(sum(ContributionRollup.objects.filter(status=Contribution.Status.COMPLETED).values_list('count', flat=True)), 3)
+
+    def test_reimport_skips_existing_receipts(self):
+        self.run_import()
+        checkpoint = self.run_import()
+        self.assertEqual(checkpoint.imported, 0)
+        self.assertEqual(Contribution.objects.count(), 3)
+
+    def test_resume_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'statement.checkpoint.json')
+            checkpoint = Checkpoint(path, 'statement.csv')
+            checkpoint.rows_read = 3
+            checkpoint.save()
+
+            checkpoint = self.run_import(Checkpoint.load(path, 'statement.csv'))
+            self.assertEqual(checkpoint.rows_read, 6)
+            self.assertTrue(Checkpoint.load(path, 'statement.csv').completed)
+        self.assertEqual(
+            set(Contribution.objects.values_list('mpesa_transaction_id', flat=True)), {'QK1AAA', 'QK5EEE'}
+        )
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'statement.csv')
+            with open(path, 'w') as f:
+                f.write(STATEMENT_CSV)
+            out = StringIO()
+            call_command('import_statement', path, stdout=out)
+            self.assertIn('Imported 3 contributions', out.getvalue())
+            call_command('import_statement', path, stdout=out)
+            self.assertIn('already imported', out.getvalue())
+
+    def test_admin_upload_is_imported_by_the_worker(self):
+        User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.login(username="admin", password="adminpass")
+        url = reverse('admin:camp_meeting_contribution_import_statement')
+        with tempfile.TemporaryDirectory() as inbox, self.settings(STATEMENT_INBOX=inbox):
+            for name, content in (('statement.csv', STATEMENT_CSV), ('empty.csv', 'nothing here\n')):
+                upload = SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+                self.assertRedirects(self.client.post(url, {'statement': upload}), url)
+            # The request only stores the file
+            self.assertEqual(Contribution.objects.count(), 0)
+            self.assertContains(self.client.get(url), 'Waiting', count=2)
+
+            out, err = StringIO(), StringIO()
+            call_command('import_statement', stdout=out, stderr=err)
+            self.assertIn('Imported 3 contributions', out.getvalue())
+            self.assertIn('empty.csv', err.getvalue())
+            self.assertEqual(Contribution.objects.count(), 3)
+
+            response = self.client.get(url)
+            self.assertContains(response, 'Done')
+            self.assertContains(response, "Failed: No &#x27;Receipt No.&#x27; header row found")
+            # Neither is picked up again
+            out = StringIO()
+            call_command('import_statement', stdout=out, stderr=StringIO())
+            self.assertEqual(out.getvalue(), '')
+
+    def test_receipt_recorded_during_the_import_is_not_stored_twice(self):
+        rows = [row_to_contribution(row) for row in read_statement_rows(StringIO(STATEMENT_CSV))]
+        contributions = [rows[0], rows[1]]
+        # A C2B confirmation for the second one lands after the importer's IN query
+        Contribution.objects.create(full_name='John Otieno', phone_number='0798765432', amount=500,
+                                    status=Contribution.Status.COMPLETED, is_verified=True,
+                                    mpesa_transaction_id=rows[1].mpesa_transaction_id)
+        self.assertEqual(_insert_new(contributions), [rows[0]])
+        self.assertEqual(Contribution.objects.filter(mpesa_transaction_id=rows[1].mpesa_transaction_id).count(), 1)
+        self.assertEqual(Contribution.objects.count(), 2)
+
+    def test_stk_callback_after_the_statement_recorded_its_receipt(self):
+        attempt = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="0712345678", amount=1000,
+                                              status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        self.run_import()
+        callback = json.dumps({'Body': {'stkCallback': {
+            'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0, 'ResultDesc': 'OK',
+            'CallbackMetadata': {'Item': [
+                {'Name': 'Amount', 'value': 1000},
+                {'Name': 'MpesaReceiptNumber', 'value': 'QK1AAA'},
+                {'Name': 'PhoneNumber', 'value': 254712345678},
+            ]},
+        }}})
+        # Daraja redelivers until it gets a 200
+        for _ in range(2):
+            response = self.client.post(reverse('camp_meeting:mpesa_callback'), callback,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.status, attempt.is_verified), (Contribution.Status.DUPLICATE, False))
+        self.assertEqual(Contribution.objects.filter(is_verified=True, phone_normalized='254712345678').count(), 1)
+        self.assertEqual(
+            sum(ContributionRollup.objects.filter(status=Contribution.Status.COMPLETED).values_list('count', flat=True)), 3
+        )
+
+    def test_status_query_after_the_statement_recorded_its_receipt(self):
+        attempt = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="0712345678", amount=1000,
+                                              status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        self.run_import()
+        paid = {'ResultCode': '0', 'ResultDesc': 'OK', 'MpesaReceiptNumber': 'QK1AAA'}
+        with mock.patch('camp_meeting.stk_results.query_stk_push', return_value=paid):
+            response = self.client.post(reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': 'ws_CO_1'}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, Contribution.Status.DUPLICATE)
+        # Later polls answer from the row: the donor did pay
+        response = self.client.post(reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': 'ws_CO_1'}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['status']['ResultCode'], 0)
+
+    def test_receipts_are_unique(self):
+        self.run_import()
+        with self.assertRaises(IntegrityError):
+            Contribution.objects.create(full_name='Grace', phone_number='0712345678', amount=10,
+                                        mpesa_transaction_id='QK1AAA')
+        # Attempts without a receipt don't collide
+        Contribution.objects.create(full_name='Grace', phone_number='0712345678', amount=10)
+        Contribution.objects.create(full_name='Grace', phone_number='0712345678', amount=10)
+
+
+class DarajaC2BStub:
+    """Plays Daraja's side of C2B: builds confirmations and posts them to our endpoints"""
+
+    def __init__(self, client):
+        self.client = client
+        self.sequence = 0
+
+    def payload(self, amount=500, msisdn='254712345678', bill_ref='Camp2025', **extra):
+        self.sequence += 1
+        payload = {
+            'TransactionType': 'Pay Bill',
+            'TransID': f'RKT{self.sequence:07d}',
+            'TransTime': '20250824103000',
+            'TransAmount': str(amount),
+            'BusinessShortCode': '600100',
+            'BillRefNumber': bill_ref,
+            'MSISDN': msisdn,
+            'FirstName': 'GRACE',
+            'LastName': 'WANJIKU',
+        }
+        payload.update(extra)
+        return payload
+
+    def post(self, name, payload):
+        return self.client.post(reverse(f'camp_meeting:{name}'), json.dumps(payload), content_type='application/json')
+
+    def confirm(self, **kwargs):
+        return self.client.post(self.confirmation_url, json.dumps(self.payload(**kwargs)),
+                                content_type='application/json')
+
+    @cached_property
+    def confirmation_url(self):
+        return reverse('camp_meeting:c2b_confirmation')
+
+
+@override_settings(C2B_PROCESS_INTERVAL=0)
+class C2BConfirmationTest(TestCase):
+    def setUp(self):
+        self.daraja = DarajaC2BStub(self.client)
+
+    def test_validation(self):
+        self.assertEqual(self.daraja.post('c2b_validation', self.daraja.payload())
+                         .json()['ResultCode'], '0')
+        self.assertEqual(self.daraja.post('c2b_validation', self.daraja.payload(amount=0))
+                         .json()['ResultCode'], 'C2B00013')
+
+    def test_confirmation_is_single_insert(self):
+        payload = self.daraja.payload()
+        with self.assertNumQueries(1):
+            response = self.daraja.post('c2b_confirmation', payload)
+        self.assertEqual(response.json()['ResultCode'], 0)
+        # Daraja retries are acknowledged without a second row
+        self.daraja.post('c2b_confirmation', payload)
+        self.assertEqual(C2BPayment.objects.count(), 1)
+
+    def test_matches_pending_stk_contribution(self):
+        pending = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678",
+                                              amount=500, status=Contribution.Status.PENDING)
+        self.daraja.confirm(amount=500, msisdn='0712345678', bill_ref=mpesa.account_reference('Camp2025', pending.pk))
+        self.daraja.confirm(amount=1000, msisdn='2547*****678', bill_ref='0798765432')
+        self.assertEqual(process_pending_payments(), 2)
+
+        pending.refresh_from_db()
+        self.assertTrue(pending.is_verified)
+        self.assertEqual(pending.mpesa_transaction_id, 'RKT0000001')
+        new = Contribution.objects.get(mpesa_transaction_id='RKT0000002')
+        self.assertEqual(new.phone_number, '254798765432')
+        self.assertEqual(new.full_name, 'Grace Wanjiku')
+        self.assertEqual(Contribution.objects.count(), 2)
+        self.assertFalse(C2BPayment.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(sum(ContributionRollup.objects.filter(status=Contribution.Status.COMPLETED).values_list('count', flat=True)), 2)
+
+    def test_account_reference_names_the_contribution(self):
+        self.assertEqual(mpesa.account_reference('Camp2025', 123), 'Camp2025-123')
+        self.assertEqual(mpesa.account_reference('Camp2025', 1234567), 'Camp-1234567')
+        payload = mpesa.stk_push_payload('254712345678', 500, CampMeetingSettings(account_number='Camp2025'),
+                                         mpesa.get_shard(), 123)
+        self.assertEqual(payload['AccountReference'], 'Camp2025-123')
+
+    def test_same_phone_and_amount_is_a_separate_payment(self):
+        pending = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=1000,
+                                              status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        # Paid by paybill with the plain account number while the STK prompt is still open
+        self.daraja.confirm(amount=1000, msisdn='254712345678')
+        process_pending_payments()
+        pending.refresh_from_db()
+        self.assertFalse(pending.is_verified)
+
+        # A mistyped amount doesn't complete the attempt either
+        self.daraja.confirm(amount=100, msisdn='254712345678', bill_ref=mpesa.account_reference('Camp2025', pending.pk))
+        process_pending_payments()
+        pending.refresh_from_db()
+        self.assertFalse(pending.is_verified)
+        self.assertEqual(Contribution.objects.filter(is_verified=True).count(), 2)
+
+    def test_stk_callback_after_a_paybill_payment_completed_the_attempt(self):
+        pending = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=1000,
+                                              status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        self.daraja.confirm(amount=1000, msisdn='254712345678', bill_ref=mpesa.account_reference('Camp2025', pending.pk))
+        process_pending_payments()
+
+        def callback(receipt):
+            return self.daraja.post('mpesa_callback', {'Body': {'stkCallback': {
+                'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0, 'ResultDesc': 'OK',
+                'CallbackMetadata': {'Item': [
+                    {'Name': 'Amount', 'value': 1000},
+                    {'Name': 'MpesaReceiptNumber', 'value': receipt},
+                    {'Name': 'PhoneNumber', 'value': 254712345678},
+                ]},
+            }}})
+
+        # The push's own receipt is a second payment, its redelivery and the C2B receipt are not
+        self.assertEqual(callback('QK9STK').json()['message'], 'Payment verified')
+        self.assertEqual(callback('QK9STK').json()['message'], 'Already processed')
+        self.assertEqual(callback('RKT0000001').json()['message'], 'Already processed')
+        self.assertEqual(
+            sorted(Contribution.objects.filter(is_verified=True).values_list('mpesa_transaction_id', flat=True)),
+            ['QK9STK', 'RKT0000001'],
+        )
+        self.assertEqual(Decimal(self.client.get(reverse('camp_meeting:stats')).json()['total_contributions']), 2000)
+
+    def test_already_recorded_receipt_is_linked(self):
+        existing = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                               status=Contribution.Status.COMPLETED, is_verified=True, mpesa_transaction_id='RKT0000001')
+        self.daraja.confirm()
+        process_pending_payments()
+        self.assertEqual(C2BPayment.objects.get().contribution, existing)
+        self.assertEqual(Contribution.objects.count(), 1)
+
+    def test_burst_of_confirmations_updates_totals(self):
+        # Only correctness here, benchmarks/c2b_burst.py measures the throughput
+        count = 1000
+        payloads = [self.daraja.payload(amount=100, msisdn=f'2547{i:08d}') for i in range(count)]
+        # Daraja redelivers some confirmations when an acknowledgement is slow
+        for payload in payloads + payloads[::7]:
+            self.daraja.post('c2b_confirmation', payload)
+
+        self.assertEqual(process_pending_payments(batch_size=300), count)
+        receipts = list(Contribution.objects.values_list('mpesa_transaction_id', flat=True))
+        self.assertEqual(sorted(receipts), sorted(p['TransID'] for p in payloads))
+        self.assertFalse(C2BPayment.objects.filter(contribution__isnull=True).exists())
+        response = self.client.get(reverse('camp_meeting:stats'))
+        self.assertEqual(Decimal(response.json()['total_contributions']), Decimal(count * 100))
+
+    @override_settings(C2B_PROCESS_INTERVAL=1)
+    def test_confirmation_processes_inline(self):
+        self.daraja.confirm()
+        self.assertTrue(Contribution.objects.filter(mpesa_transaction_id='RKT0000001').exists())
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_threads(self, target, count=20):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_token_bucket_is_exact_under_concurrency(self):
+        allowed = []
+
+        def hammer():
+            for _ in range(10):
+                allowed.append(take_token('test', 50, 3600)[0])
+
+        self.run_threads(hammer)
+        self.assertEqual(allowed.count(True), 50)
+        self.assertEqual(len(allowed), 200)
+
+    def test_bucket_refills_steadily(self):
+        started = time.time()
+
+        def take_at(seconds):
+            with mock.patch('time.time', return_value=started + seconds):
+                return take_token('steady', 10, 60)
+
+        self.assertTrue(all(take_at(0)[0] for _ in range(10)))
+        allowed, retry_after = take_at(0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 6, places=3)
+        # One token every six seconds, not a new burst of ten at the next minute
+        self.assertFalse(take_at(3)[0])
+        self.assertTrue(take_at(6)[0])
+        self.assertFalse(take_at(6)[0])
+        self.assertEqual(sum(take_at(60)[0] for _ in range(20)), 9)
+        # A quiet bucket fills up to its capacity and no further
+        self.assertEqual(sum(take_at(1000)[0] for _ in range(20)), 10)
+
+    @override_settings(DARAJA_MAX_IN_FLIGHT=5)
+    def test_in_flight_cap_sheds_excess_calls(self):
+        barrier = threading.Barrier(20)
+        results = []
+
+        def call_daraja():
+            try:
+                with daraja_slot():
+                    results.append('called')
+                    barrier.wait(timeout=5)
+            except DarajaOverloaded:
+                results.append('shed')
+                barrier.wait(timeout=5)
+
+        self.run_threads(call_daraja)
+        self.assertEqual(results.count('called'), 5)
+        self.assertEqual(results.count('shed'), 15)
+        with daraja_slot():
+            pass  # every slot was released
+
+    def test_in_flight_count_outlives_the_ttl_while_busy(self):
+        started = time.time()
+
+        def later(seconds):
+            return mock.patch('time.time', return_value=started + seconds)
+
+        # A new call every 100s keeps the counter alive past IN_FLIGHT_TTL
+        enter_in_flight(IN_FLIGHT_KEY)
+        with later(IN_FLIGHT_TTL - 20):
+            enter_in_flight(IN_FLIGHT_KEY)
+        with later(IN_FLIGHT_TTL + 60):
+            self.assertEqual(cache.get(IN_FLIGHT_KEY), 2)
+            leave_in_flight(IN_FLIGHT_KEY)
+            leave_in_flight(IN_FLIGHT_KEY)
+            self.assertEqual(cache.get(IN_FLIGHT_KEY), 0)
+
+        # After a quiet spell the counter expires under a stuck call, whose late
+        # release must not leave the new counter below zero
+        enter_in_flight(IN_FLIGHT_KEY)
+        with later(3 * IN_FLIGHT_TTL):
+            enter_in_flight(IN_FLIGHT_KEY)
+            leave_in_flight(IN_FLIGHT_KEY)
+            leave_in_flight(IN_FLIGHT_KEY)
+            self.assertEqual(cache.get(IN_FLIGHT_KEY), 0)
+
+    @override_settings(DARAJA_MAX_IN_FLIGHT=1)
+    async def test_async_slot_counts_like_the_sync_one(self):
+        async with adaraja_slot():
+            with self.assertRaises(DarajaOverloaded):
+                with daraja_slot():
+                    pass
+        self.assertEqual(await cache.aget(IN_FLIGHT_KEY), 0)
+
+    @override_settings(RATE_LIMITS={'stk_status': [('ip', 2, 60)]})
+    def test_view_returns_429_with_retry_after(self):
+        url = reverse('camp_meeting:stk-status')
+        body = json.dumps({'checkout_request_id': 'ws_CO_1'})
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 404)
+        response = self.client.post(url, body, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    @override_settings(RATE_LIMITS={'contribute': [('phone', 0, 60)]})
+    def test_contribute_limited_per_phone(self):
+        response = self.client.post(reverse('camp_meeting:contribute'), json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com',
+            'phone_number': '0712345678', 'amount': 500,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(Contribution.objects.exists())
+
+    @override_settings(DARAJA_MAX_IN_FLIGHT=0)
+    def test_contribute_sheds_when_daraja_saturated(self):
+        response = self.client.post(reverse('camp_meeting:contribute'), json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com',
+            'phone_number': '0712345678', 'amount': 500,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Contribution.objects.exists())
+
+
+class CacheConfigTest(SimpleTestCase):
+    def test_cache_url(self):
+        from camp_meeting_project.settings import cache_from_url
+        self.assertEqual(cache_from_url('redis://cache:6379/1'),
+                         {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'})
+        self.assertEqual(cache_from_url('db://')['LOCATION'], 'camp_meeting_cache')
+        self.assertEqual(cache_from_url('file:///tmp/camp')['LOCATION'], '/tmp/camp')
+        self.assertEqual(cache_from_url('locmem://')['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        with self.assertRaises(ValueError):
+            cache_from_url('memcache://localhost')
+
+    def test_deploy_check_flags_per_process_cache(self):
+        from .apps import check_shared_cache
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['camp_meeting.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://cache:6379/1'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+BREAKER_PROBE = '''
+import django
+django.setup()
+from camp_meeting.breaker import CircuitBreaker
+breaker = CircuitBreaker('shared', failure_threshold=3, reset_timeout=30)
+for _ in range({failures}):
+    breaker.record_failure()
+print(breaker.state)
+'''
+
+
+class SharedBreakerTest(SimpleTestCase):
+    """Workers are separate processes, so the breaker has to go through a cache they share"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+
+    def other_worker(self, failures=0):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='camp_meeting_project.settings',
+                   CACHE_URL=f'file://{self.location}')
+        result = subprocess.run(
+            [sys.executable, '-c', BREAKER_PROBE.format(failures=failures)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.strip().splitlines()[-1]
+
+    def test_state_is_shared_across_processes(self):
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.location,
+        }}):
+            breaker = CircuitBreaker('shared', failure_threshold=3, reset_timeout=30)
+            self.assertEqual(self.other_worker(failures=3), 'open')
+            self.assertEqual(breaker.state, 'open')
+            self.assertFalse(breaker.allow_request())
+
+            breaker.record_success()
+            self.assertEqual(self.other_worker(), 'closed')
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+
+    def fail(self):
+        with self.assertRaises(ValueError):
+            self.breaker.call(int, 'not a number', failure_exceptions=(ValueError,))
+
+    def expire_open_period(self):
+        cache.set(self.breaker.state_key, {'state': 'open', 'opened_at': time.time() - 31}, None)
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        for _ in range(3):
+            self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(int, '1')
+
+    def test_success_resets_failure_count(self):
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.call(int, '1'), 1)
+        self.fail()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_half_open_probe_restores_service(self):
+        transitions = []
+
+        def receiver(sender, name, old_state, new_state, **kwargs):
+            transitions.append((old_state, new_state))
+
+        circuit_state_changed.connect(receiver)
+        self.addCleanup(circuit_state_changed.disconnect, receiver)
+        for _ in range(3):
+            self.fail()
+
+        self.expire_open_period()
+        self.assertTrue(self.breaker.allow_request())  # this worker probes
+        self.assertFalse(self.breaker.allow_request())  # everyone else still fails fast
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(transitions, [('closed', 'open'), ('open', 'half_open'), ('half_open', 'closed')])
+        self.assertEqual(len(self.breaker.snapshot()['transitions']), 3)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            self.fail()
+        self.expire_open_period()
+        self.fail()
+        self.assertEqual(self.breaker.state, 'open')
+
+
+@mock.patch.object(mpesa, 'MPESA_BASE_URL', 'http://127.0.0.1:9')  # nothing listens here
+class DarajaDownTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contribute_url = reverse('camp_meeting:contribute')
+        breaker = mock.patch.multiple(mpesa.daraja_breaker, failure_threshold=2, reset_timeout=60)
+        breaker.start()
+        self.addCleanup(breaker.stop)
+
+    def contribute(self, phone):
+        return self.client.post(self.contribute_url, json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com', 'phone_number': phone, 'amount': 500,
+        }), content_type='application/json')
+
+    def test_pushes_are_queued_and_breaker_opens(self):
+        for phone in ('0712345671', '0712345672', '0712345673'):
+            response = self.contribute(phone)
+            self.assertEqual(response.status_code, 202)
+            self.assertTrue(response.json()['queued'])
+
+        self.assertEqual(QueuedStkPush.objects.count(), 3)
+        self.assertEqual(mpesa.daraja_breaker.state, 'open')
+        health = self.client.get(reverse('camp_meeting:daraja_health'))
+        self.assertEqual(health.status_code, 503)
+        self.assertEqual(health.json()['queued_stk_pushes'], 3)
+
+        # Nothing is sent while the circuit is open
+        self.assertEqual(retry_queued_pushes(), 0)
+        self.assertEqual(QueuedStkPush.objects.count(), 3)
+
+    def test_each_queued_push_is_sent_by_one_worker(self):
+        contribution = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500)
+        queue_stk_push(contribution, 'down')
+        sent = []
+
+        def push(*args, **kwargs):
+            sent.append(args)
+            # A second worker's pass while this one waits on Daraja
+            self.assertEqual(retry_queued_pushes(), 0)
+            return {'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'}
+
+        with mock.patch('camp_meeting.stk_queue.initiate_stk_push', side_effect=push):
+            self.assertEqual(retry_queued_pushes(), 1)
+        self.assertEqual(len(sent), 1)
+        self.assertFalse(QueuedStkPush.objects.exists())
+
+    def test_claim_goes_to_the_first_worker(self):
+        contribution = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500)
+        queue_stk_push(contribution, 'down')
+        # Both workers read the item before either claimed it
+        first, second = QueuedStkPush.objects.get(), QueuedStkPush.objects.get()
+        now = timezone.now()
+        self.assertTrue(claim(first, now))
+        self.assertFalse(claim(second, now))
+
+    def test_status_served_from_database_when_open(self):
+        for phone in ('0712345671', '0712345672'):
+            self.contribute(phone)
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                    status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        response = self.client.post(reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': 'ws_CO_1'}),
+                                    content_type='application/json')
+        self.assertTrue(response.json()['degraded'])
+        self.assertEqual(response.json()['status']['ResultCode'], -1)
+        self.assertEqual(response.json()['status']['Status'], 'Pending')
+
+
+class MyContributionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('camp_meeting:my_contributions')
+
+    def contribution(self, phone_number, amount, **kwargs):
+        kwargs.setdefault('is_verified', True)
+        kwargs.setdefault('status', Contribution.Status.COMPLETED)
+        return Contribution.objects.create(full_name="Grace Wanjiku", phone_number=phone_number, amount=amount, **kwargs)
+
+    def lookup(self, phone_number):
+        return self.client.post(self.url, json.dumps({'phone_number': phone_number}), content_type='application/json')
+
+    def paid_from_here(self, *contributions):
+        session = self.client.session
+        session[SESSION_CONTRIBUTIONS_KEY] = [c.pk for c in contributions]
+        session.save()
+
+    def test_phone_formats_share_one_lookup_key(self):
+        for phone_number in ('0712345678', '+254 712 345 678', '712345678', '254712345678'):
+            self.assertEqual(self.contribution(phone_number, 100).phone_normalized, '254712345678')
+        self.assertEqual(self.contribution('2547****678', 100).phone_normalized, '')
+
+        form = ContributionForm(data={'full_name': 'Grace', 'phone_number': '+254712345678',
+                                      'email': 'grace@example.com', 'amount': 100})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['phone_number'], '254712345678')
+
+    def test_callback_phone_is_normalized(self):
+        contribution = self.contribution('0712345678', 500, is_verified=False, status=Contribution.Status.PENDING,
+                                         checkout_request_id='ws_CO_1')
+        self.client.post(reverse('camp_meeting:mpesa_callback'), json.dumps({'Body': {'stkCallback': {
+            'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0, 'ResultDesc': 'OK',
+            'CallbackMetadata': {'Item': [
+                {'Name': 'Amount', 'value': 500},
+                {'Name': 'MpesaReceiptNumber', 'value': 'QK12ABC'},
+                {'Name': 'PhoneNumber', 'value': 254712345678},
+            ]},
+        }}}), content_type='application/json')
+        contribution.refresh_from_db()
+        self.assertEqual(contribution.phone_number, '254712345678')
+        self.assertEqual(contribution.phone_normalized, '254712345678')
+
+    def test_lists_verified_contributions_and_total_in_one_query(self):
+        self.paid_from_here(self.contribution('0712345678', 500, mpesa_transaction_id='QK12ABC'))
+        self.contribution('254712345678', 1500)
+        self.contribution('0712345678', 700, is_verified=False, status=Contribution.Status.PENDING)
+        self.contribution('0798765432', 2000)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.lookup('0712 345 678')
+        # The rest is loading and saving the session
+        self.assertEqual(len([q for q in queries if 'camp_meeting_contribution' in q['sql']]), 1)
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['total'], 2000.0)
+        self.assertEqual([c['amount'] for c in data['contributions']], [1500.0, 500.0])
+        self.assertNotIn('mpesa_transaction_id', data['contributions'][0])
+
+    def test_unknown_and_invalid_numbers(self):
+        self.assertEqual(self.lookup('0711111111').status_code, 403)
+        self.assertEqual(self.lookup('12345').status_code, 400)
+
+    def test_only_numbers_paid_from_this_browser(self):
+        mine = self.contribution('0712345678', 500)
+        self.contribution('0798765432', 2000)
+        self.assertEqual(self.lookup('0712345678').status_code, 403)
+
+        self.paid_from_here(mine)
+        self.assertEqual(self.lookup('0712345678').json()['total'], 500.0)
+        self.assertEqual(self.lookup('0798765432').status_code, 403)
+
+        # Starting a push to someone else's number isn't enough, they have to pay it
+        pushed = self.contribution('0798765432', 10, is_verified=False, status=Contribution.Status.PENDING)
+        self.paid_from_here(mine, pushed)
+        self.assertEqual(self.lookup('0798765432').status_code, 403)
+
+    @mock.patch('camp_meeting.views.initiate_stk_push',
+                return_value={'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'})
+    def test_contributing_remembers_the_contribution(self, push):
+        self.client.post(reverse('camp_meeting:contribute'), json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com', 'phone_number': '0712345678', 'amount': 500,
+        }), content_type='application/json')
+        contribution = Contribution.objects.get()
+        self.assertEqual(self.client.session[SESSION_CONTRIBUTIONS_KEY], [contribution.pk])
+
+        Contribution.objects.filter(pk=contribution.pk).update(status=Contribution.Status.COMPLETED, is_verified=True)
+        self.assertEqual(self.lookup('0712345678').json()['count'], 1)
+
+    def test_backfill_migration(self):
+        from importlib import import_module
+        from django.apps import apps
+        migration = import_module('camp_meeting.migrations.0008_contribution_phone_normalized')
+
+        self.contribution('0712345678', 500)
+        self.contribution('2547****678', 500)
+        Contribution.objects.update(phone_normalized='')
+        with mock.patch.object(migration, 'BACKFILL_BATCH_SIZE', 1):
+            migration.backfill_phone_normalized(apps, mock.Mock(connection=connections['default']))
+        self.assertEqual(sorted(Contribution.objects.values_list('phone_normalized', flat=True)), ['', '254712345678'])
+
+
+class ArchiveContributionsTest(TestCase):
+    def setUp(self):
+        old = timezone.now() - timezone.timedelta(days=45)
+        self.recent = timezone.now() - timezone.timedelta(days=2)
+        self.abandoned = [
+            Contribution.objects.create(full_name="Grace Wanjiku", phone_number="0712345678", amount=500,
+                                        status=status, created_at=old, shard='beta')
+            for status in (Contribution.Status.PENDING, Contribution.Status.FAILED, Contribution.Status.CANCELLED)
+        ]
+        self.completed = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="0712345678", amount=500,
+                                                     status=Contribution.Status.COMPLETED, is_verified=True, created_at=old)
+        self.recent_failure = Contribution.objects.create(full_name="John Otieno", phone_number="0798765432",
+                                                          amount=100, status=Contribution.Status.FAILED, created_at=self.recent)
+        queued = Contribution.objects.create(full_name="John Otieno", phone_number="0798765432", amount=100,
+                                             status=Contribution.Status.PENDING, created_at=old)
+        QueuedStkPush.objects.create(contribution=queued)
+
+    def test_dry_run_changes_nothing(self):
+        out = StringIO()
+        call_command('archive_contributions', '--dry-run', stdout=out)
+        self.assertIn('1 cancelled, 1 failed, 1 pending', out.getvalue())
+        self.assertEqual(ArchivedContribution.objects.count(), 0)
+        self.assertEqual(Contribution.objects.count(), 6)
+
+    def test_archives_old_abandoned_attempts_in_batches(self):
+        rollups_before = set(ContributionRollup.objects.values_list('bucket', 'status', 'count', 'total_amount'))
+        out = StringIO()
+        call_command('archive_contributions', '--batch-size', '2', stdout=out)
+
+        self.assertIn('2/3 archived', out.getvalue())
+        self.assertIn('Archived 3 contributions', out.getvalue())
+        self.assertEqual(
+            set(ArchivedContribution.objects.values_list('original_id', flat=True)),
+            {c.pk for c in self.abandoned},
+        )
+        archived = ArchivedContribution.objects.get(original_id=self.abandoned[1].pk)
+        self.assertEqual((archived.status, archived.phone_normalized, archived.shard),
+                         (Contribution.Status.FAILED, '254712345678', 'beta'))
+        self.assertEqual(Contribution.objects.count(), 3)
+
+        # Archived attempts stay in the trends, and a rebuild agrees
+        rollups_after = set(ContributionRollup.objects.values_list('bucket', 'status', 'count', 'total_amount'))
+        self.assertEqual(rollups_before, rollups_after)
+        call_command('rebuild_rollups', stdout=StringIO())
+        rebuilt = set(ContributionRollup.objects.values_list('bucket', 'status', 'count', 'total_amount'))
+        self.assertEqual(rollups_before, rebuilt)
+
+        self.assertEqual(archive_contributions(archive_cutoff(30)), 0)
+
+    def test_archive_admin_is_read_only(self):
+        User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.login(username="admin", password="adminpass")
+        archive_contributions(archive_cutoff(30))
+        archived = ArchivedContribution.objects.first()
+
+        response = self.client.get(reverse('admin:camp_meeting_archivedcontribution_changelist'), {'q': '0712'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        response = self.client.get(reverse('admin:camp_meeting_archivedcontribution_change', args=[archived.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['has_change_permission'])
+        self.assertFalse(response.context['has_delete_permission'])
+
+
+STARTUP_PROBE = """
+import os, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - started)
+print(sorted(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+class StartupTimeTest(SimpleTestCase):
+    # Seconds allowed for django.setup() plus loading the URLconf in a fresh process
+    budget = float(os.environ.get('STARTUP_TIME_BUDGET', 2.0))
+    # PDF export, and the async Daraja client that only ASGI workers need
+    heavy_modules = ('weasyprint', 'httpx')
+
+    def measure(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='camp_meeting_project.settings', ASYNC_VIEWS='False')
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE.format(heavy=self.heavy_modules)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        elapsed, loaded = result.stdout.strip().splitlines()[-2:]
+        return float(elapsed), loaded
+
+    def test_startup_within_budget(self):
+        # Best of three, so one slow run on a busy machine doesn't fail the build
+        runs = [self.measure() for _ in range(3)]
+        fastest = min(elapsed for elapsed, _ in runs)
+        self.assertLess(fastest, self.budget, f"startup took {fastest:.2f}s, budget is {self.budget:.2f}s")
+        self.assertEqual(runs[0][1], '[]', "heavy libraries were imported at startup")
+
+
+@override_settings(READ_REPLICA_ALIAS='replica')
+class ReplicaRouterTest(TestCase):
+    """Runs against a second SQLite file that never receives the primary's writes"""
+    # Resolved in setUpClass, after the replica alias has been added
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp()
+        replica = copy.deepcopy(connections.settings['default'])
+        replica['NAME'] = os.path.join(cls.replica_dir, 'replica.sqlite3')
+        replica['TEST'] = {**replica['TEST'], 'NAME': replica['NAME']}
+        connections.settings['replica'] = replica
+        call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        User.objects.create_superuser(username="admin", password="adminpass")
+        self.client.login(username="admin", password="adminpass")
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="0712345678", amount=500,
+                                    status=Contribution.Status.COMPLETED, is_verified=True, mpesa_transaction_id='QK12ABC')
+
+    def test_reporting_views_read_the_replica(self):
+        self.assertEqual(self.client.get(reverse('camp_meeting:stats')).json()['total_contributions'], 0)
+        response = self.client.get(reverse('camp_meeting:finance_report'))
+        self.assertEqual(len(response.context['transactions']), 0)
+        response = self.client.get(reverse('admin:camp_meeting_contribution_changelist'))
+        self.assertEqual(len(response.context['cl'].result_list), 0)
+
+        with self.settings(READ_REPLICA_ALIAS=None):
+            total = self.client.get(reverse('camp_meeting:stats')).json()['total_contributions']
+            self.assertEqual(Decimal(total), 500)
+
+    def test_payment_path_stays_on_primary(self):
+        session = self.client.session
+        session[SESSION_CONTRIBUTIONS_KEY] = list(Contribution.objects.values_list('pk', flat=True))
+        session.save()
+        response = self.client.post(reverse('camp_meeting:my_contributions'), json.dumps({'phone_number': '0712345678'}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_camp_settings_are_loaded_from_the_primary(self):
+        CampMeetingSettings.objects.create(target_amount=Decimal('1000.00'), paybill_number='600100',
+                                           event_start_date=timezone.make_aware(datetime(2026, 8, 16)),
+                                           event_end_date=timezone.make_aware(datetime(2026, 8, 23)))
+        invalidate_settings_cache()
+        # The landing page reads the replica, which hasn't caught up with the save
+        with request_scope(), read_from_replica():
+            self.assertEqual(get_active_settings().paybill_number, '600100')
+
+    def test_reads_after_a_write_use_the_primary(self):
+        with request_scope(), read_from_replica():
+            self.assertEqual(Contribution.objects.count(), 0)
+            Contribution.objects.create(full_name="John Otieno", phone_number="0798765432", amount=100)
+            self.assertEqual(Contribution.objects.count(), 2)
+
+        # The next request starts over on the replica
+        with request_scope(), read_from_replica():
+            self.assertEqual(Contribution.objects.count(), 0)
+
+    def test_only_real_writes_move_reads_to_the_primary(self):
+        with request_scope(), read_from_replica():
+            # Asking where a write would go, or loading the camp settings from the primary, writes nothing
+            router.db_for_write(Contribution)
+            invalidate_settings_cache()
+            get_active_settings()
+            self.assertEqual(Contribution.objects.count(), 0)
+
+    def test_objects_read_from_replica_are_saved_to_primary(self):
+        with request_scope(), read_from_replica():
+            Contribution.objects.using('replica').create(full_name="Mary Achieng", phone_number="0700000001", amount=50)
+        with request_scope(), read_from_replica():
+            replica_copy = Contribution.objects.get(full_name="Mary Achieng")
+            self.assertEqual(replica_copy._state.db, 'replica')
+            replica_copy.status = Contribution.Status.FAILED
+            replica_copy.save()
+        self.assertTrue(Contribution.objects.filter(full_name="Mary Achieng", status=Contribution.Status.FAILED).exists())
+
+
+class IntegerStatusMigrationTest(TransactionTestCase):
+    migrate_from = [('camp_meeting', '0009_archivedcontribution')]
+    migrate_to = [('camp_meeting', '0010_integer_status')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_mixed_case_statuses_are_converted(self):
+        old_apps = self.migrate(self.migrate_from)
+        OldContribution = old_apps.get_model('camp_meeting', 'Contribution')
+        OldRollup = old_apps.get_model('camp_meeting', 'ContributionRollup')
+        rows = [('Completed', True), ('completed', True), ('Failed', False), ('Cancelled', False),
+                ('pending', False), ('', True), ('unknown', False)]
+        for status, is_verified in rows:
+            OldContribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=100,
+                                           status=status, is_verified=is_verified)
+        bucket = timezone.make_aware(datetime(2025, 8, 17, 10))
+        OldRollup.objects.create(bucket=bucket, status='completed', count=2, total_amount=200)
+        OldRollup.objects.create(bucket=bucket, status='pending', count=1, total_amount=100)
+        OldRollup.objects.create(bucket=bucket, status='unknown', count=1, total_amount=100)
+
+        from importlib import import_module
+        migration = import_module('camp_meeting.migrations.0010_integer_status')
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            self.migrate(self.migrate_to)
+
+        Status = Contribution.Status
+        self.assertEqual(
+            list(Contribution.objects.order_by('pk').values_list('status', flat=True)),
+            [Status.COMPLETED, Status.COMPLETED, Status.FAILED, Status.CANCELLED, Status.PENDING,
+             Status.COMPLETED, Status.PENDING],
+        )
+        self.assertEqual(
+            set(ContributionRollup.objects.values_list('status', 'count')),
+            {(Status.COMPLETED, 2), (Status.PENDING, 2)},
+        )
+
+
+@override_settings(DEBUG=True)
+class SeedContributionsTest(TestCase):
+    fields = ('full_name', 'phone_normalized', 'amount', 'status', 'mpesa_transaction_id', 'created_at')
+
+    def seed(self, *args):
+        call_command('seed_contributions', '--database', 'default', '--end', '2025-08-24', *args, stdout=StringIO())
+
+    def seeded_rows(self):
+        return list(Contribution.objects.order_by('pk').values_list(*self.fields))
+
+    def test_same_seed_gives_same_rows_even_when_appended(self):
+        self.seed('--rows', '2500')
+        rows = self.seeded_rows()
+        Contribution.objects.all().delete()
+
+        self.seed('--rows', '1200')
+        self.seed('--rows', '2500', '--append')
+        self.assertEqual(self.seeded_rows(), rows)
+
+        Contribution.objects.all().delete()
+        self.seed('--rows', '2500', '--seed', '7')
+        self.assertNotEqual(self.seeded_rows(), rows)
+
+    def test_rows_look_like_a_fundraiser(self):
+        self.seed('--rows', '2500')
+        Status = Contribution.Status
+        contributions = Contribution.objects.all()
+        self.assertEqual(contributions.count(), 2500)
+
+        # Duplicates only come from receipts recorded twice, which the seeder doesn't do
+        statuses = {status: contributions.filter(status=status).count() for status in Status if status != Status.DUPLICATE}
+        self.assertGreater(statuses[Status.COMPLETED], 1500)
+        self.assertTrue(all(statuses.values()))
+
+        completed = contributions.filter(status=Status.COMPLETED)
+        receipts = list(completed.values_list('mpesa_transaction_id', flat=True))
+        self.assertEqual(len(set(receipts)), len(receipts))
+        self.assertFalse(completed.filter(is_verified=False).exists())
+        self.assertFalse(contributions.exclude(status=Status.COMPLETED).filter(is_verified=True).exists())
+
+        # Repeat donors, and every row inside the 90 days before --end
+        self.assertLess(contributions.values('phone_normalized').distinct().count(), 1000)
+        end = timezone.make_aware(datetime(2025, 8, 25))
+        self.assertFalse(contributions.filter(created_at__gte=end).exists())
+        self.assertFalse(contributions.filter(created_at__lt=end - timezone.timedelta(days=90)).exists())
+
+        # The raw inserts skip the signals, the command rebuilds the rollups and leaderboard afterwards
+        self.assertEqual(sum(ContributionRollup.objects.values_list('count', flat=True)), 2500)
+        self.assertEqual(sum(ContributorTotal.objects.values_list('count', flat=True)),
+                         contributions.filter(is_verified=True).exclude(phone_normalized='').count())
+
+    def test_default_window_does_not_depend_on_today(self):
+        self.seed('--rows', '500')
+        rows = self.seeded_rows()
+        Contribution.objects.all().delete()
+        call_command('seed_contributions', '--database', 'default', '--rows', '500', stdout=StringIO())
+        self.assertEqual(self.seeded_rows(), rows)
+
+    def test_benchmark_database_needs_a_file(self):
+        if 'benchmark' in connections.settings:
+            self.skipTest("BENCHMARK_DB_NAME is set")
+        with self.assertRaisesMessage(CommandError, "BENCHMARK_DB_NAME"):
+            call_command('seed_contributions', '--rows', '100', stdout=StringIO())
+
+    def test_refuses_to_add_to_existing_rows_without_append(self):
+        self.seed('--rows', '100')
+        with self.assertRaisesMessage(CommandError, "use --append"):
+            self.seed('--rows', '200')
+
+    @override_settings(DEBUG=False)
+    def test_refuses_default_database_in_production(self):
+        with self.assertRaisesMessage(CommandError, "Refusing"):
+            self.seed('--rows', '100')
+        self.assertFalse(Contribution.objects.exists())
+
+
+class RequestProfilingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.profiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles)
+        settings_override = override_settings(PROFILING_DIR=self.profiles, PROFILING_KEEP=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                    status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+
+    def test_requests_without_the_trigger_are_not_profiled(self):
+        self.client.force_login(self.staff)
+        with mock.patch('cProfile.Profile') as profiler:
+            response = self.client.get(reverse('camp_meeting:stats'))
+        profiler.assert_not_called()
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profiles), [])
+
+    def test_non_staff_cannot_trigger_profiling(self):
+        User.objects.create_user('volunteer', password='secret')
+        self.client.login(username='volunteer', password='secret')
+        response = self.client.get(reverse('camp_meeting:stats'), {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profiles), [])
+
+    def test_staff_request_is_profiled_with_queries_and_daraja_calls(self):
+        self.client.force_login(self.staff)
+        daraja = mock.Mock(status_code=200)
+        paid = {'ResultCode': '0', 'ResultDesc': 'Paid'}
+        daraja.json.side_effect = [{'access_token': 'token'}, paid, paid]
+        with mock.patch('camp_meeting.mpesa.requests.request', return_value=daraja):
+            response = self.client.post(reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': 'ws_CO_1'}),
+                                        content_type='application/json', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+
+        summary = self.client.get(response['X-Profile-Url'])
+        self.assertEqual(summary.status_code, 200)
+        html = summary.content.decode()
+        self.assertIn('2 Daraja calls', html)
+        self.assertIn('camp_meeting_contribution', html)
+        self.assertIn('camp_meeting/views.py', html)
+
+        download = self.client.get(reverse('camp_meeting:profile_download', args=[response['X-Profile-Id']]))
+        self.assertIn('attachment', download['Content-Disposition'])
+        path = os.path.join(self.profiles, 'download.prof')
+        with open(path, 'wb') as f:
+            f.write(b''.join(download.streaming_content))
+        stats = __import__('pstats').Stats(path)
+        self.assertTrue(any(name == 'stk_status_view' for _, _, name in stats.stats))
+
+    async def test_async_request_records_queries_from_sync_to_async(self):
+        # Under ASGI the view's ORM calls run in sync_to_async's thread, not on the event loop
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        response = await self.async_client.get(reverse('camp_meeting:finance_report'), {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+
+        base = os.path.join(self.profiles, response['X-Profile-Id'])
+        with open(f'{base}.html') as f:
+            html = f.read()
+        self.assertNotIn(' 0 queries', html)
+        self.assertIn('camp_meeting_contribution', html)
+        self.assertIn('camp_meeting/views.py', html)
+        stats = __import__('pstats').Stats(f'{base}.prof')
+        self.assertTrue(any(name == 'finance_report' for _, _, name in stats.stats))
+
+    async def test_overlapping_requests_are_profiled_one_at_a_time(self):
+        # Python 3.12+ refuses a second active profiler, so the later request runs unprofiled
+        both_in_view = asyncio.Event()
+        in_view = []
+
+        async def view(request):
+            in_view.append(request)
+            if len(in_view) == 2:
+                both_in_view.set()
+            await both_in_view.wait()
+            return HttpResponse('ok')
+
+        middleware = ProfilingMiddleware(view)
+        requests = [AsyncRequestFactory().get('/', {'_profile': '1'}) for _ in range(3)]
+        for request in requests:
+            request.user = self.staff
+        responses = await asyncio.wait_for(asyncio.gather(middleware(requests[0]), middleware(requests[1])), 10)
+
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(sum('X-Profile-Id' in response for response in responses), 1)
+        self.assertEqual(sum('X-Profile-Skipped' in response for response in responses), 1)
+        # Free again once the profiled request is done
+        both_in_view.set()
+        self.assertIn('X-Profile-Id', await middleware(requests[2]))
+
+    def test_profiles_are_staff_only_and_pruned(self):
+        self.client.force_login(self.staff)
+        ids = [self.client.get(reverse('camp_meeting:stats'), {'_profile': '1'})['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(len(os.listdir(self.profiles)), 4)
+        self.assertEqual(self.client.get(reverse('camp_meeting:profile_summary', args=[ids[-1]])).status_code, 200)
+
+        self.client.logout()
+        response = self.client.get(reverse('camp_meeting:profile_summary', args=[ids[-1]]))
+        self.assertEqual(response.status_code, 302)
+
+
+class StkResultCacheTest(TestCase):
+    pending = {'errorCode': '500.001.1001', 'errorMessage': 'The transaction is being processed'}
+    paid = {'ResultCode': '0', 'ResultDesc': 'The service request is processed successfully.',
+            'MpesaReceiptNumber': 'QK12ABC'}
+
+    def setUp(self):
+        cache.clear()
+
+    def query_status(self, checkout_request_id='ws_CO_1'):
+        return self.client.post(reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': checkout_request_id}),
+                                content_type='application/json')
+
+    def test_terminal_contribution_skips_daraja(self):
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                    status=Contribution.Status.CANCELLED, checkout_request_id='ws_CO_1')
+        with mock.patch('camp_meeting.stk_results.query_stk_push') as query:
+            response = self.query_status()
+        query.assert_not_called()
+        self.assertEqual(response.json()['status']['ResultCode'], 1032)
+        self.assertEqual(response.json()['status']['Status'], 'Cancelled')
+
+    def test_status_is_logged_not_printed(self):
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                    status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        stdout = StringIO()
+        with mock.patch('camp_meeting.stk_results.query_stk_push', return_value=self.pending), \
+                contextlib.redirect_stdout(stdout), self.assertLogs('camp_meeting.views', 'DEBUG') as logs:
+            self.assertEqual(self.query_status().status_code, 200)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertIn('ws_CO_1', logs.output[0])
+
+    def test_final_results_are_kept_and_pending_ones_expire(self):
+        with mock.patch('camp_meeting.stk_results.query_stk_push', return_value=self.paid) as query:
+            self.assertEqual(query_stk_status('ws_CO_1'), self.paid)
+            with mock.patch('time.time', return_value=time.time() + 86400):
+                self.assertEqual(query_stk_status('ws_CO_1'), self.paid)
+        self.assertEqual(query.call_count, 1)
+
+        with override_settings(STK_QUERY_PENDING_TTL=5), \
+                mock.patch('camp_meeting.stk_results.query_stk_push', return_value=self.pending) as query:
+            query_stk_status('ws_CO_2')
+            query_stk_status('ws_CO_2')
+            self.assertEqual(query.call_count, 1)
+            with mock.patch('time.time', return_value=time.time() + 6):
+                query_stk_status('ws_CO_2')
+            self.assertEqual(query.call_count, 2)
+
+    def test_errors_are_not_cached(self):
+        with mock.patch('camp_meeting.stk_results.query_stk_push', return_value={'error': 'Bad token'}) as query:
+            query_stk_status('ws_CO_1')
+            query_stk_status('ws_CO_1')
+        self.assertEqual(query.call_count, 2)
+
+    def test_concurrent_queries_share_one_daraja_call(self):
+        calls = []
+
+        def slow_query(checkout_request_id, shard):
+            calls.append(checkout_request_id)
+            time.sleep(0.3)
+            return self.paid
+
+        results = []
+        with mock.patch('camp_meeting.stk_results.query_stk_push', side_effect=slow_query):
+            threads = [threading.Thread(target=lambda: results.append(query_stk_status('ws_CO_1'))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(calls, ['ws_CO_1'])
+        self.assertEqual(results, [self.paid] * 5)
+
+    def test_waiting_worker_gives_up_when_the_query_fails(self):
+        # Another worker holds the lock, then finishes without caching anything
+        cache.add(f"{result_key('ws_CO_1')}:lock", 1, 30)
+        threading.Timer(0.2, cache.delete, [f"{result_key('ws_CO_1')}:lock"]).start()
+        with mock.patch('camp_meeting.stk_results.query_stk_push') as query:
+            with self.assertRaises(StkResultUnavailable):
+                query_stk_status('ws_CO_1')
+        query.assert_not_called()
+
+    def test_waiters_do_not_save_a_settled_contribution_again(self):
+        contribution = Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                                    status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+
+        def settled_meanwhile(checkout_request_id, shard_name=''):
+            # The worker that ran the query (or the callback) saved it while this poll waited
+            winner = Contribution.objects.get(pk=contribution.pk)
+            winner.status, winner.is_verified, winner.mpesa_transaction_id = Contribution.Status.COMPLETED, True, 'QK12ABC'
+            winner.save()
+            return self.paid
+
+        with mock.patch('camp_meeting.views.query_stk_status', side_effect=settled_meanwhile):
+            with mock.patch.object(Contribution, 'save', autospec=True, side_effect=Contribution.save) as save:
+                response = self.query_status()
+        self.assertEqual(response.json()['status']['Status'], 'Completed')
+        self.assertEqual(save.call_count, 1)
+        completed = ContributionRollup.objects.get(status=Contribution.Status.COMPLETED)
+        self.assertEqual((completed.count, completed.total_amount), (1, Decimal('500')))
+
+    def test_view_serves_the_cached_pending_result(self):
+        Contribution.objects.create(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                    status=Contribution.Status.PENDING, checkout_request_id='ws_CO_1')
+        with mock.patch('camp_meeting.stk_results.query_stk_push', return_value=self.pending) as query:
+            for _ in range(3):
+                response = self.query_status()
+                self.assertEqual(response.json()['status']['Status'], 'Pending')
+        self.assertEqual(query.call_count, 1)
+
+
+class AsyncViewsTest(TestCase):
+    """The ASGI versions of the payment, status and stats endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.push_delay = 0
+        self.pushes = 0
+
+    async def daraja(self, request):
+        if '/oauth/' in request.url.path:
+            return httpx.Response(200, json={'access_token': 'token'})
+        if request.url.path.endswith('/processrequest'):
+            self.pushes += 1
+            await asyncio.sleep(self.push_delay)
+            return httpx.Response(200, json={'ResponseCode': '0', 'CheckoutRequestID': f'ws_CO_{self.pushes}'})
+        return httpx.Response(200, json={'ResultCode': '0', 'ResultDesc': 'Paid', 'MpesaReceiptNumber': 'QK12ABC'})
+
+    def use_daraja(self, handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        patcher = mock.patch('camp_meeting.mpesa_async.get_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def payment_request(self, phone='0712345678'):
+        return self.factory.post(reverse('camp_meeting:contribute'), json.dumps({
+            'phone_number': phone, 'email': 'grace@example.com', 'amount': 500, 'full_name': 'Grace Wanjiku',
+        }), content_type='application/json')
+
+    async def test_payment_sends_push_and_stores_checkout_id(self):
+        self.use_daraja(self.daraja)
+        response = await async_views.initiate_mpesa_payment(self.payment_request())
+        self.assertEqual(response.status_code, 200)
+        contribution = await Contribution.objects.aget()
+        self.assertEqual(contribution.checkout_request_id, json.loads(response.content)['checkout_request_id'])
+        self.assertEqual(contribution.phone_normalized, '254712345678')
+
+    @override_settings(RATE_LIMITS={})
+    async def test_payments_wait_on_daraja_concurrently(self):
+        self.use_daraja(self.daraja)
+        self.push_delay = 0.3
+        started = time.monotonic()
+        responses = await asyncio.gather(*[
+            async_views.initiate_mpesa_payment(self.payment_request(f'071234567{i}')) for i in range(5)
+        ])
+        # Five sequential pushes would take 1.5s
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        self.assertEqual(await Contribution.objects.exclude(checkout_request_id=None).acount(), 5)
+
+    async def test_unreachable_daraja_queues_the_push(self):
+        def refuse(request):
+            raise httpx.ConnectError("Connection refused", request=request)
+        self.use_daraja(refuse)
+        response = await async_views.initiate_mpesa_payment(self.payment_request())
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(await QueuedStkPush.objects.acount(), 1)
+
+    async def test_rate_limits_apply(self):
+        self.use_daraja(self.daraja)
+        with override_settings(RATE_LIMITS={'contribute': [('phone', 1, 60)]}):
+            await async_views.initiate_mpesa_payment(self.payment_request())
+            response = await async_views.initiate_mpesa_payment(self.payment_request())
+        self.assertEqual(response.status_code, 429)
+
+    async def test_status_query_completes_the_contribution(self):
+        self.use_daraja(self.daraja)
+        await Contribution.objects.acreate(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                           checkout_request_id='ws_CO_1')
+        request = self.factory.post(reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': 'ws_CO_1'}),
+                                    content_type='application/json')
+        response = await async_views.stk_status_view(request)
+        self.assertEqual(json.loads(response.content)['status']['Status'], 'Completed')
+        contribution = await Contribution.objects.aget()
+        self.assertTrue(contribution.is_verified)
+        self.assertEqual(contribution.mpesa_transaction_id, 'QK12ABC')
+        self.assertEqual(await cache.aget(result_key('ws_CO_1')), {
+            'ResultCode': '0', 'ResultDesc': 'Paid', 'MpesaReceiptNumber': 'QK12ABC',
+        })
+
+    async def test_stats_match_the_sync_view(self):
+        await Contribution.objects.acreate(full_name="Grace Wanjiku", phone_number="254712345678", amount=500,
+                                           status=Contribution.Status.COMPLETED, is_verified=True)
+        response = await async_views.get_contribution_stats(self.factory.get(reverse('camp_meeting:stats')))
+        sync_response = await sync_to_async(self.client.get)(reverse('camp_meeting:stats'))
+        self.assertEqual(json.loads(response.content)['total_contributions'],
+                         sync_response.json()['total_contributions'])
+
+    def test_asgi_middleware_chain_needs_no_threads(self):
+        from django.core.handlers.asgi import ASGIHandler
+        with self.assertNoLogs('django.request', level='DEBUG'):
+            ASGIHandler()
+
+
+class OfflineSupportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.contribute_url = reverse('camp_meeting:contribute')
+
+    def contribute(self, submission_id):
+        return self.client.post(self.contribute_url, json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com', 'phone_number': '0712345678', 'amount': 500,
+        }), content_type='application/json', HTTP_X_SUBMISSION_ID=submission_id)
+
+    def test_service_worker_served_from_root(self):
+        response = self.client.get('/sw.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertContains(response, f'"version": "{offline.shell_version()}"')
+        self.assertContains(response, '/static/css/styles.css')
+
+    def test_shell_version_follows_precached_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            asset = os.path.join(tmp, 'styles.css')
+            with open(asset, 'w') as f:
+                f.write('body {}')
+            with mock.patch('camp_meeting.offline.finders.find', return_value=asset):
+                offline.shell_version.cache_clear()
+                before = offline.shell_version()
+                with open(asset, 'w') as f:
+                    f.write('body { color: green; }')
+                offline.shell_version.cache_clear()
+                after = offline.shell_version()
+        offline.shell_version.cache_clear()
+        self.assertNotEqual(before, after)
+
+    def test_manifest_and_registration_on_landing(self):
+        manifest = self.client.get(reverse('camp_meeting:web_manifest'))
+        self.assertEqual(manifest['Content-Type'], 'application/manifest+json')
+        self.assertEqual(manifest.json()['start_url'], '/')
+        landing = self.client.get(reverse('camp_meeting:landing'))
+        self.assertContains(landing, 'rel="manifest"')
+        self.assertContains(landing, "navigator.serviceWorker.register('/sw.js')")
+
+    @mock.patch('camp_meeting.views.initiate_stk_push',
+                return_value={'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'})
+    def test_repeated_submission_gets_first_response(self, push):
+        first = self.contribute('a1b2c3')
+        again = self.contribute('a1b2c3')
+        self.assertEqual(push.call_count, 1)
+        self.assertEqual(Contribution.objects.count(), 1)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json(), first.json())
+
+        self.contribute('d4e5f6')
+        self.assertEqual(push.call_count, 2)
+
+    def test_submission_in_progress_is_not_pushed_again(self):
+        cache.set(f'{offline.SUBMISSION_KEY_PREFIX}:a1b2c3', offline.IN_PROGRESS)
+        with mock.patch('camp_meeting.views.initiate_stk_push') as push:
+            response = self.contribute('a1b2c3')
+        self.assertEqual(response.status_code, 409)
+        push.assert_not_called()
+
+    def test_server_errors_can_be_retried(self):
+        with mock.patch('camp_meeting.views.initiate_stk_push', side_effect=Exception("boom")):
+            self.assertEqual(self.contribute('a1b2c3').status_code, 500)
+        with mock.patch('camp_meeting.views.initiate_stk_push',
+                        return_value={'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'}):
+            self.assertEqual(self.contribute('a1b2c3').status_code, 200)
+
+    async def test_async_view_deduplicates_too(self):
+        factory = AsyncRequestFactory()
+        with mock.patch('camp_meeting.async_views.ainitiate_stk_push',
+                        return_value={'ResponseCode': '0', 'CheckoutRequestID': 'ws_CO_1'}) as push:
+            for _ in range(2):
+                response = await async_views.initiate_mpesa_payment(factory.post(self.contribute_url, json.dumps({
+                    'full_name': 'Grace Wanjiku', 'email': 'grace@example.com', 'phone_number': '0712345678',
+                    'amount': 500,
+                }), content_type='application/json', headers={'X-Submission-Id': 'a1b2c3'}))
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(push.call_count, 1)
+        self.assertEqual(await Contribution.objects.acount(), 1)
+
+
+class MultiAppDaraja(ThreadingHTTPServer):
+    """Local Daraja serving several apps, each only accepting its own token, shortcode and checkouts"""
+
+    def __init__(self, apps):
+        super().__init__(('127.0.0.1', 0), MultiAppDarajaHandler)
+        self.apps = apps
+        self.down = set()
+        self.tokens = {}
+        self.checkouts = {}
+        self.token_requests = {key: 0 for key in apps}
+        self.pushes = {key: 0 for key in apps}
+        self.url = f'http://127.0.0.1:{self.server_port}'
+
+
+class MultiAppDarajaHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        scheme, _, credentials = self.headers['Authorization'].partition(' ')
+        key, _, secret = base64.b64decode(credentials).decode().partition(':')
+        app = self.server.apps.get(key)
+        if scheme != 'Basic' or app is None or app['secret'] != secret:
+            return self.reply(400, {'errorMessage': 'Invalid credentials'})
+        self.server.token_requests[key] += 1
+        token = f'token-{key}-{self.server.token_requests[key]}'
+        self.server.tokens[token] = key
+        self.reply(200, {'access_token': token, 'expires_in': '3599'})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        key = self.server.tokens.get(self.headers['Authorization'].removeprefix('Bearer '))
+        if key is None:
+            return self.reply(401, {'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'})
+        if key in self.server.down:
+            return self.reply(503, {})
+        app = self.server.apps[key]
+        password = app['shortcode'] + app['passkey'] + payload['Timestamp']
+        if payload['BusinessShortCode'] != app['shortcode'] or base64.b64decode(payload['Password']).decode() != password:
+            return self.reply(400, {'errorMessage': 'Wrong credentials for shortcode'})
+
+        if self.path.endswith('/processrequest'):
+            self.server.pushes[key] += 1
+            checkout_id = f'ws_CO_{key}_{self.server.pushes[key]}'
+            self.server.checkouts[checkout_id] = key
+            return self.reply(200, {'ResponseCode': '0', 'CheckoutRequestID': checkout_id})
+        if self.server.checkouts.get(payload['CheckoutRequestID']) != key:
+            return self.reply(500, {'errorCode': '500.001.1001', 'errorMessage': 'No such checkout for this app'})
+        self.reply(200, {'ResultCode': '0', 'ResultDesc': 'Paid', 'MpesaReceiptNumber': 'QK12ABC'})
+
+
+class ShardedDarajaTest(TestCase):
+    """STK pushes spread over several Daraja apps"""
+
+    def setUp(self):
+        cache.clear()
+        self.daraja = MultiAppDaraja({
+            'alpha-key': {'secret': 'alpha-secret', 'shortcode': '600100', 'passkey': 'alpha-pass'},
+            'beta-key': {'secret': 'beta-secret', 'shortcode': '600200', 'passkey': 'beta-pass'},
+        })
+        threading.Thread(target=self.daraja.serve_forever, daemon=True).start()
+        self.addCleanup(self.daraja.server_close)
+        self.addCleanup(self.daraja.shutdown)
+
+        credentials = [
+            {'name': name, 'consumer_key': f'{name}-key', 'consumer_secret': f'{name}-secret',
+             'passkey': f'{name}-pass', 'shortcode': shortcode, 'base_url': self.daraja.url, 'max_in_flight': 2}
+            for name, shortcode in (('alpha', '600100'), ('beta', '600200'))
+        ]
+        overrides = self.settings(MPESA_CREDENTIALS=credentials, RATE_LIMITS={})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def contribute(self, phone='0712345678'):
+        return self.client.post(reverse('camp_meeting:contribute'), json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com', 'phone_number': phone, 'amount': 500,
+        }), content_type='application/json')
+
+    def check_status(self, contribution):
+        return self.client.post(reverse('camp_meeting:stk_status'),
+                                json.dumps({'checkout_request_id': contribution.checkout_request_id}),
+                                content_type='application/json')
+
+    def test_new_pushes_go_to_the_least_loaded_shard(self):
+        claimed = [claim_shard() for _ in range(4)]
+        self.assertEqual([shard.name for shard in claimed], ['alpha', 'beta', 'alpha', 'beta'])
+        # Both apps have their two calls in flight
+        with self.assertRaises(DarajaOverloaded):
+            claim_shard()
+        release_shard(claimed[1])
+        self.assertEqual(claim_shard().name, 'beta')
+
+    @override_settings(DARAJA_MAX_IN_FLIGHT=2)
+    def test_overall_cap_is_the_sum_of_the_shard_budgets(self):
+        with contextlib.ExitStack() as stack:
+            claimed = [stack.enter_context(shard_slot()) for _ in range(4)]
+            self.assertEqual([shard.name for shard in claimed], ['alpha', 'beta', 'alpha', 'beta'])
+            with self.assertRaises(DarajaOverloaded):
+                stack.enter_context(shard_slot())
+        self.assertEqual(cache.get(IN_FLIGHT_KEY), 0)
+
+    def test_status_query_uses_the_shard_that_sent_the_push(self):
+        self.assertEqual(self.contribute().status_code, 200)
+        with shard_slot(mpesa.get_shard('alpha')):
+            # alpha is busier now, so this push goes out with beta's credentials
+            self.assertEqual(self.contribute('0712345679').status_code, 200)
+
+        first, second = Contribution.objects.order_by('id')
+        self.assertEqual((first.shard, second.shard), ('alpha', 'beta'))
+        self.assertEqual(self.daraja.checkouts[second.checkout_request_id], 'beta-key')
+
+        response = self.check_status(second)
+        self.assertEqual(response.json()['status']['Status'], 'Completed')
+        second.refresh_from_db()
+        self.assertTrue(second.is_verified)
+        # Each app's token was fetched once and reused from the cache
+        self.assertEqual(self.daraja.token_requests, {'alpha-key': 1, 'beta-key': 1})
+
+    def test_pushes_move_to_healthy_shard_when_one_circuit_opens(self):
+        alpha = mpesa.get_shard('alpha')
+        breaker = mock.patch.multiple(alpha.breaker, failure_threshold=1, reset_timeout=60)
+        breaker.start()
+        self.addCleanup(breaker.stop)
+        self.daraja.down.add('alpha-key')
+
+        self.assertTrue(self.contribute().json()['queued'])
+        self.assertEqual(alpha.breaker.state, 'open')
+        self.assertEqual(self.contribute('0712345679').status_code, 200)
+
+        health = self.client.get(reverse('camp_meeting:daraja_health'))
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(health.json()['state'], 'degraded')
+        self.assertEqual([shard['state'] for shard in health.json()['shards']], ['open', 'closed'])
+
+        # The queued push is sent with beta and remembers it
+        self.assertEqual(retry_queued_pushes(), 1)
+        self.assertEqual(list(Contribution.objects.values_list('shard', flat=True).order_by('id')), ['beta', 'beta'])
+        self.assertEqual(self.daraja.pushes, {'alpha-key': 0, 'beta-key': 2})
+
+    def test_paybill_setting_does_not_change_the_pushed_shortcode(self):
+        CampMeetingSettings.objects.create(
+            target_amount=Decimal('1000.00'), paybill_number='999999', account_number='Camp2025',
+            event_start_date=timezone.now(), event_end_date=timezone.now() + timezone.timedelta(days=7),
+        )
+        # The stub rejects a shortcode or password that isn't the app's own
+        self.assertEqual(self.contribute().status_code, 200)
+        self.assertEqual(self.daraja.pushes, {'alpha-key': 1, 'beta-key': 0})
+
+        with self.settings(MPESA_CREDENTIALS=[]):
+            payload = mpesa.stk_push_payload('254712345678', 500, get_active_settings(), mpesa.get_shard())
+        self.assertEqual(payload['BusinessShortCode'], mpesa.MPESA_SHORTCODE)
+
+    def test_every_app_needs_its_own_shortcode(self):
+        credentials = [{'name': 'alpha', 'consumer_key': 'alpha-key', 'consumer_secret': 'alpha-secret',
+                        'passkey': 'alpha-pass'}]
+        with self.settings(MPESA_CREDENTIALS=credentials):
+            with self.assertRaisesMessage(ImproperlyConfigured, "'alpha' needs its own shortcode"):
+                mpesa.get_shards()
+
+    async def test_async_views_route_and_query_by_shard(self):
+        factory = AsyncRequestFactory()
+        response = await async_views.initiate_mpesa_payment(factory.post(reverse('camp_meeting:contribute'), json.dumps({
+            'full_name': 'Grace Wanjiku', 'email': 'grace@example.com', 'phone_number': '0712345678', 'amount': 500,
+        }), content_type='application/json'))
+        self.assertEqual(response.status_code, 200)
+        contribution = await Contribution.objects.aget()
+        self.assertEqual(contribution.shard, 'alpha')
+
+        response = await async_views.stk_status_view(factory.post(
+            reverse('camp_meeting:stk_status'), json.dumps({'checkout_request_id': contribution.checkout_request_id}),
+            content_type='application/json',
+        ))
+        self.assertEqual(json.loads(response.content)['status']['Status'], 'Completed')
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_settings_cache()
+
+    def contribution(self, phone, amount, full_name='Grace Wanjiku Kamau', **kwargs):
+        values = {'status': Contribution.Status.COMPLETED, 'is_verified': True}
+        values.update(kwargs)
+        return Contribution.objects.create(full_name=full_name, phone_number=phone, amount=amount, **values)
+
+    def totals(self):
+        return {row.phone_normalized: (row.display_name, row.count, row.total_amount) for row in ContributorTotal.objects.all()}
+
+    def show_leaderboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CampMeetingSettings.objects.create(
+                target_amount=Decimal('1000.00'), event_start_date=timezone.make_aware(datetime(2026, 8, 16)),
+                event_end_date=timezone.make_aware(datetime(2026, 8, 23)), show_leaderboard=True,
+            )
+
+    def test_public_name(self):
+        self.assertEqual(public_name('Grace Wanjiku Kamau'), 'Grace K.')
+        self.assertEqual(public_name('john otieno'), 'john O.')
+        self.assertEqual(public_name('Ruth'), 'Ruth')
+        self.assertEqual(public_name('  '), 'Anonymous')
+        self.assertEqual(public_name('Paybill Contributor'), 'Anonymous')
+
+    def test_verified_contributions_add_up_per_phone(self):
+        self.contribution('0712345678', 500)
+        self.contribution('+254712345678', 1500, full_name='Grace Kamau')
+        self.contribution('0798765432', 2000, full_name='John Otieno')
+        self.contribution('0712345678', 700, is_verified=False, status=Contribution.Status.PENDING)
+
+        self.assertEqual(self.totals(), {
+            '254712345678': ('Grace K.', 2, Decimal('2000.00')),
+            '254798765432': ('John O.', 1, Decimal('2000.00')),
+        })
+
+    def test_callback_verification_counts_once(self):
+        pending = self.contribution('0712345678', 500, is_verified=False, status=Contribution.Status.PENDING,
+                                    checkout_request_id='ws_CO_1')
+        self.assertFalse(ContributorTotal.objects.exists())
+        payload = json.dumps({'Body': {'stkCallback': {
+            'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0, 'ResultDesc': 'OK',
+            'CallbackMetadata': {'Item': [
+                {'Name': 'Amount', 'value': 500},
+                {'Name': 'MpesaReceiptNumber', 'value': 'QK12ABC'},
+                {'Name': 'PhoneNumber', 'value': 254712345678},
+            ]},
+        }}})
+        for _ in range(2):
+            self.client.post(reverse('camp_meeting:mpesa_callback'), payload, content_type='application/json')
+        self.assertEqual(self.totals(), {'254712345678': ('Grace K.', 1, Decimal('500.00'))})
+
+        # Un-verifying and deleting take it back off the board
+        pending.refresh_from_db()
+        pending.is_verified = False
+        pending.save()
+        self.assertFalse(ContributorTotal.objects.exists())
+        other = self.contribution('0712345678', 300)
+        self.contribution('0712345678', 200)
+        other.delete()
+        self.assertEqual(self.totals(), {'254712345678': ('Grace K.', 1, Decimal('200.00'))})
+
+    def test_stale_copies_count_once(self):
+        pending = self.contribution('0712345678', 500, is_verified=False, status=Contribution.Status.PENDING)
+        copies = [Contribution.objects.get(pk=pending.pk) for _ in range(2)]
+        for stale_copy in copies:
+            stale_copy.status = Contribution.Status.COMPLETED
+            stale_copy.is_verified = True
+            stale_copy.save()
+        self.assertEqual(self.totals(), {'254712345678': ('Grace K.', 1, Decimal('500.00'))})
+        for stale_copy in copies:
+            stale_copy.delete()
+        self.assertFalse(ContributorTotal.objects.exists())
+
+    @override_settings(C2B_PROCESS_INTERVAL=0)
+    def test_paybill_and_statement_bulk_paths(self):
+        daraja = DarajaC2BStub(self.client)
+        self.contribution('0712345678', 100)
+        self.contribution('0712345678', 500, is_verified=False, status=Contribution.Status.PENDING)
+        daraja.confirm(amount=500, msisdn='0712345678')
+        daraja.confirm(amount=1000, msisdn='2547*****678', bill_ref='0798765432')
+        process_pending_payments()
+        import_statement(StringIO(STATEMENT_CSV), Checkpoint(None, 'statement.csv'), batch_size=2)
+
+        self.assertEqual(self.totals(), {
+            '254712345678': ('Grace K.', 3, Decimal('1600.00')),
+            '254798765432': ('Grace W.', 2, Decimal('1500.00')),
+        })
+        before = self.totals()
+        self.assertEqual(rebuild_leaderboard(), 2)
+        self.assertEqual(self.totals(), before)
+
+    def test_endpoint_is_off_by_default(self):
+        self.contribution('0712345678', 500)
+        self.assertEqual(self.client.get(reverse('camp_meeting:leaderboard')).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('camp_meeting:landing')), 'Top Givers')
+
+    def test_endpoint_serves_cached_board(self):
+        self.show_leaderboard()
+        for i in range(5):
+            self.contribution(f'07123456{i:02d}', 100 * (i + 1), full_name=f'Giver Number{i}')
+
+        response = self.client.get(reverse('camp_meeting:leaderboard'), {'limit': 3})
+        self.assertEqual(response.json()['contributors'], [
+            {'rank': 1, 'name': 'Giver N.', 'contributions': 1, 'total': 500.0},
+            {'rank': 2, 'name': 'Giver N.', 'contributions': 1, 'total': 400.0},
+            {'rank': 3, 'name': 'Giver N.', 'contributions': 1, 'total': 300.0},
+        ])
+        self.assertNotIn('phone', response.content.decode())
+        with self.assertNumQueries(0):
+            self.client.get(reverse('camp_meeting:leaderboard'), {'limit': 3})
+        self.assertEqual(len(self.client.get(reverse('camp_meeting:leaderboard'), {'limit': 'x'}).json()['contributors']), 5)
+        self.assertContains(self.client.get(reverse('camp_meeting:landing')), 'Top Givers')
+
+    def test_board_reads_the_index(self):
+        ContributorTotal.objects.bulk_create([
+            ContributorTotal(phone_normalized=f'2547{i:08d}', display_name='Giver', count=1, total_amount=i)
+            for i in range(2000)
+        ])
+        plan = ContributorTotal.objects.order_by('-total_amount')[:10].explain()
+        self.assertIn('contributor_total_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertEqual([row['total'] for row in top_contributors(3)], [1999.0, 1998.0, 1997.0])
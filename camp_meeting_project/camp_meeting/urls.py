@@ -1,16 +1,33 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    # Under ASGI the payment, status and stats endpoints don't hold a thread while they wait
+    from . import async_views as io_views
+else:
+    io_views = views
+
 app_name = 'camp_meeting'
 
 urlpatterns = [
     path('', views.camp_meeting_landing, name='landing'),
-    path('contribute/', views.initiate_mpesa_payment, name='contribute'),
-    path('api/stats/', views.get_contribution_stats, name='stats'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', views.web_manifest, name='web_manifest'),
+    path('contribute/', io_views.initiate_mpesa_payment, name='contribute'),
+    path('api/stats/', io_views.get_contribution_stats, name='stats'),
+    path('api/stats/trends/', views.contribution_trends, name='trends'),
+    path('api/leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/my-contributions/', views.my_contributions, name='my_contributions'),
+    path('api/health/daraja/', views.daraja_health, name='daraja_health'),
     path('callback/', views.mpesa_callback, name='mpesa_callback'),
-    path('stk_status/', views.stk_status_view, name='stk_status'),
+    path('c2b/validation/', views.c2b_validation, name='c2b_validation'),
+    path('c2b/confirmation/', views.c2b_confirmation, name='c2b_confirmation'),
+    path('stk_status/', io_views.stk_status_view, name='stk_status'),
     path('stk-status/', views.stk_status, name='stk-status'),
     path('finance-report/', views.finance_report, name='finance_report'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
+    path('profiles/<uuid:profile_id>/', views.profile_summary, name='profile_summary'),
+    path('profiles/<uuid:profile_id>/download/', views.profile_download, name='profile_download'),
 ]
\ No newline at end of file
@@ -0,0 +1,39 @@
+def normalize_phone_number(value):
+    """Bring a (possibly partial) Kenyan phone number into 2547XXXXXXXX form.
+
+    Non-digits are dropped and local prefixes ('07...', '7...') are
+    rewritten to the 254 country code, so the result can be used as an
+    index prefix for searching.
+    """
+    digits = ''.join(filter(str.isdigit, str(value or '')))
+    if digits.startswith('0'):
+        return '254' + digits[1:]
+    if digits and digits[0] in '17' and len(digits) <= 9:
+        return '254' + digits
+    return digits
+
+
+def prefix_range(field, prefix):
+    """Filter kwargs matching values starting with prefix using plain range comparisons.
+
+    Unlike LIKE/istartswith this can always be answered from a b-tree
+    index on the column.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return {f'{field}__gte': prefix, f'{field}__lt': upper}
+
+
+def is_valid_phone_number(phone):
+    """True for a normalized Kenyan mobile number (2547XXXXXXXX or 2541XXXXXXXX)"""
+    return len(phone) == 12 and phone.startswith(('2547', '2541'))
+
+
+def lookup_phone_number(value):
+    """Value for Contribution.phone_normalized.
+
+    Newer statements mask the middle digits ('2547****678'); those can't
+    be matched to a donor so they get an empty key.
+    """
+    if '*' in str(value or ''):
+        return ''
+    return normalize_phone_number(value)
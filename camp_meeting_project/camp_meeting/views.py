@@ -1,38 +1,51 @@
-from django.db.models import Sum
+from django.db.models import Count, Exists, F, OuterRef, Sum, Window
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from datetime import datetime
-import json, requests, os, base64, re
+import json
+import logging
 from .models import Contribution
 from .forms import ContributionForm
-from dotenv import load_dotenv
+from .settings_cache import get_active_settings
+from .rollups import get_trends
+from .leaderboard import MAX_SIZE as LEADERBOARD_MAX_SIZE, top_contributors
+from . import c2b
+from .ratelimit import DarajaOverloaded, rate_limited, too_many_requests
+from .shards import shard_health, shard_slot
+from .breaker import CircuitOpen
+from .mpesa import DarajaUnavailable, initiate_stk_push
+from .stk_results import StkResultUnavailable, query_stk_status
+from .stk_queue import queue_stk_push
+from .models import QueuedStkPush
+from .utils import is_valid_phone_number, normalize_phone_number
+from .exports import html_to_pdf
+from .db_router import replica_reads
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.core.mail import send_mail
 from django.views.decorators.http import require_http_methods
 from django.template.loader import render_to_string
-from weasyprint import HTML
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from .profiling import profile_paths
+from .offline import CDN_ASSETS, PRECACHE_STATIC, once_per_submission, shell_version
 from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
 
-# loading environment variables
-load_dotenv()
-
-# retrieving M-Pesa variables from Django settings
-CONSUMER_KEY = settings.CONSUMER_KEY
-CONSUMER_SECRET = settings.CONSUMER_SECRET
-MPESA_PASSKEY = settings.MPESA_PASSKEY
-MPESA_BASE_URL = settings.MPESA_BASE_URL
-MPESA_SHORTCODE = settings.MPESA_SHORTCODE
-CALLBACK_URL = settings.CALLBACK_URL
+logger = logging.getLogger(__name__)
 
+@replica_reads
 def camp_meeting_landing(request):
     """Main landing page view for Camp Meeting 2025"""
+    camp_settings = get_active_settings()
+
     # Event details
-    event_date = timezone.make_aware(datetime(2025, 8, 17))
-    event_end_date = timezone.make_aware(datetime(2025, 8, 24))
+    event_date = camp_settings.event_start_date
+    event_end_date = camp_settings.event_end_date
     current_date = timezone.now()
 
     # Calculate days left
@@ -40,8 +53,8 @@ def camp_meeting_landing(request):
 
     # Contribution statistics
     total_contributions = Contribution.objects.aggregate(total=Sum('amount'))['total'] or 0
-    target_amount = 2300000
-    percentage_raised = (total_contributions / target_amount) * 100
+    target_amount = camp_settings.target_amount
+    percentage_raised = (total_contributions / target_amount) * 100 if target_amount else 0
 
     # Latest contributions
     latest_contributions = Contribution.objects.filter(is_verified=True).order_by('-created_at')[:3]
@@ -57,118 +70,144 @@ def camp_meeting_landing(request):
         'latest_contributions': latest_contributions,
         'latest_contribution': latest_contribution,
         'contribution_form': ContributionForm(),
+        'camp_settings': camp_settings,
+        'leaderboard': top_contributors() if camp_settings.show_leaderboard else None,
     }
 
     return render(request, 'camp_meeting/landing.html', context)
 
-def generate_access_token():
-    url = f"{MPESA_BASE_URL}/oauth/v1/generate?grant_type=client_credentials"
-
-    try:
-        # encodeing credentials
-        encoded_credentials = base64.b64encode(f"{CONSUMER_KEY}:{CONSUMER_SECRET}".encode()).decode()
-
-        headers = {'Authorization': f"Basic {encoded_credentials}", 'Content-Type': 'application/json'}
-
-        # sending requests
-        response = requests.get(url, headers=headers).json()
-
-        # checking if there are errors
-        if "access_token" in response:
-            return response['access_token']
-        else:
-            raise Exception("Access token not found in response")
-    except Exception as e:
-        raise Exception(f"Error generating access token: {str(e)}")
-    
-def initiate_stk_push(phone_number, amount, contribution_id):
-    try:
-        token = generate_access_token()
-        url = f"{MPESA_BASE_URL}/mpesa/stkpush/v1/processrequest"
-        headers = {
-            'Authorization': f"Bearer {token}",
-            'Content-Type': 'application/json'
-        }
-
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        stk_password = base64.b64encode((MPESA_SHORTCODE + MPESA_PASSKEY + timestamp).encode()).decode()
-
-        payload = {
-            "BusinessShortCode": "174379",
-            "Password": stk_password,
-            "Timestamp":timestamp,
-            "TransactionType": "CustomerPayBillOnline",
-            "Amount": amount,
-            "PartyA":phone_number,
-            "PartyB":"174379",
-            "PhoneNumber":phone_number,
-            "CallBackURL": CALLBACK_URL,
-            "AccountReference":"EdenSprings",
-            "TransactionDesc":"Camp2025"
-        }
-
-        # sending the requests
-        response = requests.post(url, headers=headers, json=payload).json()
-
-        return response
-    
-    except Exception as e:
-        raise Exception(f"Error sending STK push: {str(e)}")
+def service_worker(request):
+    """Service worker for the landing page, served from the root so it can control it"""
+    config = {
+        'version': shell_version(),
+        'landingUrl': reverse('camp_meeting:landing'),
+        'statsUrl': reverse('camp_meeting:stats'),
+        'contributeUrl': reverse('camp_meeting:contribute'),
+        'staticUrl': settings.STATIC_URL,
+        'precache': [static(path) for path in PRECACHE_STATIC],
+        'cdnAssets': CDN_ASSETS,
+        'queueMaxAge': settings.OFFLINE_QUEUE_MAX_AGE,
+    }
+    response = render(request, 'camp_meeting/sw.js', {'config': json.dumps(config)},
+                      content_type='application/javascript')
+    # Browsers check for a new worker on every visit, make sure they get it
+    response['Cache-Control'] = 'no-cache'
+    return response
 
+def web_manifest(request):
+    return JsonResponse({
+        'name': 'Camp Meeting 2025 - Eden Springs SDA Church',
+        'short_name': 'Camp Meeting',
+        'start_url': reverse('camp_meeting:landing'),
+        'scope': reverse('camp_meeting:landing'),
+        'display': 'standalone',
+        'background_color': '#ffffff',
+        'theme_color': '#14532d',
+        'icons': [{
+            'src': static('camp_meeting/adventist-symbol--campfire.svg'),
+            'sizes': 'any',
+            'type': 'image/svg+xml',
+        }],
+    }, content_type='application/manifest+json')
+
+def validate_payment(data):
+    """Contribution fields from a payment request, or a 400 response when they don't validate"""
+    phone_number = data.get('phone_number')
+    email = data.get('email')
+    amount = data.get('amount')
+    full_name = data.get('full_name')
+
+    # Validate input
+    if not all([phone_number, email, amount, full_name]):
+        return None, JsonResponse({'success': False, 'message': 'All fields are required'}, status=400)
+
+    phone_number = normalize_phone_number(phone_number)
+    if not is_valid_phone_number(phone_number):
+        return None, JsonResponse({'success': False, 'message': 'Please enter a valid Kenyan phone number'}, status=400)
+
+    return {
+        'full_name': full_name,
+        'phone_number': phone_number,
+        'email': email,
+        'amount': amount,
+        'status': Contribution.Status.PENDING,
+        'is_verified': False,
+    }, None
+
+def no_response_from_daraja():
+    return JsonResponse({'success': False, 'message': 'M-Pesa did not respond. Please try again.'}, status=503)
+
+def push_queued(contribution):
+    return JsonResponse({
+        'success': True,
+        'queued': True,
+        'message': 'M-Pesa is busy. The payment request will be sent to your phone shortly',
+        'contribution_id': contribution.id,
+    }, status=202)
+
+def apply_push_response(contribution, response):
+    """Record Daraja's answer to an STK push on the (unsaved) contribution"""
+    if response.get('ResponseCode') == '0':
+        checkout_request_id = response.get('CheckoutRequestID')
+        contribution.checkout_request_id = checkout_request_id
+        return JsonResponse({
+            'success': True,
+            'message': 'Payment request sent to your phone',
+            'contribution_id': contribution.id,
+            'checkout_request_id': checkout_request_id
+        })
+    contribution.status = Contribution.Status.FAILED
+    return JsonResponse({'success': False, 'message': 'Failed to initiate payment'}, status=400)
+
+# Contributions started from this browser, the proof my_contributions asks for
+SESSION_CONTRIBUTIONS_KEY = 'my_contribution_ids'
+SESSION_CONTRIBUTIONS_MAX = 20
+
+def remember_contribution(request, contribution):
+    """Note in the session that this browser started the contribution"""
+    session = getattr(request, 'session', None)
+    if session is None:
+        return
+    ids = session.get(SESSION_CONTRIBUTIONS_KEY, [])
+    session[SESSION_CONTRIBUTIONS_KEY] = (ids + [contribution.pk])[-SESSION_CONTRIBUTIONS_MAX:]
+
+@rate_limited('contribute')
+@once_per_submission
 def initiate_mpesa_payment(request):
     """Handle M-Pesa STK Push initiation and create a pending contribution record"""
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Invalid request method'}, status=405)
 
     try:
-        data = json.loads(request.body)
-        phone_number = data.get('phone_number')
-        email = data.get('email')
-        amount = data.get('amount')
-        full_name = data.get('full_name')
-
-        # Validate input
-        if not all([phone_number, email, amount, full_name]):
-            return JsonResponse({'success': False, 'message': 'All fields are required'}, status=400)
-
-        # Format phone number
-        if phone_number.startswith('0'):
-            phone_number = '254' + phone_number[1:]
-        elif phone_number.startswith('+254'):
-            phone_number = phone_number[1:]
-        elif not phone_number.startswith('254'):
-            phone_number = '254' + phone_number
-
-        # Create a pending contribution
-        contribution = Contribution.objects.create(
-            full_name=full_name,
-            phone_number=phone_number,
-            email=email,
-            amount=amount,
-            status='pending',
-            is_verified=False, 
-        )
-
-        # Initiate M-Pesa STK Push
-        response = initiate_stk_push(phone_number, amount, contribution.id)
-        print(response)
-
-        if response.get('ResponseCode') == '0':
-            checkout_request_id = response.get('CheckoutRequestID')
-            contribution.checkout_request_id = checkout_request_id
+        fields, error = validate_payment(json.loads(request.body))
+        if error:
+            return error
+
+        # The least loaded healthy Daraja app sends this push
+        with shard_slot() as shard:
+            # Create a pending contribution
+            contribution = Contribution.objects.create(shard=shard.name, **fields)
+            remember_contribution(request, contribution)
+
+            # Initiate M-Pesa STK Push
+            try:
+                response = initiate_stk_push(fields['phone_number'], fields['amount'], contribution.id, shard=shard)
+            except (CircuitOpen, DarajaUnavailable) as e:
+                if getattr(e, 'request_sent', False):
+                    contribution.status = Contribution.Status.FAILED
+                    contribution.save()
+                    return no_response_from_daraja()
+                # Daraja never saw the request, send it once it is back
+                queue_stk_push(contribution, e)
+                return push_queued(contribution)
+            logger.debug("STK push response for contribution %s: %s", contribution.pk, response)
+
+            result = apply_push_response(contribution, response)
             contribution.save()
+            return result
 
-            return JsonResponse({
-                'success': True,
-                'message': 'Payment request sent to your phone',
-                'contribution_id': contribution.id,
-                'checkout_request_id': checkout_request_id
-            })
-        else:
-            contribution.status = 'failed'
-            contribution.save()
-            return JsonResponse({'success': False, 'message': 'Failed to initiate payment'}, status=400)
-
+    except DarajaOverloaded:
+        return too_many_requests(1)
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
@@ -194,67 +233,197 @@ def mpesa_callback(request):
         if not contribution:
             return JsonResponse({'success': False, 'message': 'Original contribution not found'}, status=404)
 
-        # Idempotency: Don't process if already completed
-        if contribution.is_verified:
+        # Idempotency: a redelivered callback, or a receipt C2B or a statement recorded first
+        if contribution.status == Contribution.Status.DUPLICATE or contribution.is_verified and (
+            result_code != 0 or Contribution.objects.filter(mpesa_transaction_id=mpesa_code).exists()
+        ):
             return JsonResponse({'success': True, 'message': 'Already processed'}, status=200)
 
+        if contribution.is_verified:
+            # Another payment completed this attempt first, this receipt is money of its own
+            try:
+                Contribution.objects.create(
+                    full_name=contribution.full_name,
+                    email=contribution.email,
+                    phone_number=normalize_phone_number(phone) if phone else contribution.phone_number,
+                    amount=amount,
+                    status=Contribution.Status.COMPLETED,
+                    is_verified=True,
+                    mpesa_transaction_id=mpesa_code,
+                    shard=contribution.shard,
+                )
+            except IntegrityError:
+                # Recorded by C2B or a statement since the check above
+                return JsonResponse({'success': True, 'message': 'Already processed'}, status=200)
+            return JsonResponse({'success': True, 'message': 'Payment verified'}, status=200)
+
         if result_code != 0:
             error_message = stk_callback['ResultDesc']
             if str(result_code) == '1032':
-                contribution.status = 'Cancelled'
+                contribution.status = Contribution.Status.CANCELLED
             else:
-                contribution.status = 'Failed'
+                contribution.status = Contribution.Status.FAILED
             contribution.save()
             return JsonResponse({'success': False, 'message': f'Payment failed: {error_message}'}, status=400)
 
         # Update contribution
-        contribution.status = 'Completed'
+        contribution.status = Contribution.Status.COMPLETED
         contribution.is_verified = True
         contribution.mpesa_transaction_id = mpesa_code
         contribution.amount = amount
-        contribution.phone_number = phone
-        contribution.save()
+        if phone:
+            # Daraja sends the number as an integer
+            contribution.phone_number = normalize_phone_number(phone)
+        if not save_paid(contribution):
+            return JsonResponse({'success': True, 'message': 'Already processed'}, status=200)
 
         # Optionally: Send confirmation email here
 
         return JsonResponse({'success': True, 'message': 'Payment verified'}, status=200)
 
     except Exception as e:
-        # Log the error for debugging
-        import logging
-        logging.exception("Error in mpesa_callback")
+        logger.exception("Error in mpesa_callback")
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
-def query_stk_push(checkout_request_id):
+@csrf_exempt
+@require_http_methods(["POST"])
+def c2b_validation(request):
+    """Daraja C2B validation: accept or reject a direct paybill payment before it completes"""
     try:
-        url = f"{MPESA_BASE_URL}/mpesa/stkpushquery/v1/query"
-        access_token = generate_access_token()
+        payload = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'ResultCode': 'C2B00016', 'ResultDesc': 'Rejected: invalid request'})
 
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
+    result_code, result_desc = c2b.validate_payment(payload)
+    return JsonResponse({'ResultCode': result_code, 'ResultDesc': result_desc})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def c2b_confirmation(request):
+    """Daraja C2B confirmation: store the payment and acknowledge straight away"""
+    try:
+        payload = json.loads(request.body)
+        c2b.record_confirmation(payload)
+    except (json.JSONDecodeError, KeyError):
+        return JsonResponse({'ResultCode': 1, 'ResultDesc': 'Invalid confirmation payload'}, status=400)
+
+    # Match stored payments in batches, at most once per interval across all requests
+    interval = settings.C2B_PROCESS_INTERVAL
+    if interval and cache.add('camp_meeting:c2b_drain', True, interval):
+        try:
+            c2b.process_pending_payments(max_batches=1)
+        except Exception:
+            logger.exception("Error processing C2B payments")
+
+    return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
+
+def local_stk_status(contribution):
+    """STK status built from the contribution row, in the same shape as a Daraja query"""
+    if contribution.is_verified or contribution.status == Contribution.Status.DUPLICATE:
+        result_code, result_desc = 0, 'Payment successful'
+    elif contribution.status == Contribution.Status.CANCELLED:
+        result_code, result_desc = 1032, 'Request cancelled by user'
+    elif contribution.status == Contribution.Status.FAILED:
+        result_code, result_desc = 1, 'Payment failed'
+    else:
+        result_code, result_desc = -1, 'Pending: Awaiting user interaction'
+    return {
+        'ResultCode': result_code,
+        'ResultDesc': result_desc,
+        'Status': contribution.get_status_display(),
+        'MpesaReceiptNumber': contribution.mpesa_transaction_id,
+    }
 
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        stk_password = base64.b64encode((MPESA_SHORTCODE + MPESA_PASSKEY + timestamp).encode()).decode()
+def apply_stk_status(contribution, status):
+    """Apply a Daraja STK query answer to the (unsaved) contribution.
 
-        request_body = {
-        "BusinessShortCode": "174379",
-        "Password": stk_password,
-        "Timestamp": timestamp,
-        "CheckoutRequestID": checkout_request_id
-        }
+    Returns the response and whether the contribution changed.
+    """
+    # Handle pending status (user hasn't interacted yet)
+    if status.get("errorCode") == "500.001.1001":
+        return JsonResponse({
+            'success': True,
+            'status': {
+                'ResultCode': -1,
+                'ResultDesc': 'Pending: Awaiting user interaction',
+                'Status': 'Pending'
+            }
+        }), False
+
+    # Only handle if ResultCode exists (user has responded)
+    if "ResultCode" in status:
+        result_code = int(status.get("ResultCode", -1))
+        result_desc = status.get("ResultDesc", "Unknown result")
+
+        # Extract MpesaReceiptNumber if present
+        mpesa_code = status.get("MpesaReceiptNumber")
+
+        if result_code == 0:
+            contribution.status = Contribution.Status.COMPLETED
+            contribution.is_verified = True
+            if mpesa_code:
+                contribution.mpesa_transaction_id = mpesa_code
+        elif result_code == 1032:
+            contribution.status = Contribution.Status.CANCELLED
+        else:
+            contribution.status = Contribution.Status.FAILED
 
-        response = requests.post(url, json=request_body, headers=headers)
-        print("Query Response:", response.json())
-        return response.json()
-    
-    except requests.RequestException as e:
-        print(f"Error quering STK Push status: {str(e)}")
-        return {"error": str(e)}
+        return JsonResponse({
+            'success': True,
+            'status': {
+                'ResultCode': result_code,
+                'ResultDesc': result_desc,
+                'Status': contribution.get_status_display(),
+                'MpesaReceiptNumber': mpesa_code
+            }
+        }), True
+
+    # 3. Handle unexpected response structure
+    return JsonResponse({
+        'success': False,
+        'message': 'Unknown response structure from Safaricom',
+        'raw_response': status
+    }, status=500), False
+
+def save_paid(contribution, **kwargs):
+    """Save a contribution, closing it as a duplicate when its receipt is already recorded.
+
+    A statement import or C2B may have stored the same payment as a row of
+    its own first.  That row already counts, so this attempt is marked
+    DUPLICATE and left unverified instead of failing on the unique receipt
+    index.  Returns False in that case.
+    """
+    try:
+        with transaction.atomic():
+            contribution.save(**kwargs)
+        return True
+    except IntegrityError:
+        if not contribution.mpesa_transaction_id:
+            raise
+    contribution.status = Contribution.Status.DUPLICATE
+    contribution.is_verified = False
+    contribution.mpesa_transaction_id = None
+    contribution.save(**kwargs)
+    return False
+
+def save_if_pending(contribution):
+    """Save a status applied by apply_stk_status, unless the row has been settled meanwhile.
+
+    Polls that waited on another worker's Daraja query all get the same
+    answer for a contribution they loaded before anyone saved it, only the
+    first to get here writes it.  Returns whether it was saved.
+    """
+    with transaction.atomic():
+        still_pending = Contribution.objects.select_for_update().filter(
+            pk=contribution.pk, status=Contribution.Status.PENDING, is_verified=False,
+        ).exists()
+        if still_pending:
+            save_paid(contribution, update_fields=['status', 'is_verified', 'mpesa_transaction_id', 'updated_at'])
+    return still_pending
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limited('stk_query')
 def stk_status_view(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Only POST allowed'}, status=405)
@@ -262,7 +431,6 @@ def stk_status_view(request):
     try:
         data = json.loads(request.body)
         checkout_request_id = data.get('checkout_request_id')
-        print("Received Checkout Request ID:", checkout_request_id)
         if not checkout_request_id:
             return JsonResponse({'success': False, 'message': 'Missing CheckoutRequestID'}, status=400)
 
@@ -270,67 +438,34 @@ def stk_status_view(request):
         if not contribution:
             return JsonResponse({'success': False, 'message': 'Contribution not found'}, status=404)
 
-        # quering stk push status
-        status = query_stk_push(checkout_request_id)
-        print(f"STK Push Status: {status}")
-
-        # Handle pending status (user hasn't interacted yet)
-        if status.get("errorCode") == "500.001.1001":
-            return JsonResponse({
-                'success': True,
-                'status': {
-                    'ResultCode': -1,
-                    'ResultDesc': 'Pending: Awaiting user interaction',
-                    'Status': 'Pending'
-                }
-            })
-
-        # Only handle if ResultCode exists (user has responded)
-        if "ResultCode" in status:
-            result_code = int(status.get("ResultCode", -1))
-            result_desc = status.get("ResultDesc", "Unknown result")
-
-            # Extract MpesaReceiptNumber if present
-            mpesa_code = status.get("MpesaReceiptNumber")
-
-            if result_code == 0:
-                contribution.status = "Completed"
-                contribution.is_verified = True
-                if mpesa_code:
-                    contribution.mpesa_transaction_id = mpesa_code
-            elif result_code == 1032:
-                contribution.status = "Cancelled"
-            else:
-                contribution.status = "Failed"
+        # Once the callback or an earlier query has settled it, the answer can't change
+        if contribution.is_verified or contribution.status != Contribution.Status.PENDING:
+            return JsonResponse({'success': True, 'status': local_stk_status(contribution)})
 
-            contribution.save()
+        # quering stk push status, shared with other tabs and workers through the cache
+        try:
+            status = query_stk_status(checkout_request_id, contribution.shard)
+        except (CircuitOpen, DarajaUnavailable, StkResultUnavailable):
+            # Daraja is down, the local state is all we have until it is back
+            return JsonResponse({'success': True, 'degraded': True, 'status': local_stk_status(contribution)})
+        logger.debug("STK status for %s: %s", checkout_request_id, status)
 
-            return JsonResponse({
-                'success': True,
-                'status': {
-                    'ResultCode': result_code,
-                    'ResultDesc': result_desc,
-                    'Status': contribution.status,
-                    'MpesaReceiptNumber': mpesa_code
-                }
-            })
-
-        # 3. Handle unexpected response structure
-        return JsonResponse({
-            'success': False,
-            'message': 'Unknown response structure from Safaricom',
-            'raw_response': status
-        }, status=500)
+        result, changed = apply_stk_status(contribution, status)
+        if changed:
+            save_if_pending(contribution)
+        return result
 
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'message': 'Invalid JSON data'}, status=400)
+    except DarajaOverloaded:
+        return too_many_requests(1)
     except Exception as e:
-        import logging
-        logging.exception("Error in stk_status_view")
+        logger.exception("Error in stk_status_view")
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
     
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limited('stk_status')
 def stk_status(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'message': 'Only POST allowed'}, status=405)
@@ -346,24 +481,28 @@ def stk_status(request):
             'status': {
                 'ResultCode': 0 if contribution.is_verified else 1,
                 'ResultDesc': 'Payment successful' if contribution.is_verified else (
-                    'Payment failed' if contribution.status == 'Failed' else 'Pending or cancelled'
+                    'Payment failed' if contribution.status == Contribution.Status.FAILED else 'Pending or cancelled'
                 )
             }
         })
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
+@replica_reads
 def get_contribution_stats(request):
     """API endpoint to get real-time contribution statistics"""
     total_contributions = Contribution.objects.filter(
         is_verified=True
     ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    target_amount = 2300000
-    percentage_raised = (total_contributions / target_amount) * 100
+    return JsonResponse(contribution_stats(total_contributions, get_active_settings()))
+
+def contribution_stats(total_contributions, camp_settings):
+    """Stats payload shared by the sync and async stats endpoints"""
+    target_amount = camp_settings.target_amount
+    percentage_raised = (total_contributions / target_amount) * 100 if target_amount else 0
     
     # Event countdown
-    event_date = timezone.make_aware(datetime(2025, 8, 17))
+    event_date = camp_settings.event_start_date
     current_date = timezone.now()
     time_left = event_date - current_date
     
@@ -372,9 +511,9 @@ def get_contribution_stats(request):
     minutes = (time_left.seconds % 3600) // 60
     seconds = time_left.seconds % 60
     
-    return JsonResponse({
+    return {
         'total_contributions': total_contributions,
-        'target_amount': target_amount,
+        'target_amount': float(target_amount),
         'percentage_raised': min(100, percentage_raised),
         'countdown': {
             'days': max(0, days),
@@ -382,13 +521,96 @@ def get_contribution_stats(request):
             'minutes': max(0, minutes),
             'seconds': max(0, seconds)
         }
+    }
+
+@replica_reads
+def leaderboard(request):
+    """Top contributors by total given, when the leaderboard is switched on"""
+    if not get_active_settings().show_leaderboard:
+        raise Http404("The leaderboard is off")
+    try:
+        limit = min(max(int(request.GET['limit']), 1), LEADERBOARD_MAX_SIZE)
+    except (KeyError, ValueError):
+        limit = None
+    return JsonResponse({'contributors': top_contributors(limit)})
+
+@require_http_methods(["POST"])
+@rate_limited('my_contributions')
+def my_contributions(request):
+    """A donor's verified contributions and their total, looked up by phone number.
+
+    Only answers for a number this browser has paid from: one of the
+    session's own contributions to it has to be verified, which took the
+    M-Pesa PIN.  Anyone else gets a 403, so the endpoint can't be used to
+    look up what other members gave.
+
+    That is deliberately narrow.  The proof lives in the session, which
+    ends after SESSION_COOKIE_AGE (10 minutes) idle or when the browser
+    closes, so this is a "what have I given" right after paying, not an
+    account.  History on another device or the next day would need a
+    real check that the caller holds the phone, such as a one-time code
+    by SMS, which we don't send.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+    phone_number = normalize_phone_number(data.get('phone_number'))
+    if not is_valid_phone_number(phone_number):
+        return JsonResponse({'success': False, 'message': 'Please enter a valid Kenyan phone number'}, status=400)
+
+    owned = Contribution.objects.filter(
+        pk__in=request.session.get(SESSION_CONTRIBUTIONS_KEY, []),
+        phone_normalized=OuterRef('phone_normalized'), is_verified=True,
+    )
+    # One query on contribution_phone_idx; the window sums run over all of
+    # the donor's rows before the LIMIT, so the totals stay complete
+    rows = list(
+        Contribution.objects.filter(Exists(owned), phone_normalized=phone_number, is_verified=True)
+        .annotate(
+            total=Window(Sum('amount'), partition_by=[F('phone_normalized')]),
+            contribution_count=Window(Count('id'), partition_by=[F('phone_normalized')]),
+        )
+        .order_by('-created_at')
+        .values('amount', 'created_at', 'total', 'contribution_count')[:50]
+    )
+    if not rows:
+        # No verified contribution of this session's is on that number
+        return JsonResponse({'success': False, 'message': 'Contribute from this device to see your history'},
+                            status=403)
+
+    return JsonResponse({
+        'success': True,
+        'phone_number': phone_number,
+        'count': rows[0]['contribution_count'],
+        'total': float(rows[0]['total']),
+        'contributions': [
+            {
+                'amount': float(row['amount']),
+                'created_at': row['created_at'].isoformat(),
+            }
+            for row in rows
+        ],
     })
 
+def daraja_health(request):
+    """Circuit breaker state of every Daraja app and queued STK pushes, for monitoring"""
+    shards = shard_health()
+    closed = sum(shard['state'] == 'closed' for shard in shards)
+    health = {
+        'state': 'closed' if closed == len(shards) else 'degraded' if closed else 'open',
+        'shards': shards,
+        'queued_stk_pushes': QueuedStkPush.objects.count(),
+    }
+    # Still up while any app can take pushes
+    return JsonResponse(health, status=200 if closed else 503)
+
 @login_required
+@replica_reads
 def finance_report(request):
     # Filter only successful transactions
-    transactions = Contribution.objects.filter(is_verified=True, status="Completed").order_by('-created_at')
-    print("Finance report count:", transactions.count())
+    transactions = Contribution.objects.filter(is_verified=True, status=Contribution.Status.COMPLETED).order_by('-created_at')
 
     # Check if PDF export is requested
     if request.GET.get('format') == 'pdf':
@@ -399,7 +621,7 @@ def finance_report(request):
         })
 
         # Create PDF from HTML
-        pdf_file = HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf()
+        pdf_file = html_to_pdf(html_string, base_url=request.build_absolute_uri())
 
         # Return as downloadable file
         response = HttpResponse(pdf_file, content_type='application/pdf')
@@ -409,7 +631,28 @@ def finance_report(request):
     # Normal web view
     return render(request, 'camp_meeting/finance_report.html', {
         'transactions': transactions,
-        'is_export': False
+        'is_export': False,
+        'daily_totals': get_trends('day'),
+        'hourly_totals': get_trends('hour'),
+    })
+
+@login_required
+@replica_reads
+def contribution_trends(request):
+    """Per-day or per-hour contribution totals, read from the hourly rollups"""
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in ('day', 'hour'):
+        return JsonResponse({'success': False, 'message': 'granularity must be day or hour'}, status=400)
+    try:
+        status = Contribution.Status[request.GET.get('status', 'completed').upper()]
+    except KeyError:
+        return JsonResponse({'success': False, 'message': 'status must be pending, completed, failed or cancelled'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'granularity': granularity,
+        'status': status.label.lower(),
+        'buckets': get_trends(granularity, status),
     })
 
 # user login
@@ -430,3 +673,18 @@ def user_logout(request):
     logout(request)
     messages.success(request, "You have been logged out.")
     return redirect('camp_meeting:login')
+
+# saved request profiles, see camp_meeting/profiling.py
+@staff_member_required
+def profile_summary(request, profile_id):
+    html_path = profile_paths(profile_id)[1]
+    if not html_path.exists():
+        raise Http404("Profile not found")
+    return HttpResponse(html_path.read_text())
+
+@staff_member_required
+def profile_download(request, profile_id):
+    prof_path = profile_paths(profile_id)[0]
+    if not prof_path.exists():
+        raise Http404("Profile not found")
+    return FileResponse(prof_path.open('rb'), as_attachment=True, filename=prof_path.name)
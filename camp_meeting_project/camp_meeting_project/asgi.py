@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camp_meeting_project.settings')
+# Serve the I/O-bound endpoints from async views, see camp_meeting/async_views.py
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 from decouple import config
 
@@ -38,10 +39,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'camp_meeting.db_router.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'camp_meeting.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,6 +80,28 @@ DATABASES = {
     }
 }
 
+# Optional read replica (e.g. a litestream or rsync copy of db.sqlite3). The
+# finance report, stats endpoints, landing page and admin changelists read
+# from it; writes and anything read after a write stay on 'default'.
+READ_REPLICA_NAME = config('READ_REPLICA_NAME', default='')
+READ_REPLICA_ALIAS = 'replica' if READ_REPLICA_NAME else None
+if READ_REPLICA_ALIAS:
+    DATABASES[READ_REPLICA_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': READ_REPLICA_NAME,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['camp_meeting.db_router.ReplicaRouter']
+
+# Scratch database for `manage.py seed_contributions` and the scripts in benchmarks/,
+# only configured when a file is given so normal runs never touch it
+BENCHMARK_DB_NAME = config('BENCHMARK_DB_NAME', default='')
+if BENCHMARK_DB_NAME:
+    DATABASES['benchmark'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BENCHMARK_DB_NAME,
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -112,6 +137,73 @@ MPESA_PASSKEY = config('MPESA_PASSKEY', default='')
 MPESA_BASE_URL = config('MPESA_BASE_URL', default='https://sandbox.safaricom.co.ke')
 MPESA_SHORTCODE = config('MPESA_SHORTCODE', default='174379')
 CALLBACK_URL = config('CALLBACK_URL', default='')
+# Several Daraja apps to spread STK pushes over, as a JSON list of objects with
+# name, consumer_key, consumer_secret, passkey and shortcode, and optionally
+# base_url, callback_url, max_in_flight and rate (calls per second). Each app
+# gets its own token, circuit breaker and budget. Empty uses the single app above.
+MPESA_CREDENTIALS = config('MPESA_CREDENTIALS', default='[]', cast=json.loads)
+
+# Serve the payment, STK status and stats endpoints from camp_meeting/async_views.py.
+# asgi.py turns this on; under WSGI the sync views are faster.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Daraja calls: (connect, read) timeout in seconds, and the circuit breaker that
+# fails fast after `failure_threshold` consecutive failures for `reset_timeout` seconds
+MPESA_TIMEOUT = (3.05, 10)
+DARAJA_BREAKER = {
+    'failure_threshold': config('DARAJA_BREAKER_THRESHOLD', default=5, cast=int),
+    'reset_timeout': config('DARAJA_BREAKER_RESET', default=30, cast=int),
+}
+# Queued STK pushes older than this many seconds are dropped instead of sent
+STK_QUEUE_MAX_AGE = 600
+# STK query answers are shared through the cache: final ones for good,
+# "still waiting for the customer" for this many seconds
+STK_QUERY_PENDING_TTL = config('STK_QUERY_PENDING_TTL', default=5, cast=int)
+
+# Unverified pending/failed/cancelled attempts older than this are moved to the
+# archive by `manage.py archive_contributions`
+ARCHIVE_RETENTION_DAYS = config('ARCHIVE_RETENTION_DAYS', default=30, cast=int)
+
+# C2B confirmations are matched to contributions in batches, inline at most
+# once per this many seconds (0 leaves it to `manage.py process_c2b_payments`)
+C2B_PROCESS_INTERVAL = config('C2B_PROCESS_INTERVAL', default=2, cast=int)
+
+# Statements uploaded in the admin wait here for `manage.py import_statement --loop`
+STATEMENT_INBOX = config('STATEMENT_INBOX', default=str(BASE_DIR / 'statements'))
+
+# Staff can profile a request by adding ?_profile=1 or an X-Profile header;
+# the newest PROFILING_KEEP profiles are kept here
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_KEEP = config('PROFILING_KEEP', default=50, cast=int)
+
+# Contributions made offline wait in the landing page's service worker and are
+# sent once the network is back, unless they are older than this many seconds
+OFFLINE_QUEUE_MAX_AGE = config('OFFLINE_QUEUE_MAX_AGE', default=3600, cast=int)
+
+# Each worker keeps the active CampMeetingSettings row in memory for at most this
+# many seconds, even if it misses the invalidation after an admin save
+SETTINGS_CACHE_TTL = config('SETTINGS_CACHE_TTL', default=60, cast=int)
+
+# Top givers shown on the landing page when CampMeetingSettings.show_leaderboard
+# is on, and how many seconds the board is cached for
+LEADERBOARD_SIZE = config('LEADERBOARD_SIZE', default=10, cast=int)
+LEADERBOARD_CACHE_TTL = config('LEADERBOARD_CACHE_TTL', default=15, cast=int)
+
+# Rate limits per endpoint as (scope, requests, period in seconds); scope is
+# 'phone', 'ip' or 'global'. Each is a token bucket holding `requests` tokens
+# and refilling at requests/period a second, kept in the shared cache.
+RATE_LIMITS = {
+    'contribute': [('phone', 3, 60), ('ip', 10, 60), ('global', 50, 1)],
+    'stk_query': [('ip', 60, 60), ('global', 100, 1)],
+    'stk_status': [('ip', 120, 60)],
+    'my_contributions': [('phone', 5, 60), ('ip', 20, 60)],
+}
+# Request header holding the client IP when running behind a proxy, e.g. 'HTTP_X_REAL_IP'
+RATE_LIMIT_IP_HEADER = config('RATE_LIMIT_IP_HEADER', default='REMOTE_ADDR')
+# Outbound Daraja calls allowed in flight across all workers before shedding with 429.
+# With MPESA_CREDENTIALS it is the budget of each app without a max_in_flight, and
+# the overall cap is the sum of the apps' budgets
+DARAJA_MAX_IN_FLIGHT = config('DARAJA_MAX_IN_FLIGHT', default=20, cast=int)
 
 # Security settings for production
 if not DEBUG:
@@ -165,11 +257,25 @@ CORS_ALLOW_CREDENTIALS = True
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Cache configuration
+def cache_from_url(url):
+    """CACHES['default'] for a CACHE_URL: locmem://, redis://host:6379/0, db://table or file:///path"""
+    scheme, _, location = url.partition('://')
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme == 'db':
+        return {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': location or 'camp_meeting_cache'}
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location or 'unique-snowflake'}
+    raise ValueError(f"Unsupported CACHE_URL {url!r}")
+
+
+# Rate limits, the Daraja in-flight cap, circuit breakers, shared STK results and
+# the settings version all live here.  locmem:// is private to each process, so with
+# more than one worker set CACHE_URL to Redis (atomic counters) or at least db://
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+    'default': cache_from_url(config('CACHE_URL', default='locmem://')),
 }
 
 # Logging configuration
@@ -214,6 +320,7 @@ LOGGING = {
 }
 
 # # Set session to expire after 10 minutes (600 seconds) of inactivity
+# This also bounds how long /api/my-contributions/ answers after paying, see views.my_contributions
 SESSION_COOKIE_AGE = 600  # seconds
 
 # Reset session expiry on every request (sliding expiration)